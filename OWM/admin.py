@@ -1,4 +1,5 @@
 from django.contrib import admin
+from .changelist import AutocompleteFilter, LargeTableAdmin
 from .models import CustomUser, Service, Booking, Review, ContactUs, TeamMember, Cart
 
 # Register CustomUser
@@ -16,17 +17,38 @@ class ServiceAdmin(admin.ModelAdmin):
 
 # Register Booking
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(LargeTableAdmin):
     list_display = ('user', 'service', 'event_date', 'event_location', 'status')
-    list_filter = ('status', 'event_date')
+    list_filter = ('status', 'event_date', ('user', AutocompleteFilter), ('service', AutocompleteFilter))
+    list_select_related = ('user', 'service')
     search_fields = ('user__username', 'service__name')
+    autocomplete_fields = ('user', 'service')
+    date_hierarchy = 'event_date'
+    ordering = ('-event_date', '-id')
+
+# Ratings are a fixed 1-5, so list them rather than reading every distinct value from the table
+class RatingFilter(admin.SimpleListFilter):
+    title = 'rating'
+    parameter_name = 'rating__exact'
+
+    def lookups(self, request, model_admin):
+        return [(str(value), f"{value}★") for value in Service.RATING_VALUES]
+
+    def queryset(self, request, queryset):
+        if self.value() in {str(value) for value in Service.RATING_VALUES}:
+            return queryset.filter(rating=self.value())
+        return queryset
 
 # Register Review
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
+class ReviewAdmin(LargeTableAdmin):
     list_display = ('user', 'service', 'rating', 'created_at')
-    list_filter = ('rating', 'created_at')
+    list_filter = (RatingFilter, 'created_at', ('user', AutocompleteFilter), ('service', AutocompleteFilter))
+    list_select_related = ('user', 'service')
     search_fields = ('user__username', 'service__name')
+    autocomplete_fields = ('user', 'service')
+    date_hierarchy = 'created_at'
+    ordering = ('-created_at', '-id')
 
 # Register ContactMessage (Contact UI)
 @admin.register(ContactUs)
@@ -42,9 +64,13 @@ class TeamMemberAdmin(admin.ModelAdmin):
     search_fields = ('name', 'role')
 
 @admin.register(Cart)
-class CartAdmin(admin.ModelAdmin):
+class CartAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'service', 'event_date')
-    list_filter = ('user', 'service')
+    list_filter = (('user', AutocompleteFilter), ('service', AutocompleteFilter))
+    list_select_related = ('user', 'service')
     search_fields = ('user__username', 'service__name')
+    autocomplete_fields = ('user', 'service')
+    date_hierarchy = 'added_at'
+    ordering = ('-added_at', '-id')
 
 
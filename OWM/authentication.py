@@ -0,0 +1,161 @@
+import jwt
+from django.db import transaction
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.state import token_backend
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .models import CustomUser
+from .revocation import revocations
+
+# Claims copied into every token so most requests can be served without loading the user.
+# Access tokens inherit them from the refresh token they are minted from.
+USER_CLAIMS = ("username", "is_staff")
+# Access tokens name the refresh token they were minted from, so revoking that refresh
+# token (by rotation or logout) also revokes them.
+REFRESH_JTI_CLAIM = "rjti"
+
+
+class OWMRefreshToken(RefreshToken):
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        access[REFRESH_JTI_CLAIM] = self[api_settings.JTI_CLAIM]
+        return access
+
+    def check_blacklist(self):
+        # The in-memory revocation list instead of a blacklist query per refresh
+        if revocations.is_revoked(self[api_settings.JTI_CLAIM]):
+            raise TokenError("Token is blacklisted")
+
+    def blacklist(self):
+        jti = self[api_settings.JTI_CLAIM]
+        result = super().blacklist()
+        transaction.on_commit(lambda: revocations.revoke(jti))
+        return result
+
+    @transaction.atomic
+    def rotate(self):
+        """Blacklist this token (with BLACKLIST_AFTER_ROTATION) and turn it into a fresh one with the same claims."""
+        if api_settings.BLACKLIST_AFTER_ROTATION:
+            # The in-memory check may lag other processes; the blacklist row is the arbiter of a replay
+            _, created = self.blacklist()
+            if not created:
+                raise TokenError("Token is blacklisted")
+        self.set_jti()
+        self.set_exp()
+        self.set_iat()
+        # Track it like for_user() does, so it can be blacklisted by jti alone (see revoke_refresh_jti)
+        OutstandingToken.objects.create(
+            user_id=self.get(api_settings.USER_ID_CLAIM), jti=self[api_settings.JTI_CLAIM], token=str(self),
+            created_at=self.current_time, expires_at=datetime_from_epoch(self["exp"]),
+        )
+
+
+def revoke_refresh_jti(jti):
+    """Blacklist the refresh token with this jti, if it is known. Used at logout, where only the access token is at hand."""
+    outstanding = OutstandingToken.objects.filter(jti=jti).first()
+    if outstanding is None:
+        return False
+    BlacklistedToken.objects.get_or_create(token=outstanding)
+    transaction.on_commit(lambda: revocations.revoke(jti))
+    return True
+
+
+def access_token_refresh_jti(request):
+    """
+    The refresh jti named by the request's access token, or None. The signature is checked but
+    not the expiry: logging out must still revoke the session after its access token expired.
+    """
+    authentication = JWTStatelessUserAuthentication()
+    header = authentication.get_header(request)
+    try:
+        raw_token = authentication.get_raw_token(header) if header else None
+    except AuthenticationFailed:
+        return None
+    if raw_token is None:
+        return None
+    try:
+        payload = jwt.decode(
+            raw_token,
+            token_backend.get_verifying_key(raw_token),
+            algorithms=[token_backend.algorithm],
+            audience=token_backend.audience,
+            issuer=token_backend.issuer,
+            options={"verify_aud": token_backend.audience is not None, "verify_exp": False},
+        )
+    except jwt.InvalidTokenError:
+        return None
+    if payload.get(api_settings.TOKEN_TYPE_CLAIM) != AccessToken.token_type:
+        return None
+    return payload.get(REFRESH_JTI_CLAIM)
+
+
+class RevocationCheckMixin:
+    """Rejects access tokens whose refresh token has been blacklisted; checked in memory (OWM.revocation)."""
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_revoked(token):
+            raise InvalidToken({"detail": "Token has been revoked", "code": "token_not_valid"})
+        return token
+
+
+def is_revoked(access_token):
+    refresh_jti = access_token.get(REFRESH_JTI_CLAIM)
+    return refresh_jti is not None and revocations.is_revoked(refresh_jti)
+
+
+class StatelessJWTAuthentication(RevocationCheckMixin, JWTStatelessUserAuthentication):
+    pass
+
+
+class StatefulJWTAuthentication(RevocationCheckMixin, JWTAuthentication):
+    pass
+
+
+class LazyTokenUser(TokenUser):
+    """
+    request.user under JWTStatelessUserAuthentication: id, username and is_staff come
+    from the access token, so authenticating costs no query. Reading any other field
+    (email, profile_pic, ...) loads the CustomUser once and delegates to it.
+    """
+
+    @cached_property
+    def instance(self):
+        return CustomUser.objects.get(pk=self.id)
+
+    @cached_property
+    def username(self):
+        # Tokens issued before the claim existed carry only the user id
+        return self.token["username"] if "username" in self.token else self.instance.username
+
+    @cached_property
+    def is_staff(self):
+        return self.token["is_staff"] if "is_staff" in self.token else self.instance.is_staff
+
+    def __getattr__(self, attr):
+        if attr.startswith("_") or attr == "token":
+            raise AttributeError(attr)
+        if attr in self.token:
+            return self.token[attr]
+        return getattr(self.instance, attr)
+
+
+def user_instance(user):
+    """The CustomUser behind request.user, whichever JWT authentication class is configured."""
+    return user.instance if isinstance(user, LazyTokenUser) else user
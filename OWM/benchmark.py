@@ -0,0 +1,792 @@
+import asyncio
+import contextvars
+import datetime
+import io
+import itertools
+import json
+import math
+import platform
+import random
+import subprocess
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.db.models import Max
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+from PIL import Image as PILImage
+from rest_framework.pagination import Cursor
+from rest_framework.renderers import JSONRenderer
+
+from .authentication import OWMRefreshToken
+from .catalog import bump_catalog_version
+from .models import Booking, Cart, CustomUser, Review, SearchDocument, SearchPosting, Service, TeamMember
+from .occupancy import rebuild_occupancy
+from .pagination import ReviewPagination
+from .passwords import login_backoff
+from .perf import QueryRecorder, observe_queries
+from .renderers import ORJSONRenderer
+from .search import rebuild_search_index
+from .serializers import (
+    FLAT_SERIALIZERS, BookingSerializer, ReviewSerializer, ServiceSerializer, TeamMemberSerializer,
+)
+
+# Benchmark harness behind `manage.py seed_benchmark` and `manage.py run_benchmark`.
+# Requests go through the full Django stack in-process (django.test.Client), so it runs
+# offline against any DB_ENGINE, e.g. DB_ENGINE=sqlite3 DB_NAME=bench.sqlite3.
+# Seeded rows are tagged with BENCH_PREFIX so they can be told apart and removed.
+BENCH_PREFIX = "bench_"
+BENCH_PASSWORD = "bench-password-1"
+BENCH_MEDIA_NAME = "bench/sample.jpg"
+BENCH_HOST = "localhost"
+BACKGROUND_THREADS = 4
+
+# Row counts at --scale 1.0
+FULL_SCALE = {
+    "users": 100_000,
+    "services": 200,
+    "team_members": 12,
+    "bookings": 1_000_000,
+    "reviews": 500_000,
+    "carts": 20_000,
+}
+
+BOOKINGS_FROM = datetime.date(2015, 1, 1)
+
+# Seeded text: studio words plus a long tail of made-up ones, drawn with Zipf-like
+# frequencies so the search index sees a realistic spread of common and rare words
+SEARCH_WORDS = (
+    "studio session sound video photo wedding shoot drone edit mix camera lighting crew event music "
+    "podcast portrait aerial footage booth vocals great amazing quick friendly professional quality "
+    "price booking team recommend"
+).split()
+SYLLABLES = "ka ri to me na lu so vi de po ma ze ti go ba le".split()
+
+
+@lru_cache(maxsize=None)
+def vocabulary(size=5000):
+    """(words, cumulative weights) for random.choices; the same on every run."""
+    rng = random.Random(0)
+    tail = {"".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(size)}
+    words = SEARCH_WORDS + sorted(tail - set(SEARCH_WORDS))
+    return words, list(itertools.accumulate(1 / rank for rank in range(1, len(words) + 1)))
+
+
+def sentence(rng, length):
+    words, cum_weights = vocabulary()
+    return " ".join(rng.choices(words, cum_weights=cum_weights, k=length)).capitalize() + "."
+
+
+def scaled_counts(scale):
+    counts = {name: max(int(count * scale), 1) for name, count in FULL_SCALE.items()}
+    counts["services"] = max(counts["services"], 10)
+    return counts
+
+
+def reset_benchmark_data():
+    """Delete every seeded row; bookings, carts and reviews go with their users and services."""
+    CustomUser.objects.filter(username__startswith=BENCH_PREFIX).delete()
+    Service.objects.filter(name__startswith=BENCH_PREFIX).delete()
+    TeamMember.objects.filter(name__startswith=BENCH_PREFIX).delete()
+
+
+def seed_benchmark_data(scale=1.0, batch_size=5000, seed=0, log=print):
+    """Bulk-insert realistic volumes of users, services, bookings, reviews and carts."""
+    rng = random.Random(seed)
+    counts = scaled_counts(scale)
+    password = make_password(BENCH_PASSWORD)  # Hashed once: every seeded user shares it
+
+    def insert(model, rows, total):
+        created = 0
+        for chunk in iter(lambda: list(itertools.islice(rows, batch_size)), []):
+            model.objects.bulk_create(chunk, batch_size=batch_size)
+            created += len(chunk)
+            log(f"{model.__name__}: {created}/{total}")
+
+    insert(CustomUser, (
+        CustomUser(
+            username=f"{BENCH_PREFIX}{i}", password=password, email=f"{BENCH_PREFIX}{i}@example.com",
+            first_name="Bench", last_name=f"User{i}", address="Nairobi", profile_pic="",
+        )
+        for i in range(counts["users"])
+    ), counts["users"])
+    user_ids = list(CustomUser.objects.filter(username__startswith=BENCH_PREFIX).values_list("id", flat=True))
+
+    categories = [value for value, _ in Service.CATEGORY_CHOICES]
+    insert(Service, (
+        Service(
+            name=f"{BENCH_PREFIX}service {i}", category=categories[i % len(categories)],
+            description=sentence(rng, 40), price=f"{rng.randint(50, 5000)}.00",
+        )
+        for i in range(counts["services"])
+    ), counts["services"])
+    service_ids = list(Service.objects.filter(name__startswith=BENCH_PREFIX).values_list("id", flat=True))
+
+    roles = [value for value, _ in TeamMember.ROLE_CHOICES]
+    insert(TeamMember, (
+        TeamMember(name=f"{BENCH_PREFIX}member {i}", role=roles[i % len(roles)], profile_pic="", bio=sentence(rng, 30))
+        for i in range(counts["team_members"])
+    ), counts["team_members"])
+
+    # (service, event_date) is unique: walk the services day by day
+    statuses = [value for value, _ in Booking.STATUS_CHOICES]
+    insert(Booking, (
+        Booking(
+            user_id=rng.choice(user_ids), service_id=service_ids[i % len(service_ids)],
+            event_date=BOOKINGS_FROM + datetime.timedelta(days=i // len(service_ids)),
+            event_time=datetime.time(rng.randint(8, 18)), event_location="Nairobi", status=rng.choice(statuses),
+        )
+        for i in range(counts["bookings"])
+    ), counts["bookings"])
+
+    insert(Review, (
+        Review(user_id=rng.choice(user_ids), service_id=rng.choice(service_ids), rating=rng.randint(1, 5),
+               comment=sentence(rng, rng.randint(6, 20)))
+        for _ in range(counts["reviews"])
+    ), counts["reviews"])
+
+    today = datetime.date.today()
+    insert(Cart, (
+        Cart(user_id=rng.choice(user_ids), service_id=rng.choice(service_ids),
+             event_date=today + datetime.timedelta(days=rng.randint(1, 365)),
+             event_time=datetime.time(10), event_location="Nairobi")
+        for _ in range(counts["carts"])
+    ), counts["carts"])
+
+    # bulk_create skips the signals that maintain these
+    call_command("rebuild_rating_stats", stdout=io.StringIO())
+    rebuild_occupancy(batch_size=batch_size)
+    rebuild_search_index(batch_size=batch_size)
+    bump_catalog_version()
+
+    if not default_storage.exists(BENCH_MEDIA_NAME):
+        image = io.BytesIO()
+        PILImage.new("RGB", (1600, 1200), (90, 120, 200)).save(image, "JPEG", quality=85)
+        default_storage.save(BENCH_MEDIA_NAME, ContentFile(image.getvalue()))
+    return counts
+
+
+# Scenarios: each one prepares a request (untimed) and returns a callable that sends it (timed)
+@dataclass
+class Scenario:
+    name: str
+    description: str
+    prepare: callable
+    default: bool = True
+    expected: frozenset = frozenset({200, 201, 204, 304})
+    background: callable = None  # Like prepare; its request runs in a loop on other threads while this one is timed
+
+
+SCENARIOS = {}
+
+
+def scenario(name, description, default=True, expected=None, background=None):
+    def register(prepare):
+        SCENARIOS[name] = Scenario(name, description, prepare, default, expected or Scenario.expected, background)
+        return prepare
+    return register
+
+
+class BenchmarkContext:
+    """Seeded ids, authenticated clients and a supply of free booking dates, shared by the scenarios."""
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.users = list(
+            CustomUser.objects.filter(username__startswith=BENCH_PREFIX).order_by("id").values_list("id", "username")[:1000]
+        )
+        self.services = list(Service.objects.filter(name__startswith=BENCH_PREFIX).values_list("id", flat=True))
+        if not self.users or not self.services:
+            raise RuntimeError("No benchmark data: run `manage.py seed_benchmark` first.")
+        latest = Booking.objects.aggregate(latest=Max("event_date"))["latest"] or datetime.date.today()
+        self.free_dates = (latest + datetime.timedelta(days=n) for n in itertools.count(1))
+        self.tokens = {}
+        self.cursors = {}
+
+    def pick(self, values):
+        with self.lock:
+            return self.rng.choice(values)
+
+    def free_date(self):
+        with self.lock:
+            return next(self.free_dates)
+
+    def user(self):
+        user_id, username = self.pick(self.users)
+        return CustomUser(pk=user_id, username=username, is_staff=False)
+
+    def client(self, user=None):
+        """A client sending an access token for `user` (a random seeded user by default)."""
+        user = user or self.user()
+        with self.lock:
+            if user.pk not in self.tokens:
+                self.tokens[user.pk] = str(OWMRefreshToken.for_user(user).access_token)
+            token = self.tokens[user.pk]
+        return Client(SERVER_NAME=BENCH_HOST, HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def anonymous(self):
+        return Client(SERVER_NAME=BENCH_HOST)
+
+    def deep_cursor(self, pagination_class, queryset, url, depth):
+        """A `?cursor=` for the page starting `depth` (0-1) of the way through `queryset`, found once."""
+        key = (pagination_class, url, depth)
+        if key not in self.cursors:
+            paginator = pagination_class()
+            paginator.base_url = url
+            count = queryset.count()
+            row = queryset.order_by(*paginator.ordering)[min(int(count * depth), max(count - 1, 0))]
+            position = paginator._get_position_from_instance(row, paginator.ordering)
+            self.cursors[key] = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+        return self.cursors[key]
+
+
+@scenario("login", "POST login/ with valid credentials (password hashing)")
+def login(ctx):
+    client, (_, username) = ctx.anonymous(), ctx.pick(ctx.users)
+    return lambda: client.post(reverse("login"), {"username": username, "password": BENCH_PASSWORD})
+
+
+@scenario("login_flood", "POST login/ with a wrong password, repeatedly for one username", expected={401, 429})
+def login_flood(ctx):
+    client, username = ctx.anonymous(), ctx.users[0][1]
+    return lambda: client.post(reverse("login"), {"username": username, "password": "wrong-password"})
+
+
+@scenario("register", "POST register/ for a new user")
+def register(ctx):
+    client = ctx.anonymous()
+    username = f"{BENCH_PREFIX}r{uuid.uuid4().hex[:12]}"
+    data = {"username": username, "password": BENCH_PASSWORD, "email": f"{username}@example.com",
+            "first_name": "Bench", "last_name": "Register", "address": "Nairobi"}
+    return lambda: client.post(reverse("register"), data)
+
+
+@scenario("token_refresh", "POST token/refresh/ with the refresh cookie")
+def token_refresh(ctx):
+    client = ctx.anonymous()
+    client.cookies["refresh_token"] = str(OWMRefreshToken.for_user(ctx.user()))
+    return lambda: client.post(reverse("token_refresh"))
+
+
+@scenario("catalog", "GET services/ (from a warm catalog cache when CATALOG_CACHE_ENABLED)")
+def catalog(ctx):
+    client = ctx.anonymous()
+    return lambda: client.get(reverse("service-list"))
+
+
+def login_storm(ctx):
+    client = ctx.anonymous()
+
+    def send():
+        _, username = ctx.pick(ctx.users)
+        return client.post(reverse("login"), {"username": username, "password": BENCH_PASSWORD})
+    return send
+
+
+@scenario("catalog_under_login_flood", "GET services/ while other threads keep logging in", background=login_storm)
+def catalog_under_login_flood(ctx):
+    return catalog(ctx)
+
+
+@scenario("catalog_cold", "GET services/ right after the catalog cache is invalidated")
+def catalog_cold(ctx):
+    bump_catalog_version()
+    client = ctx.anonymous()
+    return lambda: client.get(reverse("service-list"))
+
+
+@scenario("catalog_category", "GET services/?category=")
+def catalog_category(ctx):
+    client, category = ctx.anonymous(), ctx.pick([value for value, _ in Service.CATEGORY_CHOICES])
+    return lambda: client.get(reverse("service-list"), {"category": category})
+
+
+@scenario("service_detail", "GET service-details/<pk>/")
+def service_detail(ctx):
+    client, pk = ctx.anonymous(), ctx.pick(ctx.services)
+    return lambda: client.get(reverse("updateservice", args=[pk]))
+
+
+@scenario("availability", "GET services/<pk>/availability/ for the next 12 months")
+def availability(ctx):
+    client, pk = ctx.anonymous(), ctx.pick(ctx.services)
+    return lambda: client.get(reverse("service-availability", args=[pk]))
+
+
+@scenario("team", "GET team/")
+def team(ctx):
+    client = ctx.anonymous()
+    return lambda: client.get(reverse("team"))
+
+
+@scenario("team_new_connection", "GET team/ on a new database connection, as with CONN_MAX_AGE=0 (compare team)")
+def team_new_connection(ctx):
+    connections.close_all()  # The timed request opens its own
+    client = ctx.anonymous()
+    return lambda: client.get(reverse("team"))
+
+
+@scenario("reviews_page", "GET reviews/?page_size=50")
+def reviews_page(ctx):
+    client = ctx.anonymous()
+    return lambda: client.get(reverse("review-list"), {"page_size": 50})
+
+
+@scenario("reviews_deep_page", "GET reviews/?page_size=50 by cursor, 90% of the way through (compare reviews_page)")
+def reviews_deep_page(ctx):
+    client = ctx.anonymous()
+    url = ctx.deep_cursor(ReviewPagination, Review.objects.all(), reverse("review-list") + "?page_size=50", 0.9)
+    return lambda: client.get(url)
+
+
+@scenario("reviews_full", "GET reviews/ without pagination (every review)", default=False)
+def reviews_full(ctx):
+    client = ctx.anonymous()
+    return lambda: client.get(reverse("review-list"))
+
+
+def search_query(ctx):
+    """A common word and a less common one, as a user would combine them."""
+    words, _ = vocabulary()
+    return f"{ctx.pick(SEARCH_WORDS)} {ctx.pick(words[:500])}"
+
+
+@scenario("search", "GET search/?q= with two words")
+def search(ctx):
+    client, query = ctx.anonymous(), search_query(ctx) + " "
+    return lambda: client.get(reverse("search"), {"q": query})
+
+
+@scenario("search_prefix", "GET search/?q= with the last word still being typed")
+def search_prefix(ctx):
+    client, query = ctx.anonymous(), search_query(ctx)[:-2]
+    return lambda: client.get(reverse("search"), {"q": query})
+
+
+@scenario("search_category", "GET search/?q=&category= with one common word")
+def search_category(ctx):
+    client = ctx.anonymous()
+    params = {"q": ctx.pick(SEARCH_WORDS) + " ", "category": ctx.pick([value for value, _ in Service.CATEGORY_CHOICES])}
+    return lambda: client.get(reverse("search"), params)
+
+
+@scenario("search_suggest", "GET search/suggest/?q= with a two-letter prefix")
+def search_suggest(ctx):
+    client, query = ctx.anonymous(), ctx.pick(SYLLABLES)
+    return lambda: client.get(reverse("search-suggest"), {"q": query})
+
+
+@scenario("profile", "GET profile/")
+def profile(ctx):
+    client = ctx.client()
+    return lambda: client.get(reverse("profile"))
+
+
+@scenario("bookings", "GET bookings/ for one user")
+def bookings(ctx):
+    client = ctx.client()
+    return lambda: client.get(reverse("booking-list"))
+
+
+@scenario("dashboard", "GET userdashboard/ (profile, bookings by status, cart)")
+def dashboard(ctx):
+    client = ctx.client()
+    return lambda: client.get(reverse("userdashboard"))
+
+
+@scenario("add_to_cart", "POST bookings/ to add a service to the cart")
+def add_to_cart(ctx):
+    client = ctx.client()
+    data = {"service_id": ctx.pick(ctx.services), "event_date": ctx.free_date().isoformat(),
+            "event_time": "10:00", "event_location": "Nairobi"}
+    return lambda: client.post(reverse("booking-list"), data)
+
+
+@scenario("book_from_cart", "POST booking/<service>/ to book one cart item")
+def book_from_cart(ctx):
+    user = ctx.user()
+    service_id = ctx.pick(ctx.services)
+    Cart.objects.filter(user_id=user.pk, service_id=service_id).delete()
+    Cart.objects.create(user_id=user.pk, service_id=service_id, event_date=ctx.free_date(),
+                        event_time=datetime.time(10), event_location="Nairobi")
+    client = ctx.client(user)
+    return lambda: client.post(reverse("booking", args=[service_id]))
+
+
+@scenario("checkout", "POST cart/checkout/ with five items in the cart")
+def checkout(ctx):
+    user = ctx.user()
+    Cart.objects.filter(user_id=user.pk).delete()
+    Cart.objects.bulk_create(
+        Cart(user_id=user.pk, service_id=ctx.pick(ctx.services), event_date=ctx.free_date(),
+             event_time=datetime.time(10), event_location="Nairobi")
+        for _ in range(5)
+    )
+    client = ctx.client(user)
+    return lambda: client.post(reverse("cart-checkout"))
+
+
+@scenario("media", "GET a 1600x1200 JPEG through MediaFilesMiddleware (needs SERVE_MEDIA)")
+def media(ctx):
+    client = ctx.anonymous()
+    url = settings.MEDIA_URL + BENCH_MEDIA_NAME
+    return lambda: client.get(url)
+
+
+@scenario("metrics", "GET /metrics")
+def metrics(ctx):
+    client = ctx.anonymous()
+    return lambda: client.get(reverse("metrics"))
+
+
+# Running and reporting
+@dataclass
+class Sample:
+    seconds: float
+    queries: int
+    status: int
+
+
+@dataclass
+class Result:
+    samples: list = field(default_factory=list)
+    wall_seconds: float = 0.0
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def timed_request(scenario, ctx):
+    send = scenario.prepare(ctx)
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        start = time.perf_counter()
+        response = send()
+        if response.streaming:
+            b"".join(response.streaming_content)
+        elapsed = time.perf_counter() - start
+    return Sample(elapsed, recorder.count, response.status_code)
+
+
+def run_scenario(scenario, ctx, requests=200, warmup=10, concurrency=1):
+    login_backoff.clear()  # Failed logins from an earlier scenario must not lock out this one
+    with ExitStack() as stack:
+        if scenario.background:
+            stack.enter_context(background_load(scenario.background, ctx))
+        for _ in range(warmup):
+            timed_request(scenario, ctx)
+        return summarize(scenario, timed_run(scenario, ctx, requests, concurrency))
+
+
+@contextmanager
+def background_load(prepare, ctx, threads=BACKGROUND_THREADS):
+    """Keep `threads` threads sending prepare(ctx) requests until the block exits."""
+    stop = threading.Event()
+
+    def loop():
+        send = prepare(ctx)
+        try:
+            while not stop.is_set():
+                send()
+        finally:
+            close_old_connections()
+
+    workers = [threading.Thread(target=loop, daemon=True) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+
+def timed_run(scenario, ctx, requests, concurrency):
+    def worker(_):
+        try:
+            return timed_request(scenario, ctx)
+        finally:
+            if concurrency > 1:
+                close_old_connections()
+
+    result = Result()
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            result.samples = list(executor.map(worker, range(requests)))
+    else:
+        result.samples = [worker(i) for i in range(requests)]
+    result.wall_seconds = time.perf_counter() - start
+    return result
+
+
+def summarize(scenario, result):
+    latencies = sorted(sample.seconds * 1000 for sample in result.samples)
+    queries = [sample.queries for sample in result.samples]
+    statuses = Counter(sample.status for sample in result.samples)
+    return {
+        "description": scenario.description,
+        "requests": len(result.samples),
+        "errors": sum(count for code, count in statuses.items() if code not in scenario.expected),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "throughput_rps": round(len(result.samples) / result.wall_seconds, 2) if result.wall_seconds else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 3),
+            **{f"p{pct}": round(percentile(latencies, pct), 3) for pct in (50, 90, 95, 99)},
+            "max": round(latencies[-1], 3),
+        },
+        "queries": {"mean": round(sum(queries) / len(queries), 2), "max": max(queries)},
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "db_engine": settings.DATABASES["default"]["ENGINE"],
+        "rows": {
+            "users": CustomUser.objects.count(),
+            "services": Service.objects.count(),
+            "bookings": Booking.objects.count(),
+            "reviews": Review.objects.count(),
+            "carts": Cart.objects.count(),
+            "search_documents": SearchDocument.objects.count(),
+            "search_postings": SearchPosting.objects.count(),
+        },
+    }
+
+
+def run_benchmark(names, requests=200, warmup=10, concurrency=1, seed=0, log=print):
+    ctx = BenchmarkContext(seed)
+    report = {"environment": environment(),
+              "options": {"requests": requests, "warmup": warmup, "concurrency": concurrency, "seed": seed},
+              "scenarios": {}}
+    for name in names:
+        log(f"Running {name} ...")
+        report["scenarios"][name] = run_scenario(SCENARIOS[name], ctx, requests, warmup, concurrency)
+    return report
+
+
+# ASGI vs WSGI with many open connections. Both runs drive `connections` clients from one event
+# loop, each sending its next request as soon as the last one is answered. Under WSGI a request
+# waits for one of `wsgi_threads` worker threads, as on a threaded WSGI server; under ASGI it goes
+# through Django's ASGIHandler on the loop. Latency includes the wait for a free worker.
+# `connections_opened` counts database connections opened during the run: with persistent
+# connections (CONN_MAX_AGE > 0) WSGI reuses one per worker thread, while ASGI runs each
+# request's sync code on a thread of its own and so opens, and leaves open, one per request.
+CONNECTION_SCENARIOS = {
+    "catalog": lambda: (reverse("service-list"), {}),
+    "team": lambda: (reverse("team"), {}),
+    "reviews_page": lambda: (reverse("review-list"), {"page_size": 50}),
+}
+WSGI_THREADS = 32
+
+
+async def drive_connections(send, connections, requests):
+    """Open `connections` clients that share `requests` requests, each awaiting send(client)."""
+    remaining = iter(range(requests))
+    result, peak_threads = Result(), threading.active_count()
+    opened = []
+
+    def count_opened(sender, connection, **kwargs):
+        opened.append(connection.alias)
+
+    async def connection():
+        nonlocal peak_threads
+        client = AsyncClient()
+        for _ in remaining:
+            recorder = QueryRecorder()
+            start = time.perf_counter()
+            with observe_queries(recorder):
+                response = await send(client)
+            result.samples.append(Sample(time.perf_counter() - start, recorder.count, response.status_code))
+            peak_threads = max(peak_threads, threading.active_count())
+
+    connection_created.connect(count_opened)
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(connection() for _ in range(connections)))
+        result.wall_seconds = time.perf_counter() - start
+    finally:
+        connection_created.disconnect(count_opened)
+    return result, peak_threads, len(opened)
+
+
+def run_connection_benchmark(names, connections=500, requests=5000, wsgi_threads=WSGI_THREADS, warmup=10, log=print):
+    report = {"environment": environment(),
+              "options": {"connections": connections, "requests": requests, "wsgi_threads": wsgi_threads},
+              "scenarios": {}}
+    for name in names:
+        path, params = CONNECTION_SCENARIOS[name]()
+        wsgi_client = Client(SERVER_NAME=BENCH_HOST)
+        wsgi_workers = ThreadPoolExecutor(max_workers=wsgi_threads)
+
+        def wsgi_request():
+            try:
+                return wsgi_client.get(path, params)
+            finally:
+                close_old_connections()  # What request_finished does on a real WSGI server
+
+        async def wsgi(client):
+            # Run in the caller's context so observe_queries() sees the worker's queries
+            request = contextvars.copy_context().run
+            return await asyncio.get_running_loop().run_in_executor(wsgi_workers, request, wsgi_request)
+
+        async def asgi(client):
+            # Like ASGIHandler: sync code runs on a thread of the request's own, and
+            # request_finished closes its connections there
+            async with ThreadSensitiveContext():
+                try:
+                    return await client.get(path, params)
+                finally:
+                    await sync_to_async(close_old_connections)()
+
+        for server, send in (("wsgi", wsgi), ("asgi", asgi)):
+            log(f"Running {name} under {server.upper()} with {connections} connections ...")
+
+            async def run():
+                await drive_connections(send, 1, warmup)
+                return await drive_connections(send, connections, requests)
+
+            # AsyncClient always sends Host: testserver, which the test runner would allow
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+                result, peak_threads, opened = asyncio.run(run())
+            stats = summarize(SCENARIOS[name], result)
+            report["scenarios"][f"{name}/{server}"] = {**stats, "peak_threads": peak_threads,
+                                                       "connections_opened": opened}
+        wsgi_workers.shutdown()
+    return report
+
+
+def format_connection_report(report):
+    lines = [f"{'scenario':<22}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'threads':>9}{'db conns':>10}"
+             f"{'errors':>8}"]
+    for name, stats in report["scenarios"].items():
+        latency = stats["latency_ms"]
+        lines.append(
+            f"{name:<22}{stats['throughput_rps']:>9}{latency['p50']:>9}{latency['p95']:>9}{latency['p99']:>9}"
+            f"{stats['peak_threads']:>9}{stats['connections_opened']:>10}{stats['errors']:>8}"
+        )
+    return "\n".join(lines)
+
+
+# Serializer microbenchmark: the same rows through ModelSerializer + JSONRenderer and through
+# the flat serializer + ORJSONRenderer (OWM.serializers.FlatSerializer), fetching included.
+SERIALIZER_CASES = {
+    "services": (ServiceSerializer, lambda: Service.objects.order_by("id")),
+    "team": (TeamMemberSerializer, lambda: TeamMember.objects.order_by("id")),
+    "reviews": (ReviewSerializer, lambda: Review.objects.select_related("user").order_by("-created_at", "-id")),
+    "bookings": (BookingSerializer, lambda: Booking.objects.for_serializer().order_by("-event_date", "-id")),
+}
+
+
+def fetch_rows(queryset, rows):
+    """`rows` results of `queryset`, reading the table again from the start while it has fewer."""
+    results = []
+    while len(results) < rows:
+        batch = list(queryset[:rows - len(results)])
+        if not batch:
+            break
+        results.extend(batch)
+    return results
+
+
+def measure(func, repeat):
+    """Best CPU time in ms over `repeat` runs, then the peak memory allocated by one traced run, in KiB."""
+    cpu = []
+    for _ in range(repeat):
+        start = time.process_time()
+        func()
+        cpu.append(time.process_time() - start)
+    tracemalloc.start()
+    try:
+        body = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"cpu_ms": round(min(cpu) * 1000, 3), "peak_kib": round(peak / 1024, 1)}, body
+
+
+def run_serializer_benchmark(rows=10_000, repeat=3, log=print):
+    report = {"environment": environment(), "options": {"rows": rows, "repeat": repeat}, "serializers": {}}
+    for name, (serializer_class, queryset) in SERIALIZER_CASES.items():
+        log(f"Serializing {name} ...")
+        flat = FLAT_SERIALIZERS[serializer_class]()
+
+        def model_serializer():
+            return JSONRenderer().render(serializer_class(fetch_rows(queryset(), rows), many=True).data)
+
+        def flat_serializer():
+            return ORJSONRenderer().render(flat.serialize(fetch_rows(flat.project(queryset()), rows)))
+
+        before, expected = measure(model_serializer, repeat)
+        after, body = measure(flat_serializer, repeat)
+        report["serializers"][name] = {
+            "rows": len(fetch_rows(queryset().values_list("id"), rows)),
+            "model_serializer": before,
+            "flat": after,
+            "speedup": round(before["cpu_ms"] / after["cpu_ms"], 2) if after["cpu_ms"] else None,
+            "identical": body == expected,
+        }
+    return report
+
+
+def format_serializer_report(report):
+    lines = [f"{'list':<10}{'rows':>7}{'drf ms':>10}{'flat ms':>10}{'speedup':>9}{'drf KiB':>10}{'flat KiB':>10}  identical"]
+    for name, stats in report["serializers"].items():
+        before, after = stats["model_serializer"], stats["flat"]
+        lines.append(
+            f"{name:<10}{stats['rows']:>7}{before['cpu_ms']:>10}{after['cpu_ms']:>10}{stats['speedup']:>9}"
+            f"{before['peak_kib']:>10}{after['peak_kib']:>10}  {stats['identical']}"
+        )
+    return "\n".join(lines)
+
+
+def format_report(report):
+    lines = [f"{'scenario':<26}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'errors':>8}"]
+    for name, stats in report["scenarios"].items():
+        latency = stats["latency_ms"]
+        lines.append(
+            f"{name:<26}{stats['throughput_rps']:>9}{latency['p50']:>9}{latency['p95']:>9}{latency['p99']:>9}"
+            f"{stats['queries']['mean']:>9}{stats['errors']:>8}"
+        )
+    return "\n".join(lines)
+
+
+def write_report(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
@@ -0,0 +1,91 @@
+import time
+import zlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .renderers import ORJSONRenderer
+
+# Versioned read-through cache for the public service catalog (CATALOG_CACHE_ENABLED).
+# The version is a nanosecond timestamp, so it doubles as the Last-Modified value.
+# Without the cache every request builds its slice and the ETag is a checksum of the body.
+CATALOG_VERSION_KEY = "catalog:version"
+CATALOG_CACHE_TIMEOUT = getattr(settings, "CATALOG_CACHE_TIMEOUT", 60 * 60)
+
+_MISSING = object()
+
+
+def get_catalog_version():
+    """Return the current catalog version, initialising it if the cache was cleared."""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(CATALOG_VERSION_KEY, version, None):
+            version = cache.get(CATALOG_VERSION_KEY, version)
+    return version
+
+
+async def aget_catalog_version():
+    version = await cache.aget(CATALOG_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not await cache.aadd(CATALOG_VERSION_KEY, version, None):
+            version = await cache.aget(CATALOG_VERSION_KEY, version)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog entry by moving to a new version."""
+    current = cache.get(CATALOG_VERSION_KEY) or 0
+    version = max(time.time_ns(), current + 1)
+    cache.set(CATALOG_VERSION_KEY, version, None)
+    return version
+
+
+def catalog_cache_key(name, params=None, version=None):
+    """Build the cache key for one catalog slice (list, detail or category)."""
+    if version is None:
+        version = get_catalog_version()
+    query = urlencode(sorted((params or {}).items()))
+    return f"catalog:{version}:{name}:{query}"
+
+
+async def cached_catalog_response(request, name, builder, params=None):
+    """
+    Serve a catalog slice from cache, awaiting `builder()` on a miss.
+    Returns a 304 when the client already holds the current version.
+    """
+    if not getattr(settings, "CATALOG_CACHE_ENABLED", False):
+        return await uncached_catalog_response(request, builder)
+    version = await aget_catalog_version()
+    key = catalog_cache_key(name, params, version)
+    etag = f'"{version:x}-{zlib.crc32(key.encode()):x}"'
+    last_modified = version // 1_000_000_000
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        data = await cache.aget(key, _MISSING)
+        if data is _MISSING:
+            data = await builder()
+            await cache.aset(key, data, CATALOG_CACHE_TIMEOUT)
+        response = HttpResponse(ORJSONRenderer().render(data), content_type="application/json")
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+    return response
+
+
+async def uncached_catalog_response(request, builder):
+    body = ORJSONRenderer().render(await builder())
+    etag = f'"{zlib.crc32(body):x}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+    return response
@@ -0,0 +1,297 @@
+import datetime
+import json
+
+from django import forms
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.utils import get_fields_from_path, get_last_value_from_parameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import DateTimeField, Q
+from django.utils import formats, timezone
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.utils.text import capfirst
+from django.utils.translation import gettext_lazy as _
+
+# Admin changelists for tables too big to COUNT(*) or OFFSET through on every page view.
+# LargeTableAdmin pages through the list's default ordering by keyset (`?cursor=`), shows the
+# database's row estimate for unfiltered lists of at least ADMIN_ESTIMATED_COUNT_MIN_ROWS rows
+# and filters foreign keys with an autocomplete widget instead of listing every related row.
+# Its date drill-down offers every year, month or day between the first and last matching
+# date, found with two index seeks, instead of only those holding rows (a DISTINCT scan).
+ADMIN_ESTIMATED_COUNT_MIN_ROWS = getattr(settings, "ADMIN_ESTIMATED_COUNT_MIN_ROWS", 100_000)
+CURSOR_VAR = "cursor"
+
+
+def estimated_row_count(model, using):
+    """The database's own estimate of the rows in `model`'s table, or None when it keeps none."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            # -1 until the table is first vacuumed or analyzed
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)",
+                           [connection.ops.quote_name(table)])
+        elif connection.vendor == "mysql":
+            cursor.execute("SELECT table_rows FROM information_schema.tables "
+                           "WHERE table_schema = DATABASE() AND table_name = %s", [table])
+        elif connection.vendor == "sqlite":
+            # Written by ANALYZE; each row's stat starts with the table's row count
+            try:
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+            except DatabaseError:  # Never analyzed: no sqlite_stat1 table
+                return None
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Counts an unfiltered queryset from the row estimate once the table is big enough to make COUNT(*) slow."""
+    estimated = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= ADMIN_ESTIMATED_COUNT_MIN_ROWS:
+                self.estimated = True
+                return estimate
+        return super().count
+
+
+def keyset_filter(ordering, position, backwards=False):
+    """Rows after `position` in `ordering` (before it, when paging backwards)."""
+    after = Q()
+    for index, (field, descending) in enumerate(ordering):
+        equal = {earlier.name: value for (earlier, _), value in zip(ordering[:index], position)}
+        after |= Q(**equal, **{f"{field.name}__{'lt' if descending != backwards else 'gt'}": position[index]})
+    # The redundant bound on the leading column gives the database an index range to scan
+    (leading, descending), value = ordering[0], position[0]
+    return Q(**{f"{leading.name}__{'lte' if descending != backwards else 'gte'}": value}) & after
+
+
+def encode_cursor(ordering, obj, backwards=False):
+    position = [field.value_to_string(obj) for field, _ in ordering]
+    return urlsafe_base64_encode(json.dumps([int(backwards), position]).encode())
+
+
+def decode_cursor(cursor, ordering):
+    """(backwards, position) from a cursor; ValueError, TypeError or ValidationError when it is malformed."""
+    backwards, position = json.loads(urlsafe_base64_decode(cursor))
+    if len(position) != len(ordering):
+        raise ValueError("Cursor does not match the list ordering.")
+    return bool(backwards), [field.to_python(value) for (field, _), value in zip(ordering, position)]
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Pages through the list's default ordering by keyset, so a page deep into the table costs what the
+    first one does. Sorting by a column, "Show all" and editable lists fall back to numbered pages.
+    """
+    cursor = None
+    keyset_pagination = False
+    result_count_estimated = False
+    first_page_url = previous_page_url = next_page_url = None
+
+    def get_queryset(self, request, exclude_parameters=None):
+        # Like the page number, the cursor is not a lookup and no filter or sorting link should keep it
+        if CURSOR_VAR in self.params:
+            self.cursor = self.params.pop(CURSOR_VAR)
+            del self.filter_params[CURSOR_VAR]
+        return super().get_queryset(request, exclude_parameters)
+
+    def get_keyset_ordering(self):
+        """The list ordering as (field, descending) pairs, or None when it cannot be paged by keyset."""
+        if ORDER_VAR in self.params or self.show_all or self.list_editable:
+            return None
+        ordering = []
+        for name in self.queryset.query.order_by:
+            if not isinstance(name, str):
+                return None
+            descending, name = name.startswith("-"), name.lstrip("-")
+            try:
+                field = self.lookup_opts.pk if name == "pk" else self.lookup_opts.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            if not field.concrete or field.is_relation or field.null:
+                return None
+            ordering.append((field, descending))
+        return ordering or None
+
+    def get_results(self, request):
+        ordering = self.get_keyset_ordering()
+        if ordering is None:
+            return super().get_results(request)
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        queryset, backwards = self.queryset, False
+        if self.cursor:
+            try:
+                backwards, position = decode_cursor(self.cursor, ordering)
+            except (TypeError, ValueError, ValidationError):
+                raise IncorrectLookupParameters
+            queryset = queryset.filter(keyset_filter(ordering, position, backwards))
+            if backwards:
+                queryset = queryset.reverse()
+        # One extra row tells whether there is a page beyond this one
+        result_list = list(queryset[:self.list_per_page + 1])
+        more = len(result_list) > self.list_per_page
+        del result_list[self.list_per_page:]
+        if backwards:
+            result_list.reverse()
+        has_previous = more if backwards else bool(self.cursor)
+        has_next = bool(self.cursor) if backwards else more
+        if result_list and has_previous:
+            self.first_page_url = self.get_query_string()
+            self.previous_page_url = self.get_query_string({CURSOR_VAR: encode_cursor(ordering, result_list[0], True)})
+        if result_list and has_next:
+            self.next_page_url = self.get_query_string({CURSOR_VAR: encode_cursor(ordering, result_list[-1])})
+
+        self.result_count = paginator.count
+        self.result_count_estimated = getattr(paginator, "estimated", False)
+        self.show_full_result_count = self.model_admin.show_full_result_count
+        if self.show_full_result_count:
+            self.full_result_count = self.root_queryset.count()
+        else:
+            # An estimate is only ever the unfiltered count, so the search bar need not repeat it
+            self.full_result_count = self.result_count if self.result_count_estimated else None
+        self.show_admin_actions = not self.show_full_result_count or bool(self.full_result_count)
+        self.result_list = result_list
+        self.can_show_all = False
+        self.multi_page = False
+        self.paginator = paginator
+        self.keyset_pagination = True
+
+    def get_date_hierarchy(self):
+        """The context of Django's `date_hierarchy` tag, without reading every row's date."""
+        field_name = self.date_hierarchy
+        year_field, month_field, day_field = (f"{field_name}__{part}" for part in ("year", "month", "day"))
+        year, month, day = (self.params.get(name) for name in (year_field, month_field, day_field))
+
+        def link(filters):
+            return self.get_query_string(filters, [f"{field_name}__"])
+
+        if year and month and day:
+            day = datetime.date(int(year), int(month), int(day))
+            return {
+                "show": True,
+                "back": {
+                    "link": link({year_field: year, month_field: month}),
+                    "title": capfirst(formats.date_format(day, "YEAR_MONTH_FORMAT")),
+                },
+                "choices": [{"title": capfirst(formats.date_format(day, "MONTH_DAY_FORMAT"))}],
+            }
+        first, last = self.date_bounds(field_name)
+        if first and not year and first.year == last.year:
+            year = str(first.year)
+            if first.month == last.month:
+                month = str(first.month)
+        if year and month:
+            days = [first + datetime.timedelta(days=n) for n in range((last - first).days + 1)] if first else []
+            return {
+                "show": True,
+                "back": {"link": link({year_field: year}), "title": year},
+                "choices": [
+                    {
+                        "link": link({year_field: year, month_field: month, day_field: str(date.day)}),
+                        "title": capfirst(formats.date_format(date, "MONTH_DAY_FORMAT")),
+                    }
+                    for date in days
+                ],
+            }
+        if year:
+            months = [datetime.date(first.year, number, 1) for number in range(first.month, last.month + 1)] if first else []
+            return {
+                "show": True,
+                "back": {"link": link({}), "title": _("All dates")},
+                "choices": [
+                    {
+                        "link": link({year_field: year, month_field: str(date.month)}),
+                        "title": capfirst(formats.date_format(date, "YEAR_MONTH_FORMAT")),
+                    }
+                    for date in months
+                ],
+            }
+        years = range(first.year, last.year + 1) if first else []
+        return {
+            "show": True,
+            "back": None,
+            "choices": [{"link": link({year_field: str(number)}), "title": str(number)} for number in years],
+        }
+
+    def date_bounds(self, field_name):
+        """The first and last date in the list, or (None, None) when it is empty."""
+        field = get_fields_from_path(self.model, field_name)[-1]
+        bounds = []
+        for order in (field_name, f"-{field_name}"):
+            value = self.queryset.order_by(order).values_list(field_name, flat=True).first()
+            if value is None:
+                return None, None
+            if isinstance(field, DateTimeField):
+                value = (timezone.localtime(value) if timezone.is_aware(value) else value).date()
+            bounds.append(value)
+        return bounds
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Filters by one related object picked with the admin's autocomplete widget, rather than listing
+    every related row in the sidebar. The related model's admin must define `search_fields`.
+    Use as `list_filter = [("user", AutocompleteFilter)]`.
+    """
+    template = "admin/owm/autocomplete_filter.html"
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f"{field_path}__{field.target_field.name}__exact"
+        self.lookup_val = get_last_value_from_parameters(params, self.lookup_kwarg)
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.form_field = field.formfield(widget=AutocompleteSelect(field, model_admin.admin_site), required=False)
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def choices(self, changelist):
+        yield {
+            "selected": self.lookup_val is None,
+            "query_string": changelist.get_query_string(remove=[self.lookup_kwarg]),
+            "display": _("All"),
+        }
+
+    def get_facet_counts(self, pk_attname, filtered_qs):
+        # A count per related row is what this filter exists to avoid
+        return {}
+
+    def widget(self):
+        """The autocomplete select, showing the current choice (one query when there is one)."""
+        return self.form_field.widget.render(self.lookup_kwarg, self.lookup_val, {"id": f"id_filter_{self.field_path}"})
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    ModelAdmin for tables with millions of rows. Give `ordering` and `date_hierarchy` an index, select
+    the related objects shown with `list_select_related` and filter foreign keys with AutocompleteFilter.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = "admin/owm/large_table_change_list.html"
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    @property
+    def media(self):
+        return (
+            super().media
+            + AutocompleteSelect(None, self.admin_site).media
+            + forms.Media(js=["admin/js/jquery.init.js", "admin/owm/js/autocomplete_filter.js"])
+        )
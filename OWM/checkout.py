@@ -0,0 +1,93 @@
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q
+
+from .consumers import notify_availability, notify_user
+from .metrics import BOOKINGS_CREATED
+from .models import Booking, Cart
+from .occupancy import mark_booked_many
+from .serializers import BookingSerializer
+
+BOOKED = "booked"
+CONFLICT = "conflict"
+
+
+def checkout_cart(user):
+    """
+    Book every item in `user`'s cart in one transaction, with a fixed number of queries
+    however large the cart is. Items whose slot is already taken (or that repeat another
+    item's slot) stay in the cart. Returns one result dict per cart item, in cart order.
+
+    Raises IntegrityError if another request books one of the slots between the conflict
+    check and the insert; nothing is written in that case.
+    """
+    with transaction.atomic():
+        items = list(Cart.objects.select_for_update().filter(user_id=user.pk).order_by("id"))
+        if not items:
+            return []
+
+        slots = {(item.service_id, item.event_date) for item in items}
+        taken = set(
+            Booking.objects.filter(slot_filter(slots)).values_list("service_id", "event_date")
+        )
+
+        to_book = []
+        for item in items:
+            slot = (item.service_id, item.event_date)
+            if slot not in taken:
+                taken.add(slot)  # A second cart item for the same slot is a conflict too
+                to_book.append(item)
+
+        if not to_book:
+            return [item_result(item) for item in items]
+
+        # bulk_create sends no signals, so the occupancy index and the socket
+        # notifications that Booking's post_save handler provides are done here
+        Booking.objects.bulk_create([
+            Booking(
+                user_id=user.pk,
+                service_id=item.service_id,
+                event_date=item.event_date,
+                event_time=item.event_time,
+                event_location=item.event_location,
+            )
+            for item in to_book
+        ])
+        booked_slots = [(item.service_id, item.event_date) for item in to_book]
+        mark_booked_many(booked_slots)
+
+        # Not every backend returns primary keys from bulk_create; the slot is unique, so re-read by it
+        bookings = {
+            (booking.service_id, booking.event_date): booking
+            for booking in Booking.objects.for_serializer().filter(slot_filter(booked_slots))
+        }
+        Cart.objects.filter(pk__in=[item.pk for item in to_book]).delete()
+
+        booked = {item.pk: BookingSerializer(bookings[(item.service_id, item.event_date)]).data for item in to_book}
+        payloads = [{"type": "booking", "action": "saved", "booking": booking} for booking in booked.values()]
+
+        def push():
+            BOOKINGS_CREATED.labels("checkout").inc(len(booked_slots))
+            for payload in payloads:
+                notify_user(user.pk, payload)
+            for service_id, event_date in booked_slots:
+                notify_availability(service_id, event_date, available=False)
+
+        transaction.on_commit(push)
+
+    return [item_result(item, booked.get(item.pk)) for item in items]
+
+
+def slot_filter(slots):
+    return reduce(or_, (Q(service_id=service_id, event_date=event_date) for service_id, event_date in slots))
+
+
+def item_result(item, booking=None):
+    result = {"cart_item": item.pk, "service": item.service_id, "event_date": item.event_date}
+    if booking is None:
+        result.update(status=CONFLICT, error="Service already booked on this date.")
+    else:
+        result.update(status=BOOKED, booking=booking)
+    return result
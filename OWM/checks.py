@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Cache backends whose entries only the process that wrote them can see
+PROCESS_LOCAL_CACHES = {
+    "django.core.cache.backends.dummy.DummyCache",
+    "django.core.cache.backends.locmem.LocMemCache",
+}
+
+
+def cache_is_shared(alias="default"):
+    """Whether every app process reads and writes the same `alias` cache."""
+    return settings.CACHES[alias]["BACKEND"] not in PROCESS_LOCAL_CACHES
+
+
+@register(Tags.caches)
+def check_catalog_cache(app_configs, **kwargs):
+    if getattr(settings, "CATALOG_CACHE_ENABLED", False) and not cache_is_shared():
+        return [
+            Error(
+                "CATALOG_CACHE_ENABLED needs a cache shared by every process.",
+                hint="Set CACHE_URL to a Redis server, or turn CATALOG_CACHE_ENABLED off.",
+                id="OWM.E001",
+            )
+        ]
+    return []
@@ -0,0 +1,99 @@
+from urllib.parse import parse_qs
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from channels.middleware import BaseMiddleware
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import is_revoked
+
+# Groups every connection joins: one per user, plus a shared one for slot availability
+AVAILABILITY_GROUP = "availability"
+
+
+def user_group(user_id):
+    return f"user_{user_id}"
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Authenticates a WebSocket handshake with a simplejwt access token taken from
+    `?token=` (browsers cannot set headers on WebSockets) or the access_token cookie.
+    Sets scope["user_id"], or None when the token is missing, invalid or revoked.
+    """
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope, user_id=None)
+        params = parse_qs(scope.get("query_string", b"").decode())
+        token = params.get("token", [None])[0] or scope.get("cookies", {}).get("access_token")
+        if token:
+            try:
+                access = AccessToken(token)
+                if not await database_sync_to_async(is_revoked)(access):
+                    scope["user_id"] = access[api_settings.USER_ID_CLAIM]
+            except (TokenError, KeyError):
+                pass
+        return await super().__call__(scope, receive, send)
+
+
+class UpdatesConsumer(AsyncJsonWebsocketConsumer):
+    """Pushes booking-status, cart and availability changes to a signed-in user."""
+
+    async def connect(self):
+        self.user_id = self.scope.get("user_id")
+        if self.user_id is None:
+            await self.close(code=4401)
+            return
+        self.groups_joined = [user_group(self.user_id), AVAILABILITY_GROUP]
+        for group in self.groups_joined:
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        for group in getattr(self, "groups_joined", []):
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        # Updates only flow server -> client; answer pings so proxies keep the socket open
+        if content.get("type") == "ping":
+            await self.send_json({"type": "pong"})
+
+    async def push_update(self, event):
+        await self.send_json(event["payload"])
+
+
+def notify(group, payload):
+    """
+    Send a delta to every socket in `group`; a no-op when no channel layer is configured.
+    `payload` may be a callable building it, only called when the group may have listeners.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None or not may_have_listeners(channel_layer, group):
+        return
+    if callable(payload):
+        payload = payload()
+    async_to_sync(channel_layer.group_send)(group, {"type": "push.update", "payload": payload})
+
+
+def may_have_listeners(channel_layer, group):
+    """False when the layer knows `group` is empty; only the in-memory layer can tell (shared layers span processes)."""
+    if isinstance(channel_layer, InMemoryChannelLayer):
+        return bool(channel_layer.groups.get(group))
+    return True
+
+
+def notify_user(user_id, payload):
+    notify(user_group(user_id), payload)
+
+
+def notify_availability(service_id, event_date, available):
+    notify(AVAILABILITY_GROUP, {
+        "type": "availability",
+        "service": service_id,
+        "event_date": str(event_date),
+        "available": available,
+    })
@@ -0,0 +1,115 @@
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+# Read replica routing. ReplicaRoutingMiddleware marks safe requests from clients that
+# have not written recently; ReplicaRouter sends their reads to a healthy replica.
+# Writes, reads inside a transaction and everything outside a marked request use the primary.
+# A replica that fails between health checks is marked unhealthy by failed_replicas() and
+# the middleware runs the request again on the primary.
+PRIMARY = "default"
+PIN_COOKIE = "owm_primary_pin"
+
+logger = logging.getLogger(__name__)
+
+_replicas_read = ContextVar("replicas_read", default=None)  # Replicas picked so far, or None: primary only
+_health = {}  # alias -> (healthy, checked_at)
+
+
+def replica_aliases():
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+def use_replicas(enabled):
+    """Allow (or stop) reads from replicas in the current context; returns a token for reset_replicas()."""
+    return _replicas_read.set(set() if enabled else None)
+
+
+def reset_replicas(token):
+    _replicas_read.reset(token)
+
+
+def failed_replicas():
+    """
+    The replicas read from in the current context whose connection has since raised an error,
+    each marked unhealthy until its next health check. Call from the thread that ran the query.
+    """
+    failed = [alias for alias in _replicas_read.get() or () if connections[alias].errors_occurred]
+    for alias in failed:
+        logger.warning("Read replica %s failed mid-request, reading from the primary", alias)
+        mark_replica(alias, False)
+    return failed
+
+
+def refresh_replica_health():
+    """
+    Ping every replica not checked in the last REPLICA_HEALTH_CHECK_INTERVAL seconds.
+    Runs from the middleware, in sync code: the router itself may be consulted from
+    async views, where it must not touch a connection.
+    """
+    if connections[PRIMARY].in_atomic_block:
+        return  # Reads stay on the primary inside a transaction
+    now = time.monotonic()
+    interval = getattr(settings, "REPLICA_HEALTH_CHECK_INTERVAL", 10)
+    for alias in replica_aliases():
+        healthy, checked_at = _health.get(alias, (None, 0.0))
+        if healthy is None or now - checked_at >= interval:
+            _health[alias] = (ping(alias), now)
+
+
+def replica_health_due():
+    """Whether refresh_replica_health() has a replica to ping; touches no connection, so async code may call it."""
+    now = time.monotonic()
+    interval = getattr(settings, "REPLICA_HEALTH_CHECK_INTERVAL", 10)
+    return any(
+        alias not in _health or now - _health[alias][1] >= interval
+        for alias in replica_aliases()
+    )
+
+
+def healthy_replicas():
+    return [alias for alias in replica_aliases() if _health.get(alias, (False,))[0]]
+
+
+def mark_replica(alias, healthy):
+    _health[alias] = (healthy, time.monotonic())
+
+
+def ping(alias):
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute("SELECT 1")
+        return True
+    except DatabaseError as e:
+        logger.warning("Read replica %s is unavailable, reading from the primary: %s", alias, e)
+        return False
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        replicas_read = _replicas_read.get()
+        if replicas_read is None or connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        healthy = healthy_replicas()
+        if not healthy:
+            return PRIMARY
+        alias = random.choice(healthy)
+        replicas_read.add(alias)
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive schema changes through replication
+        return db not in replica_aliases()
+
@@ -0,0 +1,168 @@
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+# Fixed-size derivatives of uploaded images, stored in the default media storage under
+# `derivatives/<original path without extension>/<size>.<format>`.
+# "fit" sizes are cropped to exactly that box, the others are only scaled down.
+IMAGE_DERIVATIVES = getattr(settings, "IMAGE_DERIVATIVES", {
+    "thumb": {"size": (160, 160), "fit": True},
+    "card": {"size": (640, 480), "fit": True},
+    "full": {"size": (1600, 1600), "fit": False},
+})
+DERIVATIVES_DIR = "derivatives"
+
+# Output formats, most efficient first; JPEG is always produced as the fallback
+DERIVATIVE_FORMATS = [
+    (ext, pil_format, options)
+    for ext, pil_format, feature, options in [
+        ("avif", "AVIF", "avif", {"quality": 60}),
+        ("webp", "WEBP", "webp", {"quality": 80, "method": 4}),
+        ("jpeg", "JPEG", None, {"quality": 82, "optimize": True, "progressive": True}),
+    ]
+    if feature is None or features.check(feature)
+]
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="owm-images")
+# Originals whose derivatives are known to exist (they are never removed once generated),
+# least recently checked first; the oldest are forgotten past MAX_REMEMBERED_IMAGES
+_generated = OrderedDict()
+_generated_lock = threading.Lock()
+# Originals found without derivatives -> when (time.monotonic()); another process may render them
+_missing = {}
+IMAGE_DERIVATIVES_MISS_TTL = getattr(settings, "IMAGE_DERIVATIVES_MISS_TTL", 30)
+MAX_REMEMBERED_IMAGES = 10_000
+
+
+def derivative_name(name, size, ext):
+    base, _ = os.path.splitext(name)
+    return f"{DERIVATIVES_DIR}/{base}/{size}.{ext}"
+
+
+def _completion_marker(name):
+    """Derivatives are written in order, so the last one marks the set as complete."""
+    size = list(IMAGE_DERIVATIVES)[-1]
+    return derivative_name(name, size, DERIVATIVE_FORMATS[-1][0])
+
+
+def has_derivatives(name, fresh=False):
+    """
+    Whether every derivative of `name` exists. A miss is remembered for IMAGE_DERIVATIVES_MISS_TTL
+    seconds, so listing images still being rendered (or that never will be) does not stat the
+    storage per row; `fresh` skips that memory.
+    """
+    if _known_generated(name):
+        return True
+    now = time.monotonic()
+    if not fresh and now - _missing.get(name, -IMAGE_DERIVATIVES_MISS_TTL) < IMAGE_DERIVATIVES_MISS_TTL:
+        return False
+    if default_storage.exists(_completion_marker(name)):
+        _remember_generated(name)
+        return True
+    if len(_missing) >= MAX_REMEMBERED_IMAGES:
+        _missing.clear()
+    _missing[name] = now
+    return False
+
+
+def _known_generated(name):
+    with _generated_lock:
+        if name not in _generated:
+            return False
+        _generated.move_to_end(name)
+        return True
+
+
+def _remember_generated(name):
+    with _generated_lock:
+        _generated[name] = True
+        _generated.move_to_end(name)
+        if len(_generated) > MAX_REMEMBERED_IMAGES:
+            _generated.popitem(last=False)
+    _missing.pop(name, None)
+
+
+def generate_derivatives(name, storage=default_storage, overwrite=False):
+    """
+    Render every size and format for one image read from `storage`.
+    Returns the names written.
+    """
+    if not overwrite and has_derivatives(name, fresh=True):
+        return []
+
+    with storage.open(name, "rb") as original:
+        image = ImageOps.exif_transpose(Image.open(original))
+        image.load()
+
+    written = []
+    for size, spec in IMAGE_DERIVATIVES.items():
+        if spec["fit"]:
+            resized = ImageOps.fit(image, spec["size"], Image.Resampling.LANCZOS)
+        else:
+            resized = image.copy()
+            resized.thumbnail(spec["size"], Image.Resampling.LANCZOS)
+
+        for ext, pil_format, options in DERIVATIVE_FORMATS:
+            frame = resized
+            if pil_format == "JPEG" and frame.mode not in ("RGB", "L"):
+                frame = frame.convert("RGB")
+            elif frame.mode not in ("RGB", "RGBA", "L"):
+                frame = frame.convert("RGBA")
+            buffer = io.BytesIO()
+            frame.save(buffer, pil_format, **options)
+
+            target = derivative_name(name, size, ext)
+            if default_storage.exists(target):
+                default_storage.delete(target)
+            written.append(default_storage.save(target, ContentFile(buffer.getvalue())))
+
+    _remember_generated(name)
+    return written
+
+
+def derivative_urls(field_file, request=None):
+    """
+    `srcset`-style map of derivative URLs for an image field, e.g.
+    {"thumb": {"webp": url, "jpeg": url}, ...}. Empty until the derivatives exist.
+    """
+    return derivative_urls_for_name(field_file.name if field_file else None, request)
+
+
+def derivative_urls_for_name(name, request=None):
+    """derivative_urls() from the stored file name, for rows read with values()."""
+    if not name or not has_derivatives(name):
+        return {}
+    urls = {}
+    for size in IMAGE_DERIVATIVES:
+        urls[size] = {}
+        for ext, _, _ in DERIVATIVE_FORMATS:
+            url = default_storage.url(derivative_name(name, size, ext))
+            urls[size][ext] = request.build_absolute_uri(url) if request is not None else url
+    return urls
+
+
+def schedule_derivatives(field_file, on_done=None):
+    """Generate derivatives on the background thread, off the request path."""
+    if field_file and not has_derivatives(field_file.name, fresh=True):
+        _executor.submit(_generate_in_thread, field_file.name, field_file.storage, on_done)
+
+
+def _generate_in_thread(name, storage, on_done):
+    try:
+        generate_derivatives(name, storage)
+    except Exception:
+        logger.exception("Could not generate derivatives for %s", name)
+        return
+    if on_done is not None:
+        on_done()
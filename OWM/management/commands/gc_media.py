@@ -0,0 +1,103 @@
+import os
+import time
+from collections import Counter
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import models
+from django.db.models import Count
+
+from OWM.images import DERIVATIVES_DIR
+from OWM.storage import ContentAddressedStorage
+
+
+class Command(BaseCommand):
+    help = "Reference-count content-addressed media blobs and delete the ones no row uses."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Report orphans without deleting them.")
+        parser.add_argument(
+            "--grace", type=int, default=3600,
+            help="Keep orphans younger than this many seconds (uploads not yet committed).",
+        )
+        parser.add_argument(
+            "--adopt-legacy", action="store_true",
+            help="Move files saved before content addressing into the store and collect the old copies.",
+        )
+
+    def handle(self, *args, **options):
+        fields = [
+            (model, field)
+            for model in apps.get_app_config("OWM").get_models()
+            for field in model._meta.get_fields()
+            if isinstance(field, models.FileField) and isinstance(field.storage, ContentAddressedStorage)
+        ]
+
+        if options["adopt_legacy"] and not options["dry_run"]:
+            self.adopt_legacy(fields)
+
+        refcounts = Counter()
+        for model, field in fields:
+            rows = model.objects.exclude(**{field.name: ""}).values(field.name).annotate(refs=Count("pk")).order_by()
+            for row in rows:
+                refcounts[row[field.name]] += row["refs"]
+
+        cutoff = time.time() - options["grace"]
+        removed = freed = 0
+        for model, field in fields:
+            storage = field.storage
+            for name in self.stored_names(storage, field.upload_to):
+                if refcounts[name]:
+                    continue
+                if not storage.is_hashed_name(name) and not options["adopt_legacy"]:
+                    continue
+                path = storage.path(name)
+                if os.path.getmtime(path) > cutoff:
+                    continue
+                if not options["dry_run"]:
+                    # An upload may have reused the blob since the refcount pass: look again, last thing
+                    if self.is_referenced(fields, name) or os.path.getmtime(path) > cutoff:
+                        continue
+                size = os.path.getsize(path)
+                self.stdout.write(f"{'Would remove' if options['dry_run'] else 'Removing'} {name} ({size} bytes)")
+                if not options["dry_run"]:
+                    storage.delete(name)
+                    self.remove_derivatives(name)
+                removed += 1
+                freed += size
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(refcounts)} referenced blob(s); {removed} orphan(s), {freed} bytes "
+            f"{'reclaimable' if options['dry_run'] else 'reclaimed'}."
+        ))
+
+    def adopt_legacy(self, fields):
+        for model, field in fields:
+            storage = field.storage
+            names = model.objects.exclude(**{field.name: ""}).values_list(field.name, flat=True).distinct()
+            for name in list(names):
+                if storage.is_hashed_name(name) or not storage.exists(name):
+                    continue
+                with storage.open(name, "rb") as legacy:
+                    hashed = storage.save(name, legacy)
+                model.objects.filter(**{field.name: name}).update(**{field.name: hashed})
+
+    def is_referenced(self, fields, name):
+        return any(model.objects.filter(**{field.name: name}).exists() for model, field in fields)
+
+    def stored_names(self, storage, upload_to):
+        """Every file under an upload directory, as storage-relative names."""
+        directory = upload_to.strip("/")
+        root = storage.path(directory)
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                yield os.path.relpath(os.path.join(dirpath, filename), storage.location).replace(os.sep, "/")
+
+    def remove_derivatives(self, name):
+        base, _ = os.path.splitext(name)
+        directory = default_storage.path(f"{DERIVATIVES_DIR}/{base}")
+        if os.path.isdir(directory):
+            for filename in os.listdir(directory):
+                os.remove(os.path.join(directory, filename))
+            os.rmdir(directory)
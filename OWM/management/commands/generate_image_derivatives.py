@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from OWM.catalog import bump_catalog_version
+from OWM.images import generate_derivatives
+from OWM.models import CustomUser, Service, TeamMember
+
+
+class Command(BaseCommand):
+    help = "Backfill thumbnail/card/full image derivatives for existing uploads."
+
+    IMAGE_FIELDS = [(Service, "image"), (TeamMember, "profile_pic"), (CustomUser, "profile_pic")]
+
+    def add_arguments(self, parser):
+        parser.add_argument("--overwrite", action="store_true", help="Regenerate derivatives that already exist.")
+
+    def handle(self, *args, **options):
+        generated = failed = 0
+        for model, field_name in self.IMAGE_FIELDS:
+            names = (
+                model.objects.exclude(**{field_name: ""}).exclude(**{f"{field_name}__isnull": True})
+                .values_list(field_name, flat=True).distinct()
+            )
+            storage = model._meta.get_field(field_name).storage
+            for name in names.iterator():
+                try:
+                    if generate_derivatives(name, storage, overwrite=options["overwrite"]):
+                        generated += 1
+                except (OSError, ValueError) as e:
+                    failed += 1
+                    self.stderr.write(f"Skipping {name}: {e}")
+
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f"Generated derivatives for {generated} image(s), {failed} failed."))
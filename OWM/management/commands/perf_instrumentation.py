@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from OWM.checks import cache_is_shared
+from OWM.perf import get_perf_config, reset_perf_config, set_perf_config
+
+
+class Command(BaseCommand):
+    help = (
+        "Switch the request instrumentation on or off at runtime, or change the cProfile sample rate. "
+        "Needs PERF_INSTRUMENTATION=True at startup and a cache shared by the app processes."
+    )
+
+    def add_arguments(self, parser):
+        toggle = parser.add_mutually_exclusive_group()
+        toggle.add_argument("--on", action="store_true", help="Start instrumenting requests.")
+        toggle.add_argument("--off", action="store_true", help="Stop instrumenting requests.")
+        toggle.add_argument("--reset", action="store_true", help="Drop runtime overrides and go back to the settings.")
+        parser.add_argument("--sample-rate", type=float, help="Fraction of requests to profile with cProfile (0-1).")
+
+    def handle(self, *args, **options):
+        overrides = {}
+        if options["on"] or options["off"]:
+            overrides["enabled"] = options["on"]
+        if options["sample_rate"] is not None:
+            overrides["profile_sample_rate"] = min(max(options["sample_rate"], 0.0), 1.0)
+
+        if (overrides or options["reset"]) and not cache_is_shared():
+            raise CommandError("The app processes do not share a cache, so they would never see the change. Set CACHE_URL.")
+
+        if options["reset"]:
+            reset_perf_config()
+        if overrides:
+            set_perf_config(**overrides)
+        config = get_perf_config()
+        self.stdout.write(
+            f"Instrumentation {'on' if config['enabled'] else 'off'}, "
+            f"profiling {config['profile_sample_rate']:.0%} of requests."
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from OWM.occupancy import rebuild_occupancy
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-service monthly occupancy bitmaps from the booking table."
+
+    def handle(self, *args, **options):
+        months = rebuild_occupancy()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt occupancy for {months} service-month(s)."))
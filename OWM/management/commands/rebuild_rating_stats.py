@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from OWM.catalog import bump_catalog_version
+from OWM.models import Review, Service
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized per-service rating stats from the review table."
+
+    def handle(self, *args, **options):
+        stats = {}
+        rows = Review.objects.filter(rating__in=Service.RATING_VALUES).values("service_id", "rating").annotate(total=Count("id"))
+        for row in rows.order_by():
+            stats.setdefault(row["service_id"], {})[row["rating"]] = row["total"]
+
+        services = list(Service.objects.only("id", *Service.RATING_FIELDS))
+        for service in services:
+            histogram = stats.get(service.pk, {})
+            for value in Service.RATING_VALUES:
+                setattr(service, f"rating_{value}", histogram.get(value, 0))
+            service.rating_count = sum(histogram.values())
+            service.rating_sum = sum(value * total for value, total in histogram.items())
+
+        with transaction.atomic():
+            Service.objects.bulk_update(services, Service.RATING_FIELDS, batch_size=500)
+            transaction.on_commit(bump_catalog_version)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rating stats for {len(services)} services."))
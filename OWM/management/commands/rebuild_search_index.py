@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from OWM.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search index from the service, review and team member tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Documents indexed per batch.")
+
+    def handle(self, *args, **options):
+        documents = rebuild_search_index(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {documents} document(s)."))
@@ -0,0 +1,85 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from OWM.benchmark import (
+    CONNECTION_SCENARIOS, SCENARIOS, WSGI_THREADS, format_connection_report, format_report, format_serializer_report,
+    run_benchmark, run_connection_benchmark, run_serializer_benchmark, write_report,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run API scenarios in-process against seeded data (see seed_benchmark) and report "
+        "throughput, latency percentiles and query counts, optionally as JSON for comparing commits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scenarios", help="Comma-separated scenario names (default: every default scenario).")
+        parser.add_argument("--list", action="store_true", help="List the scenarios and exit.")
+        parser.add_argument("--requests", type=int, default=200, help="Timed requests per scenario.")
+        parser.add_argument("--warmup", type=int, default=10, help="Untimed requests per scenario first.")
+        parser.add_argument("--concurrency", type=int, default=1, help="Client threads per scenario.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed for user and service choices.")
+        parser.add_argument("--output", help="Write the full report as JSON to this path ('-' for stdout).")
+        parser.add_argument(
+            "--serializers", action="store_true",
+            help="Instead of the scenarios, compare ModelSerializer and flat serializer CPU time and memory per list.",
+        )
+        parser.add_argument(
+            "--asgi-vs-wsgi", action="store_true",
+            help=f"Instead, run {', '.join(CONNECTION_SCENARIOS)} with many open connections under ASGI and WSGI "
+                 "(--requests is then the total per run).",
+        )
+        parser.add_argument("--connections", type=int, default=500, help="Open connections for --asgi-vs-wsgi.")
+        parser.add_argument(
+            "--wsgi-threads", type=int, default=WSGI_THREADS, help="WSGI worker threads for --asgi-vs-wsgi.",
+        )
+        parser.add_argument("--rows", type=int, default=10_000, help="Rows per list for --serializers.")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per list for --serializers (best is kept).")
+
+    def handle(self, *args, **options):
+        if options["list"]:
+            for name, scenario in SCENARIOS.items():
+                flag = "" if scenario.default else " (not run by default)"
+                self.stdout.write(f"{name:<18}{scenario.description}{flag}")
+            return
+
+        log = lambda line: self.stderr.write(line) if options["verbosity"] > 0 else None
+        if options["serializers"]:
+            report = run_serializer_benchmark(options["rows"], options["repeat"], log=log)
+            return self.write(report, format_serializer_report, options["output"])
+
+        available = CONNECTION_SCENARIOS if options["asgi_vs_wsgi"] else SCENARIOS
+        if options["scenarios"]:
+            names = [name.strip() for name in options["scenarios"].split(",") if name.strip()]
+            unknown = [name for name in names if name not in available]
+            if unknown:
+                raise CommandError(f"Unknown scenarios: {', '.join(unknown)}. See --list.")
+        else:
+            names = list(CONNECTION_SCENARIOS) if options["asgi_vs_wsgi"] else [
+                name for name, scenario in SCENARIOS.items() if scenario.default
+            ]
+
+        if options["asgi_vs_wsgi"]:
+            report = run_connection_benchmark(
+                names, options["connections"], options["requests"], options["wsgi_threads"], options["warmup"], log=log,
+            )
+            return self.write(report, format_connection_report, options["output"])
+
+        try:
+            report = run_benchmark(
+                names, options["requests"], options["warmup"], options["concurrency"], options["seed"], log=log,
+            )
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        self.write(report, format_report, options["output"])
+
+    def write(self, report, format, output):
+        if output == "-":
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(format(report))
+        if output:
+            write_report(report, output)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {output}"))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from OWM.outbox import flush_outbox
+
+
+class Command(BaseCommand):
+    help = "Deliver queued contact emails, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Flush the outbox once and exit.")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds to sleep between polls.")
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            sent = flush_outbox()
+            if sent:
+                self.stdout.write(f"Sent {sent} contact email(s).")
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from OWM.benchmark import FULL_SCALE, reset_benchmark_data, scaled_counts, seed_benchmark_data
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed benchmark data: at --scale 1.0, "
+        + ", ".join(f"{count:,} {name}" for name, count in FULL_SCALE.items())
+        + ". Use a throwaway database, e.g. DB_ENGINE=sqlite3 DB_NAME=bench.sqlite3."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", type=float, default=1.0, help="Fraction of the full volumes to create.")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per bulk insert.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed, for repeatable data.")
+        parser.add_argument("--reset", action="store_true", help="Delete previously seeded rows first.")
+
+    def handle(self, *args, **options):
+        if options["reset"]:
+            reset_benchmark_data()
+            self.stdout.write("Removed previous benchmark data.")
+        counts = scaled_counts(options["scale"])
+        self.stdout.write("Seeding " + ", ".join(f"{count:,} {name}" for name, count in counts.items()) + " ...")
+        seed_benchmark_data(
+            options["scale"], options["batch_size"], options["seed"],
+            log=lambda line: self.stdout.write(line) if options["verbosity"] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS("Benchmark data ready."))
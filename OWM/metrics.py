@@ -0,0 +1,49 @@
+import os
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# Prometheus metrics for the API. With several worker processes, export
+# PROMETHEUS_MULTIPROC_DIR (an empty, writable directory) before the workers start:
+# every process then writes its samples to memory-mapped files there and /metrics
+# aggregates them. Without it, each process reports only its own numbers.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUESTS = Counter(
+    "owm_http_requests_total", "HTTP requests by URL name, method and status code.",
+    ["view", "method", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "owm_http_request_duration_seconds", "Time spent handling a request, by URL name and method.",
+    ["view", "method"], buckets=LATENCY_BUCKETS,
+)
+EXCEPTIONS = Counter(
+    "owm_http_exceptions_total", "Unhandled exceptions raised by views, by URL name and type.",
+    ["view", "exception"],
+)
+DB_QUERIES = Counter("owm_db_queries_total", "Database queries run while handling requests.", ["view"])
+DB_CONNECTIONS = Gauge(
+    "owm_db_connections_open", "Database connections currently held open by the workers.",
+    multiprocess_mode="livesum",
+)
+
+BOOKINGS_CREATED = Counter("owm_bookings_created_total", "Bookings committed, by how they were made.", ["source"])
+CART_ADDS = Counter("owm_cart_adds_total", "Services added to a cart.")
+EMAILS_SENT = Counter("owm_emails_sent_total", "Contact notification emails delivered.")
+EMAIL_FAILURES = Counter("owm_email_failures_total", "Contact notification email attempts that failed.")
+
+
+def render_metrics():
+    """Return (body, content_type) in the Prometheus text exposition format."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def view_label(request):
+    """Label requests by URL name; unmatched paths share one label to keep cardinality bounded."""
+    match = request.resolver_match
+    return (match.url_name or match.view_name) if match else "unresolved"
@@ -0,0 +1,374 @@
+import cProfile
+import json
+import logging
+import mimetypes
+import os
+import random
+import re
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.http import FileResponse, HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .db_router import (
+    PIN_COOKIE, failed_replicas, refresh_replica_health, replica_aliases, replica_health_due, reset_replicas,
+    use_replicas,
+)
+from .metrics import DB_CONNECTIONS, DB_QUERIES, EXCEPTIONS, REQUEST_LATENCY, REQUESTS, view_label
+from .perf import QueryRecorder, aget_perf_config, dump_profile, get_perf_config, observe_queries
+from .storage import ContentAddressedStorage
+
+perf_logger = logging.getLogger("OWM.perf")
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class HybridMiddleware:
+    """
+    Base for middleware that runs natively under both WSGI and ASGI. Django hands it a sync or an
+    async `get_response` to match the stack; `__call__` serves the first and `__acall__` the second,
+    so ASGI requests are not moved onto a thread to pass through it.
+    """
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+
+class MediaFilesMiddleware(HybridMiddleware):
+    """
+    Serves MEDIA_URL before the rest of the middleware stack runs. Full responses
+    use FileResponse, so the WSGI server can send them with sendfile. Also handles
+    single byte ranges, conditional GETs, and immutable caching for content-addressed names.
+    Under ASGI the file is stat'ed and read in worker threads and streamed asynchronously.
+    """
+    chunk_size = 64 * 1024
+
+    def __init__(self, get_response):
+        if not getattr(settings, "SERVE_MEDIA", settings.DEBUG):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.prefix = settings.MEDIA_URL
+        self.root = settings.MEDIA_ROOT
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not request.path.startswith(self.prefix):
+            return self.get_response(request)
+        return self.serve(request, request.path[len(self.prefix):])
+
+    async def __acall__(self, request):
+        if not request.path.startswith(self.prefix):
+            return await self.get_response(request)
+        return await sync_to_async(self.serve, thread_sensitive=False)(
+            request, request.path[len(self.prefix):], asynchronous=True,
+        )
+
+    def serve(self, request, name, asynchronous=False):
+        if request.method not in ("GET", "HEAD"):
+            return HttpResponseNotAllowed(["GET", "HEAD"])
+        try:
+            path = safe_join(self.root, name)
+            stat = os.stat(path)
+        except (SuspiciousFileOperation, OSError):
+            return HttpResponse(status=404)
+        if not os.path.isfile(path):
+            return HttpResponse(status=404)
+
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+        if response is None:
+            response = self.file_response(request, path, stat.st_size, etag, asynchronous)
+
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(stat.st_mtime)
+        response["Accept-Ranges"] = "bytes"
+        if ContentAddressedStorage.is_hashed_name(name):
+            patch_cache_control(response, public=True, max_age=365 * 24 * 60 * 60, immutable=True)
+        else:
+            patch_cache_control(response, public=True, max_age=getattr(settings, "MEDIA_CACHE_MAX_AGE", 3600))
+        return response
+
+    def file_response(self, request, path, size, etag, asynchronous=False):
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        byte_range = self.requested_range(request, size, etag)
+
+        if byte_range == "unsatisfiable":
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+        if byte_range is None:
+            if request.method == "HEAD":
+                response = HttpResponse(content_type=content_type)
+                response["Content-Length"] = size
+                return response
+            if not asynchronous:
+                return FileResponse(open(path, "rb"), content_type=content_type)
+            response = StreamingHttpResponse(self.aread_range(path, 0, size), content_type=content_type)
+            response["Content-Length"] = size
+            return response
+
+        start, end = byte_range
+        length = end - start + 1
+        if request.method == "HEAD":
+            response = HttpResponse(status=206, content_type=content_type)
+        else:
+            chunks = self.aread_range(path, start, length) if asynchronous else self.read_range(path, start, length)
+            response = StreamingHttpResponse(chunks, status=206, content_type=content_type)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = length
+        return response
+
+    def requested_range(self, request, size, etag):
+        """Parse a single `Range: bytes=` header into (start, end), or None for the whole file."""
+        header = request.headers.get("Range")
+        if not header:
+            return None
+        if_range = request.headers.get("If-Range")
+        if if_range and if_range != etag:
+            return None
+        match = RANGE_RE.match(header.strip())
+        if not match:
+            return None  # Multiple or malformed ranges: serve the whole file
+        first, last = match.groups()
+        if not first and not last:
+            return None
+        if not first:
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        if start >= size or start > end:
+            return "unsatisfiable"
+        return start, end
+
+    def read_range(self, path, start, length):
+        with open(path, "rb") as f:
+            f.seek(start)
+            while length > 0:
+                chunk = f.read(min(self.chunk_size, length))
+                if not chunk:
+                    break
+                length -= len(chunk)
+                yield chunk
+
+    async def aread_range(self, path, start, length):
+        """read_range() for ASGI responses: each chunk is read in a worker thread."""
+        chunks = self.read_range(path, start, length)
+        read = sync_to_async(next, thread_sensitive=False)
+        try:
+            while (chunk := await read(chunks, None)) is not None:
+                yield chunk
+        finally:
+            chunks.close()
+
+
+class ReplicaRoutingMiddleware(HybridMiddleware):
+    """
+    Lets GET/HEAD/OPTIONS requests read from the replicas (see OWM.db_router). After a
+    successful write the client gets a short-lived cookie that keeps its reads on the
+    primary, so a user sees their own bookings and cart changes despite replication lag.
+    A request whose view fails on a replica's connection runs once more on the primary.
+    Removed at startup when no replicas are configured.
+    """
+    SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        use_replica = self.reads_from_replica(request)
+        if use_replica:
+            refresh_replica_health()
+        response = self.respond(request, use_replica)
+        if getattr(request, "replica_failed", False):
+            response = self.respond(request, False)
+        return self.pin_writer(request, response)
+
+    async def __acall__(self, request):
+        use_replica = self.reads_from_replica(request)
+        if use_replica and replica_health_due():
+            await sync_to_async(refresh_replica_health)()
+        response = await self.arespond(request, use_replica)
+        if getattr(request, "replica_failed", False):
+            response = await self.arespond(request, False)
+        return self.pin_writer(request, response)
+
+    def respond(self, request, use_replica):
+        token = use_replicas(use_replica)
+        try:
+            return self.get_response(request)
+        finally:
+            reset_replicas(token)
+
+    async def arespond(self, request, use_replica):
+        # Context variables follow the request into the threads its sync code runs in
+        token = use_replicas(use_replica)
+        try:
+            return await self.get_response(request)
+        finally:
+            reset_replicas(token)
+
+    def process_exception(self, request, exception):
+        # Runs on the view's thread, where the failed connection is; safe requests can simply run again
+        if isinstance(exception, OperationalError) and failed_replicas():
+            request.replica_failed = True
+            return HttpResponse(status=503)  # Replaced by the retry's response
+
+    def reads_from_replica(self, request):
+        return request.method in self.SAFE_METHODS and PIN_COOKIE not in request.COOKIES
+
+    def pin_writer(self, request, response):
+        if request.method not in self.SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                PIN_COOKIE, "1", max_age=getattr(settings, "REPLICA_PIN_SECONDS", 5),
+                httponly=True, samesite="Lax",
+            )
+        return response
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """
+    Feeds the Prometheus request metrics (see OWM.metrics): request counts and latency
+    by URL name, unhandled exceptions, and the number of queries and open connections.
+    Removed at startup when METRICS_ENABLED is off.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICS_ENABLED", True):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        queries = QueryCounter()
+        start = time.perf_counter()
+        with observe_queries(queries):
+            response = self.get_response(request)
+        self.observe(request, response, queries, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        queries = QueryCounter()
+        start = time.perf_counter()
+        with observe_queries(queries):
+            response = await self.get_response(request)
+        self.observe(request, response, queries, time.perf_counter() - start)
+        return response
+
+    def observe(self, request, response, queries, duration):
+        view = view_label(request)
+        REQUESTS.labels(view, request.method, response.status_code).inc()
+        REQUEST_LATENCY.labels(view, request.method).observe(duration)
+        if queries.count:
+            DB_QUERIES.labels(view).inc(queries.count)
+        DB_CONNECTIONS.set(sum(conn.connection is not None for conn in connections.all(initialized_only=True)))
+
+    def process_exception(self, request, exception):
+        EXCEPTIONS.labels(view_label(request), type(exception).__name__).inc()
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class PerfInstrumentationMiddleware(HybridMiddleware):
+    """
+    Measures each request: wall time, DB query count and time, response bytes and
+    repeated SQL statements. Adds a Server-Timing header, logs one JSON line to the
+    "OWM.perf" logger and, for a sample of requests, dumps a cProfile trace.
+    Under ASGI no trace is taken: cProfile only sees the event loop's thread, which
+    every in-flight request shares, and not the threads that run the sync code.
+
+    Without PERF_INSTRUMENTATION the middleware removes itself at startup. While it is
+    installed, `manage.py perf_instrumentation --off` turns it into a pass-through.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PERF_INSTRUMENTATION", False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        config = get_perf_config()
+        if not config["enabled"]:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        profile = cProfile.Profile() if random.random() < config["profile_sample_rate"] else None
+        start = time.perf_counter()
+        with observe_queries(recorder):
+            if profile is not None:
+                profile.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profile is not None:
+                    profile.disable()
+        return self.report(request, response, recorder, time.perf_counter() - start, profile)
+
+    async def __acall__(self, request):
+        config = await aget_perf_config()
+        if not config["enabled"]:
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with observe_queries(recorder):
+            response = await self.get_response(request)
+        return self.report(request, response, recorder, time.perf_counter() - start)
+
+    def report(self, request, response, recorder, duration, profile=None):
+        match = request.resolver_match
+        view = match.view_name if match else "unresolved"
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "view": view,
+            "status": response.status_code,
+            "duration_ms": round(duration * 1000, 2),
+            "db_queries": recorder.count,
+            "db_ms": round(recorder.duration * 1000, 2),
+            "response_bytes": None if response.streaming else len(response.content),
+            "duplicate_queries": sum(count - 1 for count in recorder.duplicates.values()),
+        }
+        if profile is not None:
+            record["profile"] = dump_profile(profile, view)
+
+        response["Server-Timing"] = (
+            f'app;dur={record["duration_ms"]}, db;dur={record["db_ms"]};desc="{recorder.count} queries"'
+        )
+        level = logging.WARNING if recorder.duplicates else logging.INFO
+        perf_logger.log(level, json.dumps(record), extra={"perf": record, "duplicates": recorder.duplicates})
+        return response
@@ -0,0 +1,56 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:23
+
+from django.db import migrations, models
+from django.db.models import Count
+
+# How many conflicting slots the error lists
+REPORTED_SLOTS = 20
+
+
+def check_duplicate_slots(apps, schema_editor):
+    """
+    Refuse to add the unique slot constraint over existing double bookings. Every status counts
+    against the constraint, so cancelling a duplicate does not help; which booking keeps the slot
+    is for the studio to decide, not a migration.
+    """
+    Booking = apps.get_model('OWM', 'Booking')
+    slots = list(
+        Booking.objects.values('service_id', 'event_date')
+        .annotate(bookings=Count('id')).filter(bookings__gt=1)
+        .order_by('event_date', 'service_id')[:REPORTED_SLOTS + 1]
+    )
+    if not slots:
+        return
+    lines = []
+    for slot in slots[:REPORTED_SLOTS]:
+        ids = Booking.objects.filter(service_id=slot['service_id'], event_date=slot['event_date']).order_by('booked_at', 'id')
+        lines.append(f"  service {slot['service_id']} on {slot['event_date']}: bookings {', '.join(str(pk) for pk in ids.values_list('id', flat=True))}")
+    if len(slots) > REPORTED_SLOTS:
+        lines.append('  ...')
+    raise RuntimeError(
+        'Some services are booked more than once on the same date. Keep one booking per slot '
+        '(the oldest is listed first), move or delete the others, then migrate again:\n' + '\n'.join(lines)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('OWM', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', 'status', 'event_date'], name='booking_user_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', '-event_date'], name='booking_user_event_date_idx'),
+        ),
+        migrations.RunPython(check_duplicate_slots, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.UniqueConstraint(fields=('service', 'event_date'), name='unique_service_event_date'),
+        ),
+    ]
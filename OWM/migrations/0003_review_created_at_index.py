@@ -0,0 +1,17 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('OWM', '0002_booking_indexes_unique_slot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['created_at', 'id'], name='review_created_at_idx'),
+        ),
+    ]
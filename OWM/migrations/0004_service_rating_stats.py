@@ -0,0 +1,70 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:26
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_rating_stats(apps, schema_editor):
+    """Count the reviews already written, as `rebuild_rating_stats` does; signals keep the stats current from here."""
+    Review = apps.get_model('OWM', 'Review')
+    Service = apps.get_model('OWM', 'Service')
+    stats = {}
+    rows = Review.objects.filter(rating__in=range(1, 6)).values('service_id', 'rating').annotate(total=Count('id'))
+    for row in rows.order_by():
+        stats.setdefault(row['service_id'], {})[row['rating']] = row['total']
+
+    services = list(Service.objects.filter(pk__in=stats).only('id'))
+    for service in services:
+        histogram = stats[service.pk]
+        for value in range(1, 6):
+            setattr(service, f'rating_{value}', histogram.get(value, 0))
+        service.rating_count = sum(histogram.values())
+        service.rating_sum = sum(value * total for value, total in histogram.items())
+    fields = ['rating_count', 'rating_sum'] + [f'rating_{value}' for value in range(1, 6)]
+    Service.objects.bulk_update(services, fields, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('OWM', '0003_review_created_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_stats, migrations.RunPython.noop),
+    ]
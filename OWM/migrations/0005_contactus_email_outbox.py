@@ -0,0 +1,49 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:26
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('OWM', '0004_service_rating_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contactus',
+            name='email_attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='contactus',
+            name='email_delivered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='contactus',
+            name='email_last_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='contactus',
+            name='email_next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        # Messages saved before the outbox existed were already emailed inline
+        migrations.AddField(
+            model_name='contactus',
+            name='email_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='sent', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='contactus',
+            name='email_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='contactus',
+            index=models.Index(fields=['email_status', 'email_next_attempt_at'], name='contact_outbox_due_idx'),
+        ),
+    ]
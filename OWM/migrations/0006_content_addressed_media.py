@@ -0,0 +1,29 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:29
+
+import OWM.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('OWM', '0005_contactus_email_outbox'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='profile_pic',
+            field=models.ImageField(storage=OWM.storage.ContentAddressedStorage(), upload_to='Profile_Pics'),
+        ),
+        migrations.AlterField(
+            model_name='service',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=OWM.storage.ContentAddressedStorage(), upload_to='services/'),
+        ),
+        migrations.AlterField(
+            model_name='teammember',
+            name='profile_pic',
+            field=models.ImageField(storage=OWM.storage.ContentAddressedStorage(), upload_to='team/'),
+        ),
+    ]
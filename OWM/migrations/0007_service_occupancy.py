@@ -0,0 +1,42 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_occupancy(apps, schema_editor):
+    Booking = apps.get_model('OWM', 'Booking')
+    ServiceOccupancy = apps.get_model('OWM', 'ServiceOccupancy')
+    bitmaps = {}
+    for service_id, event_date in Booking.objects.values_list('service_id', 'event_date').iterator():
+        key = (service_id, event_date.replace(day=1))
+        bitmaps[key] = bitmaps.get(key, 0) | (1 << (event_date.day - 1))
+    ServiceOccupancy.objects.bulk_create(
+        ServiceOccupancy(service_id=service_id, month=month, booked_days=bitmap)
+        for (service_id, month), bitmap in bitmaps.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('OWM', '0006_content_addressed_media'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('booked_days', models.PositiveIntegerField(default=0)),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupancy', to='OWM.service')),
+            ],
+            options={
+                'verbose_name': 'ServiceOccupancy',
+                'verbose_name_plural': 'ServiceOccupancy',
+                'constraints': [models.UniqueConstraint(fields=('service', 'month'), name='unique_service_occupancy_month')],
+            },
+        ),
+        migrations.RunPython(build_occupancy, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,110 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:17
+
+import itertools
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+from OWM.search import impacts, review_document, service_document, team_document
+
+BATCH_SIZE = 1000
+
+
+def build_search_index(apps, schema_editor):
+    """Index the rows already there, as `rebuild_search_index` does; signals keep the index current from here."""
+    SearchTerm = apps.get_model('OWM', 'SearchTerm')
+    SearchDocument = apps.get_model('OWM', 'SearchDocument')
+    SearchPosting = apps.get_model('OWM', 'SearchPosting')
+    sources = [
+        ('service', service_document, apps.get_model('OWM', 'Service').objects.all()),
+        ('review', review_document, apps.get_model('OWM', 'Review').objects.select_related('service').only(
+            'id', 'comment', 'service__name', 'service__category')),
+        ('team', team_document, apps.get_model('OWM', 'TeamMember').objects.all()),
+    ]
+    document_counts = Counter()
+    for kind, build, queryset in sources:
+        rows = queryset.order_by().iterator(chunk_size=BATCH_SIZE)
+        for chunk in iter(lambda: list(itertools.islice(rows, BATCH_SIZE)), []):
+            entries = []
+            for row in chunk:
+                title, snippet, category, fields = build(row)
+                entries.append((row.pk, Truncator(title).chars(100), Truncator(snippet).chars(200), category, impacts(fields)))
+            SearchDocument.objects.bulk_create([
+                SearchDocument(kind=kind, object_id=object_id, title=title, snippet=snippet, category=category)
+                for object_id, title, snippet, category, _ in entries
+            ])
+            document_ids = dict(SearchDocument.objects.filter(
+                kind=kind, object_id__in=[entry[0] for entry in entries]
+            ).values_list('object_id', 'id'))
+            terms = {term for *_, terms in entries for term in terms}
+            SearchTerm.objects.bulk_create([SearchTerm(term=term) for term in terms], ignore_conflicts=True)
+            term_ids = dict(SearchTerm.objects.filter(term__in=terms).values_list('term', 'id'))
+            SearchPosting.objects.bulk_create([
+                SearchPosting(term_id=term_ids[term], document_id=document_ids[object_id], kind=kind, category=category,
+                              impact=impact)
+                for object_id, _, _, category, terms in entries
+                for term, impact in terms.items()
+            ], batch_size=5000)
+            document_counts.update(term_ids[term] for *_, terms in entries for term in terms)
+    SearchTerm.objects.bulk_update(
+        [SearchTerm(pk=term_id, document_count=count) for term_id, count in document_counts.items()],
+        ['document_count'], batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('OWM', '0007_service_occupancy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=40, unique=True)),
+                ('document_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'SearchTerm',
+                'verbose_name_plural': 'SearchTerms',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('service', 'Service'), ('review', 'Review'), ('team', 'Team Member')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('category', models.CharField(blank=True, default='', max_length=10)),
+                ('title', models.CharField(max_length=100)),
+                ('snippet', models.CharField(blank=True, default='', max_length=200)),
+            ],
+            options={
+                'verbose_name': 'SearchDocument',
+                'verbose_name_plural': 'SearchDocuments',
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_document')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('service', 'Service'), ('review', 'Review'), ('team', 'Team Member')], max_length=10)),
+                ('category', models.CharField(blank=True, default='', max_length=10)),
+                ('impact', models.PositiveIntegerField()),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='postings', to='OWM.searchdocument')),
+                ('term', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, to='OWM.searchterm')),
+            ],
+            options={
+                'verbose_name': 'SearchPosting',
+                'verbose_name_plural': 'SearchPostings',
+                'indexes': [models.Index(fields=['term', '-impact', '-document'], name='search_posting_impact_idx'), models.Index(fields=['term', 'category', '-impact', '-document'], name='search_posting_category_idx')],
+                'constraints': [models.UniqueConstraint(fields=('term', 'document'), name='unique_search_posting')],
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
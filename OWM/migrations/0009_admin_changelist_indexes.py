@@ -0,0 +1,21 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('OWM', '0008_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['event_date', 'id'], name='booking_event_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['added_at', 'id'], name='cart_added_at_idx'),
+        ),
+    ]
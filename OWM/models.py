@@ -1,5 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
+
+from .storage import content_addressed_storage
 
 # Custom User Model
 class CustomUser(AbstractUser):
@@ -7,7 +10,7 @@ class CustomUser(AbstractUser):
     last_name = models.CharField(max_length=20, null=False, blank=False)
     username = models.CharField(max_length=20, unique=True, null=False, blank=False)
     phone = models.CharField(max_length=15, blank=True, null=True)
-    profile_pic = models.ImageField(upload_to="Profile_Pics")
+    profile_pic = models.ImageField(upload_to="Profile_Pics", storage=content_addressed_storage)
     address = models.CharField(max_length=30, blank=False, null=False)
 
     class Meta:
@@ -29,7 +32,18 @@ class Service(models.Model):
     category = models.CharField(max_length=10, choices=CATEGORY_CHOICES)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
-    image = models.ImageField(upload_to='services/', blank=True, null=True)
+    image = models.ImageField(upload_to='services/', blank=True, null=True, storage=content_addressed_storage)
+
+    # Denormalized review stats, kept current by Review signals and rebuilt by `rebuild_rating_stats`
+    RATING_VALUES = range(1, 6)
+    RATING_FIELDS = ['rating_count', 'rating_sum'] + [f'rating_{value}' for value in RATING_VALUES]
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
 
     class Meta:
         verbose_name = "Service"
@@ -38,6 +52,55 @@ class Service(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def add_rating(cls, service_id, rating, count=1):
+        """Count `count` more (fewer, when negative) reviews with `rating` stars for the service, in a single UPDATE."""
+        if rating not in cls.RATING_VALUES:
+            return 0  # Not counted, as in `rebuild_rating_stats`
+        return cls.objects.filter(pk=service_id).update(
+            rating_count=models.F('rating_count') + count,
+            rating_sum=models.F('rating_sum') + rating * count,
+            **{f'rating_{rating}': models.F(f'rating_{rating}') + count}
+        )
+
+    @property
+    def rating_average(self):
+        return self.average_rating(self.rating_sum, self.rating_count)
+
+    @staticmethod
+    def average_rating(rating_sum, rating_count):
+        if not rating_count:
+            return None
+        return round(rating_sum / rating_count, 2)
+
+    @property
+    def rating_histogram(self):
+        return {str(value): getattr(self, f'rating_{value}') for value in self.RATING_VALUES}
+
+# Booking QuerySet with eager-loading presets shared by the booking endpoints
+class BookingQuerySet(models.QuerySet):
+    # Columns read by BookingSerializer (including the nested ServiceSerializer)
+    SERIALIZER_FIELDS = (
+        'id', 'status', 'event_date', 'event_time', 'event_location', 'booked_at',
+        'user', 'user__username',
+        'service', 'service__name', 'service__category', 'service__description',
+        'service__price', 'service__image',
+        'service__rating_count', 'service__rating_sum', 'service__rating_1', 'service__rating_2',
+        'service__rating_3', 'service__rating_4', 'service__rating_5',
+    )
+
+    def for_user(self, user):
+        # By id, so token-backed users (OWM.authentication.LazyTokenUser) filter without a lookup
+        return self.filter(user_id=user.pk)
+
+    def with_related(self):
+        """Join user and service so reading them costs no extra queries."""
+        return self.select_related('user', 'service')
+
+    def for_serializer(self):
+        """Join and load only the columns BookingSerializer needs."""
+        return self.with_related().only(*self.SERIALIZER_FIELDS)
+
 # Booking Model
 class Booking(models.Model):
     STATUS_CHOICES = [
@@ -54,13 +117,49 @@ class Booking(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     booked_at = models.DateTimeField(auto_now_add=True)
 
+    objects = BookingQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Booking"
         verbose_name_plural = "Bookings"
+        constraints = [
+            # A service can only be booked once per date; its unique index also serves availability lookups
+            models.UniqueConstraint(fields=['service', 'event_date'], name='unique_service_event_date'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'status', 'event_date'], name='booking_user_status_date_idx'),
+            models.Index(fields=['user', '-event_date'], name='booking_user_event_date_idx'),
+            # Admin changelist: keyset pages and date drill-down over all bookings
+            models.Index(fields=['event_date', 'id'], name='booking_event_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.service.name} ({self.event_date} {self.event_time})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the slot as loaded so the occupancy index can free it if the booking moves
+        instance._loaded_slot = (instance.__dict__.get('service_id'), instance.__dict__.get('event_date'))
+        return instance
+
+# Booked days of one service in one month as a bitmap (bit n-1 set = day n booked),
+# maintained by Booking signals and served by the availability calendar
+class ServiceOccupancy(models.Model):
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='occupancy')
+    month = models.DateField()  # First day of the month
+    booked_days = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "ServiceOccupancy"
+        verbose_name_plural = "ServiceOccupancy"
+        constraints = [
+            models.UniqueConstraint(fields=['service', 'month'], name='unique_service_occupancy_month'),
+        ]
+
+    def __str__(self):
+        return f"{self.service_id} - {self.month:%Y-%m}"
+
 #Cart Model
 class Cart(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
@@ -69,21 +168,45 @@ class Cart(models.Model):
     event_location = models.CharField(max_length=255, null=False)
     event_time = models.TimeField(null=False)
     added_at = models.DateTimeField(auto_now_add=True)
-    
+
+    class Meta:
+        indexes = [
+            # Admin changelist: keyset pages and date drill-down over all cart items
+            models.Index(fields=['added_at', 'id'], name='cart_added_at_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.service.name} - {self.event_date}"
 
 # Contact Model
 class ContactUs(models.Model):
+    # Delivery state of the studio notification email, sent from the outbox (see OWM.outbox)
+    EMAIL_PENDING = 'pending'
+    EMAIL_SENT = 'sent'
+    EMAIL_FAILED = 'failed'
+    EMAIL_STATUS_CHOICES = [
+        (EMAIL_PENDING, 'Pending'),
+        (EMAIL_SENT, 'Sent'),
+        (EMAIL_FAILED, 'Failed'),
+    ]
+
     name = models.CharField(max_length=100)
     email = models.EmailField()
     subject = models.CharField(max_length=255)
     message = models.TextField()
     sent_at = models.DateTimeField(auto_now_add=True)
+    email_status = models.CharField(max_length=10, choices=EMAIL_STATUS_CHOICES, default=EMAIL_PENDING)
+    email_attempts = models.PositiveIntegerField(default=0)
+    email_next_attempt_at = models.DateTimeField(default=timezone.now)
+    email_delivered_at = models.DateTimeField(blank=True, null=True)
+    email_last_error = models.TextField(blank=True, default='')
     
     class Meta:
         verbose_name = "ContactUs"
         verbose_name_plural = "ContactUs"
+        indexes = [
+            models.Index(fields=['email_status', 'email_next_attempt_at'], name='contact_outbox_due_idx'),
+        ]
 
     def __str__(self):
         return f"Message from {self.name} - {self.subject}"
@@ -101,7 +224,7 @@ class TeamMember(models.Model):
     
     name = models.CharField(max_length=100)
     role = models.CharField(max_length=20, choices=ROLE_CHOICES)
-    profile_pic = models.ImageField(upload_to='team/')
+    profile_pic = models.ImageField(upload_to='team/', storage=content_addressed_storage)
     bio = models.TextField()
 
     class Meta:
@@ -122,6 +245,80 @@ class Review(models.Model):
     class Meta:
         verbose_name = "Review"
         verbose_name_plural = "Reviews"
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='review_created_at_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.service.name} ({self.rating}★)"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the rating as loaded so an edit moves it between the service's rating stats
+        instance._loaded_rating = (instance.__dict__.get('service_id'), instance.__dict__.get('rating'))
+        return instance
+
+# Inverted index behind the search endpoint (see OWM.search): one document per searchable
+# service, review and team member, kept current by signals and rebuilt by `rebuild_search_index`
+class SearchDocument(models.Model):
+    KIND_SERVICE = 'service'
+    KIND_REVIEW = 'review'
+    KIND_TEAM = 'team'
+    KIND_CHOICES = [
+        (KIND_SERVICE, 'Service'),
+        (KIND_REVIEW, 'Review'),
+        (KIND_TEAM, 'Team Member'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    category = models.CharField(max_length=10, blank=True, default='')  # The service's category; blank for team members
+    title = models.CharField(max_length=100)
+    snippet = models.CharField(max_length=200, blank=True, default='')
+
+    class Meta:
+        verbose_name = "SearchDocument"
+        verbose_name_plural = "SearchDocuments"
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_document'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}"
+
+class SearchTerm(models.Model):
+    term = models.CharField(max_length=40, unique=True)
+    document_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "SearchTerm"
+        verbose_name_plural = "SearchTerms"
+
+    def __str__(self):
+        return self.term
+
+# One term in one document. `impact` is the term's BM25 weight in that document, so the
+# best matches for a term are the first rows of an index scan. Kind and category are
+# copied from the document to filter without a join. Postings are deleted explicitly
+# (OWM.search.remove_documents) rather than by cascade, which would load every row first.
+class SearchPosting(models.Model):
+    term = models.ForeignKey(SearchTerm, on_delete=models.DO_NOTHING, db_index=False)
+    document = models.ForeignKey(SearchDocument, on_delete=models.DO_NOTHING, related_name='postings')
+    kind = models.CharField(max_length=10, choices=SearchDocument.KIND_CHOICES)
+    category = models.CharField(max_length=10, blank=True, default='')
+    impact = models.PositiveIntegerField()
+
+    class Meta:
+        verbose_name = "SearchPosting"
+        verbose_name_plural = "SearchPostings"
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'document'], name='unique_search_posting'),
+        ]
+        indexes = [
+            models.Index(fields=['term', '-impact', '-document'], name='search_posting_impact_idx'),
+            models.Index(fields=['term', 'category', '-impact', '-document'], name='search_posting_category_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term_id} in {self.document_id}"
@@ -0,0 +1,111 @@
+import datetime
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, When
+
+from .models import Booking, ServiceOccupancy
+
+# Per-service, per-month bitmaps of booked days (see ServiceOccupancy).
+# The (service, event_date) unique constraint means a day holds at most one
+# booking, so setting and clearing single bits keeps the index exact.
+DAY_MASK = (1 << 31) - 1
+
+
+def month_start(date):
+    return date.replace(day=1)
+
+
+def next_month(month):
+    return (month + datetime.timedelta(days=32)).replace(day=1)
+
+
+def day_bit(date):
+    return 1 << (date.day - 1)
+
+
+def mark_booked(service_id, event_date):
+    occupancy, _ = ServiceOccupancy.objects.get_or_create(service_id=service_id, month=month_start(event_date))
+    ServiceOccupancy.objects.filter(pk=occupancy.pk).update(booked_days=F("booked_days").bitor(day_bit(event_date)))
+
+
+def mark_booked_many(slots):
+    """Set the bits for many (service_id, event_date) slots in two queries, however many months they span."""
+    set_bits(bitmaps_for(slots))
+
+
+def set_bits(bitmaps):
+    """OR {(service_id, month): bitmap} into the index in two queries, adding the month rows it lacks."""
+    if not bitmaps:
+        return
+    ServiceOccupancy.objects.bulk_create(
+        [ServiceOccupancy(service_id=service_id, month=month) for service_id, month in bitmaps],
+        ignore_conflicts=True,
+    )
+    ServiceOccupancy.objects.filter(
+        reduce(or_, (Q(service_id=service_id, month=month) for service_id, month in bitmaps))
+    ).update(booked_days=Case(
+        *(When(service_id=service_id, month=month, then=F("booked_days").bitor(bits))
+          for (service_id, month), bits in bitmaps.items()),
+        default=F("booked_days"),
+        output_field=PositiveIntegerField(),
+    ))
+
+
+def mark_free(service_id, event_date):
+    ServiceOccupancy.objects.filter(service_id=service_id, month=month_start(event_date)).update(
+        booked_days=F("booked_days").bitand(DAY_MASK ^ day_bit(event_date))
+    )
+
+
+def bitmaps_for(slots):
+    """Fold (service_id, event_date) pairs into {(service_id, month): bitmap}."""
+    bitmaps = {}
+    for service_id, event_date in slots:
+        key = (service_id, month_start(event_date))
+        bitmaps[key] = bitmaps.get(key, 0) | day_bit(event_date)
+    return bitmaps
+
+
+def rebuild_occupancy(batch_size=1000):
+    """Recompute every bitmap from the booking table. Returns the number of booked service-months."""
+    with transaction.atomic():
+        # Lock the index before reading the bookings, so a booking saved meanwhile is either read
+        # below or waits for the rebuild to commit before setting or clearing its bit
+        existing = {
+            (service_id, month): (pk, booked_days)
+            for pk, service_id, month, booked_days in ServiceOccupancy.objects.select_for_update()
+            .order_by("pk").values_list("pk", "service_id", "month", "booked_days")
+        }
+        slots = Booking.objects.values_list("service_id", "event_date").order_by().iterator(chunk_size=batch_size)
+        bitmaps = bitmaps_for(slots)
+
+        # Emptied months keep a zero row, as after mark_free: a booking waiting on its lock may be about to set a bit
+        ServiceOccupancy.objects.bulk_update(
+            [
+                ServiceOccupancy(pk=pk, booked_days=bitmaps.get(key, 0))
+                for key, (pk, booked_days) in existing.items() if bitmaps.get(key, 0) != booked_days
+            ],
+            ["booked_days"], batch_size=batch_size,
+        )
+        # Rows for new months are not locked, so OR their bits in rather than overwrite a concurrent booking's
+        new = [(key, bitmap) for key, bitmap in bitmaps.items() if key not in existing]
+        for start in range(0, len(new), batch_size):
+            set_bits(dict(new[start:start + batch_size]))
+    return len(bitmaps)
+
+
+def booked_dates(month_bitmaps, start, end):
+    """Expand {month: bitmap} into the sorted booked dates between start and end (inclusive)."""
+    booked = []
+    for month, bitmap in sorted(month_bitmaps.items()):
+        day = 1
+        while bitmap:
+            if bitmap & 1:
+                date = month.replace(day=day)
+                if start <= date <= end:
+                    booked.append(date)
+            bitmap >>= 1
+            day += 1
+    return booked
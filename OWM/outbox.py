@@ -0,0 +1,179 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection as db_connection, transaction
+from django.utils import timezone
+
+from .metrics import EMAIL_FAILURES, EMAILS_SENT
+from .models import ContactUs
+
+# DB-backed outbox for contact notification emails. Rows are saved as pending by
+# ContactUsView and delivered here in batches over one SMTP connection, either by
+# `manage.py run_outbox` or, with OUTBOX_SEND_IN_PROCESS, by a background thread that
+# is woken by new messages and by a timer for the retries.
+OUTBOX_BATCH_SIZE = getattr(settings, "OUTBOX_BATCH_SIZE", 50)
+OUTBOX_MAX_ATTEMPTS = getattr(settings, "OUTBOX_MAX_ATTEMPTS", 6)
+OUTBOX_BACKOFF_SECONDS = getattr(settings, "OUTBOX_BACKOFF_SECONDS", 30)
+OUTBOX_CLAIM_SECONDS = getattr(settings, "OUTBOX_CLAIM_SECONDS", 300)  # Longer than a batch takes to send
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="owm-outbox")
+_retry_lock = threading.Lock()
+_retry_timer = None
+
+
+def build_message(contact, connection=None):
+    """Build the studio notification email for a contact message."""
+    body = (
+        f"Name: {contact.name}\n"
+        f"Email: {contact.email}\n"
+        f"Subject: {contact.subject}\n"
+        f"\n"
+        f"Message:\n"
+        f"{contact.message}\n"
+    )
+    return EmailMessage(
+        subject=f"New Contact Message from {contact.name}",
+        body=body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[settings.DEFAULT_FROM_EMAIL],  # Studio inbox
+        reply_to=[contact.email],
+        connection=connection,
+    )
+
+
+def retry_delay(attempts):
+    """Exponential backoff: 30s, 60s, 120s, ... after each failed attempt."""
+    return timedelta(seconds=OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1))
+
+
+def claim_due(batch_size=OUTBOX_BATCH_SIZE):
+    """
+    Claim a batch of due messages: their next attempt moves OUTBOX_CLAIM_SECONDS ahead, so other
+    senders skip them while this one delivers (and retry them if it dies before recording the result).
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            ContactUs.objects.select_for_update(skip_locked=True)
+            .filter(email_status=ContactUs.EMAIL_PENDING, email_next_attempt_at__lte=now)
+            .order_by("email_next_attempt_at")[:batch_size]
+        )
+        ContactUs.objects.filter(pk__in=[contact.pk for contact in batch]).update(
+            email_next_attempt_at=now + timedelta(seconds=OUTBOX_CLAIM_SECONDS)
+        )
+    return batch
+
+
+def deliver(batch):
+    """Send claimed messages over a single mail connection, then record the outcome. Returns the number sent."""
+    if not batch:
+        return 0
+    now = timezone.now()
+    sent = 0
+    # No transaction is open while talking to the mail server
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        logger.warning("Outbox could not open mail connection: %s", e)
+        for contact in batch:
+            _record_failure(contact, e, now)
+    else:
+        try:
+            for contact in batch:
+                try:
+                    connection.send_messages([build_message(contact, connection)])
+                except Exception as e:
+                    _record_failure(contact, e, now)
+                else:
+                    contact.email_status = ContactUs.EMAIL_SENT
+                    contact.email_attempts += 1
+                    contact.email_delivered_at = timezone.now()
+                    contact.email_last_error = ""
+                    sent += 1
+        finally:
+            connection.close()
+
+    ContactUs.objects.bulk_update(
+        batch,
+        ["email_status", "email_attempts", "email_next_attempt_at", "email_delivered_at", "email_last_error"],
+    )
+    EMAILS_SENT.inc(sent)
+    EMAIL_FAILURES.inc(len(batch) - sent)
+    return sent
+
+
+def send_pending(batch_size=OUTBOX_BATCH_SIZE):
+    """
+    Deliver one batch of due messages over a single mail connection.
+    Returns the number of messages sent.
+    """
+    return deliver(claim_due(batch_size))
+
+
+def _record_failure(contact, error, now):
+    contact.email_attempts += 1
+    contact.email_last_error = str(error)
+    if contact.email_attempts >= OUTBOX_MAX_ATTEMPTS:
+        contact.email_status = ContactUs.EMAIL_FAILED
+        logger.error("Giving up on contact email %s after %s attempts: %s", contact.pk, contact.email_attempts, error)
+    else:
+        contact.email_next_attempt_at = now + retry_delay(contact.email_attempts)
+
+
+def flush_outbox():
+    """Send every due message, batch by batch. Returns the number sent."""
+    total = 0
+    while True:
+        # Stop on a short claim, not a short send: failed messages are already backed off
+        batch = claim_due(OUTBOX_BATCH_SIZE)
+        total += deliver(batch)
+        if len(batch) < OUTBOX_BATCH_SIZE:
+            return total
+
+
+def next_due():
+    """When the earliest pending message is next due, or None when nothing is pending."""
+    return (
+        ContactUs.objects.filter(email_status=ContactUs.EMAIL_PENDING)
+        .order_by("email_next_attempt_at")
+        .values_list("email_next_attempt_at", flat=True)
+        .first()
+    )
+
+
+def schedule_retry():
+    """Flush again, on a timer, when the earliest pending message (a backed-off failure) falls due."""
+    global _retry_timer
+    due = next_due()
+    if due is None:
+        return
+    delay = max((due - timezone.now()).total_seconds(), 1)
+    with _retry_lock:
+        if _retry_timer is not None:
+            _retry_timer.cancel()
+        _retry_timer = threading.Timer(delay, schedule_flush)
+        _retry_timer.daemon = True
+        _retry_timer.start()
+
+
+def schedule_flush():
+    """Flush the outbox on the background thread, off the request path."""
+    if getattr(settings, "OUTBOX_SEND_IN_PROCESS", True):
+        _executor.submit(_flush_in_thread)
+
+
+def _flush_in_thread():
+    try:
+        flush_outbox()
+        schedule_retry()
+    except Exception:
+        logger.exception("Outbox flush failed")
+    finally:
+        db_connection.close()
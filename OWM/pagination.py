@@ -0,0 +1,52 @@
+from asgiref.sync import sync_to_async
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor (keyset) pagination over indexed columns. Pagination is opt-in:
+    clients that send neither `?cursor=` nor `?page_size=` keep receiving plain lists.
+    """
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def paginate(self, request, queryset, serialize, view=None):
+        """Return `serialize(rows)` for the whole queryset, or a paginated payload when asked for one."""
+        if not self.is_requested(request):
+            return serialize(queryset)
+        page = self.paginate_queryset(queryset, request, view=view)
+        return self.get_paginated_response(serialize(page)).data
+
+    async def apaginate(self, request, queryset, serialize, view=None):
+        """Async `paginate`: whole lists stream through the async ORM, pages run in a worker thread."""
+        if not self.is_requested(request):
+            return serialize([row async for row in queryset.aiterator()])
+        return await sync_to_async(self.paginate)(request, queryset, serialize, view=view)
+
+
+class ServicePagination(KeysetPagination):
+    ordering = ("id",)
+
+
+class TeamPagination(KeysetPagination):
+    ordering = ("id",)
+
+
+class ReviewPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
+
+
+class BookingPagination(KeysetPagination):
+    ordering = ("-event_date", "-id")
+
+
+class SearchPagination(PageNumberPagination):
+    """Page numbers over ranked search hits, a list already capped at SEARCH_MAX_CANDIDATES."""
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 50
@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+
+# Password hashing off the request threads. PBKDF2 is deliberately slow, so a burst of
+# logins or registrations would otherwise occupy every worker thread and starve catalog
+# and booking traffic. Hashes run in a small process pool instead; once
+# PASSWORD_HASH_QUEUE_LIMIT hashes are queued or running, new ones are refused at once
+# (the views answer 429). PASSWORD_HASH_WORKERS = 0 hashes inline, as before.
+PASSWORD_HASH_WORKERS = getattr(settings, "PASSWORD_HASH_WORKERS", 2)
+PASSWORD_HASH_QUEUE_LIMIT = getattr(settings, "PASSWORD_HASH_QUEUE_LIMIT", 8)
+PASSWORD_HASH_TIMEOUT = getattr(settings, "PASSWORD_HASH_TIMEOUT", 10)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised instead of queueing a hash when the pool is already at its queue limit."""
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(PASSWORD_HASH_QUEUE_LIMIT)
+
+
+def _init_worker(settings_module):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    import django
+    django.setup()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: forking a process that runs threads (channels, outbox, thread pools) is unsafe
+            _executor = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS, mp_context=get_context("spawn"),
+                initializer=_init_worker, initargs=(os.environ.get("DJANGO_SETTINGS_MODULE", ""),),
+            )
+        return _executor
+
+
+def _run(func, *args):
+    if not PASSWORD_HASH_WORKERS:
+        return func(*args)
+    if not _slots.acquire(blocking=False):
+        raise PasswordHasherBusy
+    try:
+        future = _get_executor().submit(func, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=PASSWORD_HASH_TIMEOUT)
+    except TimeoutError:
+        raise PasswordHasherBusy
+    except BrokenProcessPool:
+        _reset_executor()  # A worker died; start a fresh pool on the next call
+        raise
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        _executor = None
+
+
+def _verify(raw_password, encoded):
+    """Check a password; also return a fresh hash when the stored one uses outdated parameters."""
+    if not encoded:
+        make_password(raw_password)  # Same cost as a real check, so unknown usernames are not revealed by timing
+        return False, None
+    valid = check_password(raw_password, encoded)
+    rehash = None
+    if valid:
+        try:
+            if get_hasher().algorithm != identify_hasher(encoded).algorithm or get_hasher().must_update(encoded):
+                rehash = make_password(raw_password)
+        except ValueError:
+            pass
+    return valid, rehash
+
+
+def hash_password(raw_password):
+    """make_password() in the hashing pool. Raises PasswordHasherBusy when the pool is full."""
+    return _run(make_password, raw_password)
+
+
+def verify_password(user, raw_password):
+    """
+    Check `raw_password` for `user` (None for an unknown username) in the hashing pool,
+    upgrading the stored hash if the hasher settings changed. Raises PasswordHasherBusy.
+    """
+    encoded = user.password if user is not None and user.has_usable_password() else None
+    valid, rehash = _run(_verify, raw_password, encoded)
+    if valid and rehash:
+        type(user).objects.filter(pk=user.pk).update(password=rehash)
+    return valid
+
+
+class LoginBackoff:
+    """
+    In-memory, per-process exponential backoff on failed logins, checked before any
+    password is hashed. Usernames and client IPs are tracked separately; each key gets
+    `free_attempts` failures before it is locked for 1s, 2s, 4s, ... up to `max_seconds`.
+    At most `max_keys` keys are kept, least recently seen dropped first.
+    """
+
+    def __init__(self, free_attempts=5, ip_free_attempts=50, max_seconds=300, max_keys=100_000):
+        self.free_attempts = free_attempts
+        self.ip_free_attempts = ip_free_attempts
+        self.max_seconds = max_seconds
+        self.max_keys = max_keys
+        self._entries = OrderedDict()  # key -> (failures, blocked_until)
+        self._lock = threading.Lock()
+
+    def keys(self, username, ip):
+        keys = [("user", (username or "").lower(), self.free_attempts)]
+        if ip:  # None when the client address cannot be trusted (see client_ip)
+            keys.append(("ip", ip, self.ip_free_attempts))
+        return keys
+
+    def retry_after(self, username, ip):
+        """Seconds until this username and IP may try again; 0 when neither is locked."""
+        now = time.monotonic()
+        with self._lock:
+            waits = [self._entries.get(key[:2], (0, 0.0))[1] - now for key in self.keys(username, ip)]
+        return max(0, max(waits))
+
+    def failure(self, username, ip):
+        now = time.monotonic()
+        with self._lock:
+            for kind, value, free in self.keys(username, ip):
+                key = (kind, value)
+                failures = self._entries.pop(key, (0, 0.0))[0] + 1
+                blocked_until = 0.0
+                if failures > free:
+                    blocked_until = now + min(2 ** (failures - free - 1), self.max_seconds)
+                self._entries[key] = (failures, blocked_until)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+
+    def success(self, username, ip):
+        with self._lock:
+            self._entries.pop(("user", (username or "").lower()), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+login_backoff = LoginBackoff(
+    free_attempts=getattr(settings, "LOGIN_BACKOFF_FREE_ATTEMPTS", 5),
+    ip_free_attempts=getattr(settings, "LOGIN_BACKOFF_IP_FREE_ATTEMPTS", 50),
+    max_seconds=getattr(settings, "LOGIN_BACKOFF_MAX_SECONDS", 300),
+)
+
+
+def client_ip(request):
+    """
+    The client address, or None unless the app runs behind LOGIN_TRUSTED_PROXY_HOPS trusted proxies.
+    Each trusted proxy appends the address it was reached from to LOGIN_CLIENT_IP_HEADER, so the
+    client is that many entries from the right; anything further left may be forged by the client.
+    """
+    hops = getattr(settings, "LOGIN_TRUSTED_PROXY_HOPS", 0)
+    if hops <= 0:
+        return None
+    header = getattr(settings, "LOGIN_CLIENT_IP_HEADER", "HTTP_X_FORWARDED_FOR")
+    addresses = [address.strip() for address in request.META.get(header, "").split(",") if address.strip()]
+    if len(addresses) < hops:
+        return None  # Did not come through every trusted proxy
+    return addresses[-hops]
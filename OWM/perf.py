@@ -0,0 +1,130 @@
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+# Runtime switch for the performance instrumentation middleware. The settings give the
+# initial state; `manage.py perf_instrumentation` overrides it through the shared cache
+# (CACHE_URL), and each process re-reads the override at most every PERF_TOGGLE_POLL_SECONDS.
+PERF_CONFIG_KEY = "perf:config"
+PERF_TOGGLE_POLL_SECONDS = getattr(settings, "PERF_TOGGLE_POLL_SECONDS", 5)
+
+_config = {"checked_at": None, "value": None}
+
+
+def default_config():
+    return {
+        "enabled": getattr(settings, "PERF_INSTRUMENTATION", False),
+        "profile_sample_rate": getattr(settings, "PERF_PROFILE_SAMPLE_RATE", 0.0),
+    }
+
+
+def get_perf_config():
+    """Return {"enabled", "profile_sample_rate"}, refreshed from the cache every few seconds."""
+    now = time.monotonic()
+    checked_at = _config["checked_at"]
+    if checked_at is None or now - checked_at >= PERF_TOGGLE_POLL_SECONDS:
+        _config["value"] = {**default_config(), **(cache.get(PERF_CONFIG_KEY) or {})}
+        _config["checked_at"] = now
+    return _config["value"]
+
+
+async def aget_perf_config():
+    """get_perf_config() for async code: the cache is only read, asynchronously, once the poll is due."""
+    checked_at = _config["checked_at"]
+    if checked_at is None or time.monotonic() - checked_at >= PERF_TOGGLE_POLL_SECONDS:
+        overrides = await cache.aget(PERF_CONFIG_KEY)
+        _config["value"] = {**default_config(), **(overrides or {})}
+        _config["checked_at"] = time.monotonic()
+    return _config["value"]
+
+
+def set_perf_config(**overrides):
+    """Override the instrumentation settings for every process sharing the cache."""
+    config = {**(cache.get(PERF_CONFIG_KEY) or {}), **overrides}
+    cache.set(PERF_CONFIG_KEY, config, None)
+    _config["checked_at"] = None
+    return {**default_config(), **config}
+
+
+def reset_perf_config():
+    cache.delete(PERF_CONFIG_KEY)
+    _config["checked_at"] = None
+
+
+# Query observers (execute_wrappers) of the current request. Under ASGI a request's sync code
+# runs in worker threads, each with its own connection objects, so wrapping the connections
+# seen by the middleware misses those queries. Instead every connection gets one permanent
+# dispatcher when it opens (see OWM.signals), which hands each query to the observers in
+# this context variable; the variable follows the request into the threads it uses.
+_query_observers = ContextVar("query_observers", default=())
+
+
+def dispatch_to_observers(execute, sql, params, many, context):
+    call = execute
+    for observer in reversed(_query_observers.get()):
+        call = partial(observer, call)
+    return call(sql, params, many, context)
+
+
+def install_query_dispatch(connection):
+    if dispatch_to_observers not in connection.execute_wrappers:
+        connection.execute_wrappers.append(dispatch_to_observers)
+
+
+@contextmanager
+def observe_queries(observer):
+    """Pass every query the current request runs, in any thread and on any alias, through `observer`."""
+    for connection in connections.all(initialized_only=True):
+        install_query_dispatch(connection)
+    token = _query_observers.set((*_query_observers.get(), observer))
+    try:
+        yield observer
+    finally:
+        _query_observers.reset(token)
+
+
+# Literals are stripped so the same statement with different parameters counts as a repeat
+SQL_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+class QueryRecorder:
+    """
+    A connection.execute_wrapper that counts and times queries. `duplicates` maps each
+    statement that ran more than once to its count: the signature of an N+1 loop.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.statements[SQL_LITERAL_RE.sub("?", sql)] += 1
+
+    @property
+    def duplicates(self):
+        return {sql: count for sql, count in self.statements.items() if count > 1}
+
+
+def dump_profile(profile, view_name):
+    """Write a cProfile trace to PERF_PROFILE_DIR; open it with `python -m pstats` or snakeviz."""
+    directory = getattr(settings, "PERF_PROFILE_DIR", os.path.join(settings.BASE_DIR, "perf-profiles"))
+    os.makedirs(directory, exist_ok=True)
+    safe_name = re.sub(r"[^\w.-]", "_", view_name)
+    path = os.path.join(directory, f"{time.strftime('%Y%m%dT%H%M%S')}-{time.time_ns() % 10**9:09d}-{safe_name}.prof")
+    profile.dump_stats(path)
+    return path
@@ -0,0 +1,38 @@
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # Optional: without it every response goes through DRF's JSONRenderer
+    orjson = None
+
+# Byte-for-byte the output of DRF's JSONRenderer with its default settings (compact separators,
+# unescaped unicode, U+2028/U+2029 escaped, "Z" for UTC datetimes), produced by orjson.
+# Values orjson cannot encode (Decimal, lazy strings, ...) go through DRF's JSONEncoder; anything
+# it rejects outright falls back to JSONRenderer. One known difference: floats that need an
+# exponent are written as 1e16 rather than 1e+16 (the same number); the API sends none today.
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+
+class ORJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not self.fast_path_enabled() or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same escaping as JSONRenderer: these are valid JSON but not valid JavaScript
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+    def fast_path_enabled(self):
+        return (
+            orjson is not None
+            and getattr(settings, "FAST_JSON_RENDERER", True)
+            and self.ensure_ascii is False
+            and self.compact
+            and self.strict
+        )
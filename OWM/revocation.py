@@ -0,0 +1,148 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Max, Q
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+# Per-process view of simplejwt's token blacklist, so checking a jti costs no query.
+# A Bloom filter holds every revoked jti: a miss (the usual case) means "not revoked".
+# A hit is confirmed against an LRU of recent answers and, failing that, the database.
+# Each process picks up other processes' revocations every TOKEN_REVOCATION_SYNC_SECONDS
+# (one primary-key range query) and rebuilds from scratch every
+# TOKEN_REVOCATION_REBUILD_SECONDS, dropping expired tokens. Expired rows are purged
+# from the database by simplejwt's `manage.py flushexpiredtokens`.
+TOKEN_REVOCATION_SYNC_SECONDS = getattr(settings, "TOKEN_REVOCATION_SYNC_SECONDS", 5)
+TOKEN_REVOCATION_REBUILD_SECONDS = getattr(settings, "TOKEN_REVOCATION_REBUILD_SECONDS", 3600)
+TOKEN_REVOCATION_BLOOM_CAPACITY = getattr(settings, "TOKEN_REVOCATION_BLOOM_CAPACITY", 100_000)
+TOKEN_REVOCATION_LRU_SIZE = getattr(settings, "TOKEN_REVOCATION_LRU_SIZE", 10_000)
+BLOOM_ERROR_RATE = 0.001
+# Ids skipped by a sync may belong to transactions that had not committed yet; they are re-read this long
+GAP_RECHECK_SECONDS = 60
+MAX_GAPS = 1000
+
+
+class BloomFilter:
+    """A fixed-size Bloom filter of strings with about `error_rate` false positives at `capacity` items."""
+
+    def __init__(self, capacity, error_rate=BLOOM_ERROR_RATE):
+        self.capacity = capacity
+        self.size = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self.positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(key))
+
+
+class RevocationList:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._answers = OrderedDict()  # jti -> revoked, most recently used last
+        self._last_id = 0
+        self._gaps = {}  # skipped BlacklistedToken id -> when it was first skipped
+        self._synced_at = self._built_at = 0.0
+
+    def is_revoked(self, jti):
+        self.refresh()
+        if jti not in self._bloom:
+            return False
+        with self._lock:
+            if jti in self._answers:
+                self._answers.move_to_end(jti)
+                return self._answers[jti]
+        revoked = BlacklistedToken.objects.filter(token__jti=jti).exists()
+        self.remember(jti, revoked)
+        return revoked
+
+    def revoke(self, jti):
+        """Record a revocation this process has just written to the blacklist."""
+        self.refresh()
+        with self._lock:
+            self._bloom.add(jti)
+        self.remember(jti, True)
+
+    def remember(self, jti, revoked):
+        with self._lock:
+            self._answers[jti] = revoked
+            self._answers.move_to_end(jti)
+            while len(self._answers) > TOKEN_REVOCATION_LRU_SIZE:
+                self._answers.popitem(last=False)
+
+    def refresh(self):
+        now = time.monotonic()
+        if self._bloom is None or now - self._built_at >= TOKEN_REVOCATION_REBUILD_SECONDS:
+            self.rebuild()
+        elif now - self._synced_at >= TOKEN_REVOCATION_SYNC_SECONDS:
+            self.sync()
+
+    def rebuild(self):
+        last_id = BlacklistedToken.objects.aggregate(last_id=Max("id"))["last_id"] or 0
+        rows = list(BlacklistedToken.objects.filter(id__lte=last_id, token__expires_at__gt=timezone.now())
+                    .values_list("id", "token__jti"))
+        bloom = BloomFilter(max(TOKEN_REVOCATION_BLOOM_CAPACITY, 2 * len(rows)))
+        for _, jti in rows:
+            bloom.add(jti)
+        # Expired rows are left out of the filter but are not gaps: only ids not committed yet are
+        seen = set(BlacklistedToken.objects.filter(id__gt=last_id - MAX_GAPS, id__lte=last_id).values_list("id", flat=True))
+        now = time.monotonic()
+        with self._lock:
+            self._bloom = bloom
+            self._answers.clear()
+            self._last_id = last_id
+            self._gaps = gaps_below(last_id + 1, seen, 1, now)
+            self._synced_at = self._built_at = now
+
+    def sync(self):
+        """Add blacklist rows written since the last sync, by any process."""
+        now = time.monotonic()
+        with self._lock:
+            self._gaps = {pk: seen for pk, seen in self._gaps.items() if now - seen < GAP_RECHECK_SECONDS}
+            last_id, gaps = self._last_id, list(self._gaps)
+            self._synced_at = now
+        rows = list(BlacklistedToken.objects.filter(Q(id__gt=last_id) | Q(id__in=gaps)).values_list("id", "token__jti"))
+        if not rows:
+            return
+        with self._lock:
+            for pk, jti in rows:
+                self._bloom.add(jti)
+                self._answers.pop(jti, None)
+                self._gaps.pop(pk, None)
+            new_ids = {pk for pk, _ in rows if pk > last_id}
+            if new_ids:
+                self._gaps.update(gaps_below(max(new_ids), new_ids, last_id + 1, now))
+                self._last_id = max(self._last_id, max(new_ids))
+            if self._bloom.count > 2 * self._bloom.capacity:
+                self._built_at = 0.0  # Too full to stay accurate: rebuild at the next check
+
+    def reset(self):
+        with self._lock:
+            self._bloom = None
+            self._answers.clear()
+            self._last_id = 0
+            self._gaps = {}
+
+
+def gaps_below(top, seen, lowest, now):
+    """Ids in [lowest, top) that were not `seen`, at most the MAX_GAPS nearest to `top`."""
+    return {pk: now for pk in range(max(lowest, top - MAX_GAPS), top) if pk not in seen}
+
+
+revocations = RevocationList()
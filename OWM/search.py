@@ -0,0 +1,315 @@
+import itertools
+import math
+import operator
+import re
+import unicodedata
+from collections import Counter, defaultdict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Subquery
+from django.utils.text import Truncator
+
+from .models import Review, SearchDocument, SearchPosting, SearchTerm, Service, TeamMember
+
+# Full-text search over services, reviews and team members. The inverted index lives in
+# ordinary tables (SearchDocument, SearchTerm, SearchPosting), so search behaves the same
+# on every database backend. Text is lower-cased, accent-folded and split into words.
+# A query matches the documents that contain all of its words, the last one also as a
+# prefix (so results follow the user's typing), ranked by BM25. The per-document part of
+# BM25 is stored as SearchPosting.impact, so the rarest word's postings are read from
+# the index best first; reading stops at SEARCH_MAX_CANDIDATES matching documents, which
+# bounds the work per query however many documents contain its words.
+SEARCH_MAX_CANDIDATES = getattr(settings, "SEARCH_MAX_CANDIDATES", 100)
+SEARCH_PREFIX_EXPANSIONS = getattr(settings, "SEARCH_PREFIX_EXPANSIONS", 4)
+SEARCH_SUGGESTIONS = 10
+MAX_TERM_LENGTH = 40
+# BM25 parameters. Lengths are compared to a fixed average, so stored impacts never go stale.
+BM25_K1 = 1.2
+BM25_B = 0.75
+AVERAGE_LENGTH = 30
+IMPACT_SCALE = 1000
+# Field weights: a word in a name counts as three in a description
+NAME_WEIGHT = 3
+LABEL_WEIGHT = 2
+TEXT_WEIGHT = 1
+# The document total (for IDF) is cached rather than counted on every query
+DOCUMENT_TOTAL_KEY = "search:documents"
+DOCUMENT_TOTAL_TIMEOUT = 300
+
+TOKEN_RE = re.compile(r"[^\W_]+")
+STOPWORDS = frozenset(
+    "an and are as at be but by for from had has have he her his in is it its of on or our "
+    "she so than that the their them they this to was we were what when which who will with "
+    "would you your".split()
+)
+
+
+def tokenize(text):
+    """Lower-cased, accent-folded words of `text`, without stopwords and single characters."""
+    text = unicodedata.normalize("NFKD", text or "").lower()
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return [word[:MAX_TERM_LENGTH] for word in TOKEN_RE.findall(text) if len(word) > 1 and word not in STOPWORDS]
+
+
+def impacts(fields):
+    """{term: impact} for a document made of (text, weight) fields."""
+    frequencies = Counter()
+    for text, weight in fields:
+        for word in tokenize(text):
+            frequencies[word] += weight
+    length = sum(frequencies.values())
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / AVERAGE_LENGTH)
+    return {
+        term: max(1, round(IMPACT_SCALE * frequency * (BM25_K1 + 1) / (frequency + norm)))
+        for term, frequency in frequencies.items()
+    }
+
+
+# What gets indexed for each model: (title, snippet, category, [(text, weight), ...])
+def service_document(service):
+    return service.name, service.description, service.category, [
+        (service.name, NAME_WEIGHT), (service.get_category_display(), LABEL_WEIGHT), (service.description, TEXT_WEIGHT),
+    ]
+
+
+def review_document(review):
+    service = review.service
+    return service.name, review.comment, service.category, [(review.comment, TEXT_WEIGHT)]
+
+
+def team_document(member):
+    return member.name, member.bio, "", [
+        (member.name, NAME_WEIGHT), (member.get_role_display(), LABEL_WEIGHT), (member.bio, TEXT_WEIGHT),
+    ]
+
+
+Source = namedtuple("Source", "kind build queryset")
+
+SOURCES = {
+    Service: Source(SearchDocument.KIND_SERVICE, service_document, lambda: Service.objects.all()),
+    Review: Source(SearchDocument.KIND_REVIEW, review_document, lambda: Review.objects.select_related("service").only(
+        "id", "comment", "service__name", "service__category")),
+    TeamMember: Source(SearchDocument.KIND_TEAM, team_document, lambda: TeamMember.objects.all()),
+}
+
+
+def document_entry(instance):
+    title, snippet, category, fields = SOURCES[type(instance)].build(instance)
+    return instance.pk, Truncator(title).chars(100), Truncator(snippet).chars(200), category, impacts(fields)
+
+
+# Writing the index
+def term_ids(terms):
+    """{term: SearchTerm id}, creating the terms that are new."""
+    SearchTerm.objects.bulk_create([SearchTerm(term=term) for term in terms], ignore_conflicts=True)
+    return dict(SearchTerm.objects.filter(term__in=terms).values_list("term", "id"))
+
+
+def adjust_document_counts(deltas):
+    """Apply {term_id: delta} to SearchTerm.document_count, one UPDATE per distinct delta."""
+    by_delta = defaultdict(list)
+    for term_id, delta in deltas.items():
+        by_delta[delta].append(term_id)
+    for delta, ids in by_delta.items():
+        SearchTerm.objects.filter(pk__in=ids).update(document_count=F("document_count") + delta)
+
+
+def add_documents(kind, entries, count_terms=True):
+    """
+    Index new documents, given as document_entry() tuples. Returns {term_id: documents added},
+    which is also applied to the terms' document counts unless `count_terms` is False.
+    """
+    if not entries:
+        return Counter()
+    SearchDocument.objects.bulk_create([
+        SearchDocument(kind=kind, object_id=object_id, title=title, snippet=snippet, category=category)
+        for object_id, title, snippet, category, _ in entries
+    ])
+    # Read the ids back: bulk_create does not set them on every backend
+    document_ids = dict(SearchDocument.objects.filter(
+        kind=kind, object_id__in=[entry[0] for entry in entries]
+    ).values_list("object_id", "id"))
+    ids = term_ids({term for *_, terms in entries for term in terms})
+    SearchPosting.objects.bulk_create([
+        SearchPosting(term_id=ids[term], document_id=document_ids[object_id], kind=kind, category=category, impact=impact)
+        for object_id, _, _, category, terms in entries
+        for term, impact in terms.items()
+    ], batch_size=5000)
+    added = Counter(ids[term] for *_, terms in entries for term in terms)
+    if count_terms:
+        adjust_document_counts(added)
+    return added
+
+
+def remove_documents(kind, object_ids):
+    """Drop the documents of `kind` for `object_ids` (a list or a values("id") queryset)."""
+    documents = SearchDocument.objects.filter(kind=kind, object_id__in=object_ids)
+    postings = SearchPosting.objects.filter(document__in=documents)
+    counts = postings.values("term_id").annotate(total=Count("id")).order_by()
+    adjust_document_counts({row["term_id"]: -row["total"] for row in counts})
+    postings.delete()
+    documents.delete()
+
+
+def index_document(instance):
+    """Index a saved service, review or team member, replacing its previous document."""
+    kind = SOURCES[type(instance)].kind
+    entry = document_entry(instance)
+    with transaction.atomic():
+        remove_documents(kind, [instance.pk])
+        add_documents(kind, [entry])
+        if kind == SearchDocument.KIND_SERVICE:
+            refresh_review_documents(instance)
+
+
+def refresh_review_documents(service):
+    """Reviews are listed under their service's name and category: follow renames and moves."""
+    documents = SearchDocument.objects.filter(
+        kind=SearchDocument.KIND_REVIEW, object_id__in=Review.objects.filter(service_id=service.pk).values("id"),
+    )
+    title = Truncator(service.name).chars(100)
+    documents.exclude(title=title, category=service.category).update(title=title, category=service.category)
+    SearchPosting.objects.filter(document__in=documents).exclude(category=service.category).update(category=service.category)
+
+
+def deindex_document(instance):
+    remove_documents(SOURCES[type(instance)].kind, [instance.pk])
+
+
+def deindex_reviews(**filters):
+    """Drop the documents of every review matching `filters`, in a fixed number of queries."""
+    remove_documents(SearchDocument.KIND_REVIEW, Review.objects.filter(**filters).values("id"))
+
+
+def rebuild_search_index(batch_size=1000):
+    """Re-index every service, review and team member from scratch. Returns the number of documents."""
+    total, document_counts = 0, Counter()
+    with transaction.atomic():
+        SearchPosting.objects.all().delete()
+        SearchDocument.objects.all().delete()
+        SearchTerm.objects.all().delete()
+        for source in SOURCES.values():
+            rows = source.queryset().order_by().iterator(chunk_size=batch_size)
+            for chunk in iter(lambda: list(itertools.islice(rows, batch_size)), []):
+                document_counts.update(add_documents(source.kind, [document_entry(row) for row in chunk], count_terms=False))
+                total += len(chunk)
+        SearchTerm.objects.bulk_update(
+            [SearchTerm(pk=term_id, document_count=count) for term_id, count in document_counts.items()],
+            ["document_count"], batch_size=batch_size,
+        )
+    cache.set(DOCUMENT_TOTAL_KEY, total, DOCUMENT_TOTAL_TIMEOUT)
+    return total
+
+
+# Querying the index
+def document_total():
+    total = cache.get(DOCUMENT_TOTAL_KEY)
+    if total is None:
+        total = SearchDocument.objects.count()
+        cache.set(DOCUMENT_TOTAL_KEY, total, DOCUMENT_TOTAL_TIMEOUT)
+    return total
+
+
+def prefix_range(prefix):
+    # A range rather than LIKE 'prefix%', which not every backend serves from the unique index
+    return {"term__gte": prefix, "term__lt": prefix + "\uffff", "document_count__gt": 0}
+
+
+def search(query, kinds=None, category=None):
+    """
+    Rank the documents matching `query`, optionally only those of `kinds` or in `category`.
+    Returns [(document_id, score)], best first and at most about SEARCH_MAX_CANDIDATES long.
+    """
+    words = list(dict.fromkeys(tokenize(query)))
+    if not words:
+        return []
+    # A last word still being typed matches as a prefix too
+    prefix = words.pop() if not query[-1].isspace() else None
+
+    groups = []  # Per query word, {term_id: document_count} of the terms that satisfy it
+    if words:
+        found = {term: (pk, count) for term, pk, count in SearchTerm.objects.filter(
+            term__in=words, document_count__gt=0).values_list("term", "id", "document_count")}
+        if len(found) < len(words):
+            return []
+        groups = [dict([found[word]]) for word in words]
+    if prefix:
+        expansions = SearchTerm.objects.filter(**prefix_range(prefix)).order_by("-document_count")
+        groups.append(dict(expansions.values_list("id", "document_count")[:SEARCH_PREFIX_EXPANSIONS]))
+        if not groups[-1]:
+            return []
+
+    total = document_total()
+
+    def idf(document_count):
+        return math.log(1 + (total - document_count + 0.5) / (document_count + 0.5))
+
+    # Read one word's postings best first. Each other word's terms cost one probe of the
+    # (term, document) index per posting, and the scan stops once enough documents match.
+    # Drive with the word that needs the fewest probes: usually the rarest.
+    def probes(group):
+        return sum(group.values()) * max(1, sum(len(other) for other in groups if other is not group))
+
+    driver = min(groups, key=probes)
+    others = [group for group in groups if group is not driver]
+    other_postings = [
+        SearchPosting.objects.filter(term_id__in=group, document_id=OuterRef("document_id")) for group in others
+    ]
+    # EXISTS probes the index alone; the impacts are read only for the rows returned.
+    # A document holds each term once, so only a prefix's terms need ordering.
+    matches = [Exists(postings) for postings in other_postings]
+    other_impacts = {
+        f"impact_{index}": Subquery(
+            postings.values("impact") if len(group) == 1 else postings.order_by("-impact").values("impact")[:1]
+        )
+        for index, (group, postings) in enumerate(zip(others, other_postings))
+    }
+    other_idfs = [idf(sum(group.values())) for group in others]
+    per_term = math.ceil(SEARCH_MAX_CANDIDATES / len(driver))
+    scores = {}
+    for term_id, document_count in driver.items():
+        driver_idf = idf(document_count)
+        postings = SearchPosting.objects.filter(term_id=term_id)
+        if category:
+            postings = postings.filter(category=category)
+        if kinds:
+            postings = postings.filter(kind__in=kinds)
+        postings = postings.filter(*matches).annotate(**other_impacts)
+        rows = postings.order_by("-impact", "-document_id").values_list("document_id", "impact", *other_impacts)[:per_term]
+        for document_id, impact, *found in rows:
+            score = (driver_idf * impact + sum(map(operator.mul, other_idfs, found))) / IMPACT_SCALE
+            if score > scores.get(document_id, 0.0):
+                scores[document_id] = score
+    ranked = sorted(scores, key=lambda document_id: (-scores[document_id], -document_id))
+    return [(document_id, scores[document_id]) for document_id in ranked]
+
+
+def search_results(ranked):
+    """The API representation of (document_id, score) pairs from search()."""
+    documents = {
+        document["id"]: document
+        for document in SearchDocument.objects.filter(id__in=[document_id for document_id, _ in ranked]).values(
+            "id", "kind", "object_id", "title", "snippet", "category")
+    }
+    return [
+        {
+            "type": documents[document_id]["kind"],
+            "id": documents[document_id]["object_id"],
+            "title": documents[document_id]["title"],
+            "snippet": documents[document_id]["snippet"],
+            "category": documents[document_id]["category"] or None,
+            "score": round(score, 4),
+        }
+        for document_id, score in ranked if document_id in documents
+    ]
+
+
+def suggest(query, limit=SEARCH_SUGGESTIONS):
+    """Indexed words starting with the last word of `query`, the most common first."""
+    words = tokenize(query)
+    if not words:
+        return []
+    terms = SearchTerm.objects.filter(**prefix_range(words[-1])).order_by("-document_count", "term")
+    return list(terms.values_list("term", flat=True)[:limit])
@@ -1,15 +1,32 @@
+from operator import itemgetter
+
 from rest_framework import serializers
 from rest_framework.parsers import MultiPartParser, FormParser
+from django.conf import settings
 from django.contrib.auth.hashers import make_password
 from .models import *
+from .images import derivative_urls, derivative_urls_for_name
+from .storage import content_addressed_storage
+
+class SparseFieldsMixin:
+    """Limit the output to the comma-separated field names passed as `fields` in context (from `?fields=`)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get("fields")
+        if requested:
+            wanted = set(requested.split(","))
+            for name in set(self.fields) - wanted:
+                self.fields.pop(name)
 
 class CustomUserSerializer(serializers.ModelSerializer):
     profile_pic = serializers.ImageField(required=False)  # Make profile_pic optional
+    profile_pic_variants = serializers.SerializerMethodField()
     parser_classes = (MultiPartParser, FormParser)
 
     class Meta:
         model = CustomUser
-        fields = ['id', 'first_name', 'last_name', 'username', 'email', 'phone', 'profile_pic', 'password', 'address']
+        fields = ['id', 'first_name', 'last_name', 'username', 'email', 'phone', 'profile_pic', 'profile_pic_variants', 'password', 'address']
         extra_kwargs = {'password': {'write_only': True, 'required': False}}  # Make password optional
 
     def get(self, instance):
@@ -25,6 +42,9 @@ class CustomUserSerializer(serializers.ModelSerializer):
             "address": instance.address,
         }
 
+    def get_profile_pic_variants(self, obj):
+        return derivative_urls(obj.profile_pic, self.context.get("request"))
+
     def validate_email(self, value):
         """Ensure email is unique if changed"""
         user = self.instance
@@ -39,6 +59,22 @@ class CustomUserSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("This username is already taken.")
         return value
 
+    def create(self, validated_data):
+        """Create the user with a hashed password; pass `password_hash` to save() when it was hashed already"""
+        password = validated_data.pop("password", None)
+        password_hash = validated_data.pop("password_hash", None)
+        user = CustomUser(**validated_data)
+
+        if password_hash:
+            user.password = password_hash
+        elif password:
+            user.set_password(password)
+        else:
+            user.set_unusable_password()
+
+        user.save()
+        return user
+
     def update(self, instance, validated_data):
         """Handle profile updates, including optional image uploads"""
         profile_pic = validated_data.pop("profile_pic", None)
@@ -68,12 +104,25 @@ class CustomUserSerializer(serializers.ModelSerializer):
             representation["profile_pic"] = profile_pic_url
         return representation
 
-class ServiceSerializer(serializers.ModelSerializer):
+class ServiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    rating = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Service
-        fields = '__all__'
+        exclude = Service.RATING_FIELDS
 
-class BookingSerializer(serializers.ModelSerializer):
+    def get_rating(self, obj):
+        return {
+            "count": obj.rating_count,
+            "average": obj.rating_average,
+            "histogram": obj.rating_histogram,
+        }
+
+    def get_image_variants(self, obj):
+        return derivative_urls(obj.image, self.context.get("request"))
+
+class BookingSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.username')  # Auto-fill user
     service = ServiceSerializer()
     service_image_url = serializers.SerializerMethodField()
@@ -109,14 +158,142 @@ class ContactUsSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'email', 'subject', 'message', 'sent_at']
         read_only_fields = ['sent_at'] 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.username')  # Auto-fill user
 
     class Meta:
         model = Review
         fields = '__all__'
 
-class TeamMemberSerializer(serializers.ModelSerializer):
+    def validate_rating(self, value):
+        if value not in Service.RATING_VALUES:
+            raise serializers.ValidationError("Rating must be between 1 and 5.")
+        return value
+
+class TeamMemberSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    profile_pic_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = TeamMember
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+    def get_profile_pic_variants(self, obj):
+        return derivative_urls(obj.profile_pic, self.context.get("request"))
+
+# Read-only fast path for the list endpoints, on when FLAT_SERIALIZERS is set. A flat serializer
+# renders rows of values_list(named=True) into exactly what its ModelSerializer returns for the
+# same objects, without creating model instances or going through DRF's per-field machinery.
+# Field order and `?fields=` handling are taken from the ModelSerializer itself.
+class FlatSerializer:
+    serializer_class = None
+    # SerializerMethodFields, as output name -> columns passed to `get_<name>()`
+    method_columns = {}
+    # Nested serializers, as output name -> flat serializer class
+    nested = {}
+    # DRF fields whose to_representation() formats the column value; the rest pass through as loaded
+    FORMATTED_FIELDS = (serializers.DecimalField, serializers.DateTimeField, serializers.DateField, serializers.TimeField)
+
+    def __init__(self, context=None, prefix="", columns=None, sparse=True):
+        self.context = context or {}
+        self.request = self.context.get("request")
+        self.prefix = prefix
+        self.columns = [] if columns is None else columns  # Shared with nested serializers
+        requested = self.context.get("fields") if sparse else None
+        wanted = set(requested.split(",")) if requested else None
+        self.fields = [
+            (name, self.converter(name, field))
+            for name, field in self.model_fields().items()
+            if wanted is None or name in wanted
+        ]
+
+    @classmethod
+    def model_fields(cls):
+        if "_model_fields" not in cls.__dict__:
+            cls._model_fields = cls.serializer_class().fields
+        return cls._model_fields
+
+    def column(self, source):
+        name = self.prefix + source.replace(".", "__")
+        if name not in self.columns:
+            self.columns.append(name)
+        return self.columns.index(name)
+
+    def converter(self, name, field):
+        if name in self.nested:
+            nested = self.nested[name](self.context, f"{self.prefix}{field.source}__", self.columns, sparse=False)
+            return nested.to_representation
+        if isinstance(field, serializers.SerializerMethodField):
+            method, indexes = getattr(self, f"get_{name}"), [self.column(source) for source in self.method_columns[name]]
+            return lambda row: method(*[row[i] for i in indexes])
+        index = self.column(field.source)
+        if isinstance(field, serializers.FileField):
+            return lambda row: self.file_url(row[index])
+        if isinstance(field, self.FORMATTED_FIELDS):
+            to_representation = field.to_representation
+            return lambda row: None if row[index] is None else to_representation(row[index])
+        return itemgetter(index)
+
+    def file_url(self, name):
+        if not name:
+            return None
+        url = content_addressed_storage.url(name)
+        return self.request.build_absolute_uri(url) if self.request is not None else url
+
+    def project(self, queryset):
+        """The rows to pass to serialize(): the needed columns, plus the ordering columns used by cursor pagination."""
+        ordering = [field.lstrip("-") for field in queryset.query.order_by if isinstance(field, str)]
+        columns = self.columns + [field for field in ordering if field not in self.columns]
+        return queryset.values_list(*columns, named=True)
+
+    def to_representation(self, row):
+        return {name: convert(row) for name, convert in self.fields}
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+class FlatServiceSerializer(FlatSerializer):
+    serializer_class = ServiceSerializer
+    method_columns = {"rating": Service.RATING_FIELDS, "image_variants": ("image",)}
+
+    def get_rating(self, rating_count, rating_sum, *histogram):
+        return {
+            "count": rating_count,
+            "average": Service.average_rating(rating_sum, rating_count),
+            "histogram": {str(value): count for value, count in zip(Service.RATING_VALUES, histogram)},
+        }
+
+    def get_image_variants(self, image):
+        return derivative_urls_for_name(image, self.request)
+
+class FlatTeamMemberSerializer(FlatSerializer):
+    serializer_class = TeamMemberSerializer
+    method_columns = {"profile_pic_variants": ("profile_pic",)}
+
+    def get_profile_pic_variants(self, profile_pic):
+        return derivative_urls_for_name(profile_pic, self.request)
+
+class FlatReviewSerializer(FlatSerializer):
+    serializer_class = ReviewSerializer
+
+class FlatBookingSerializer(FlatSerializer):
+    serializer_class = BookingSerializer
+    method_columns = {"service_image_url": ("service__image",)}
+    nested = {"service": FlatServiceSerializer}
+
+    def get_service_image_url(self, service_image):
+        return self.file_url(service_image)
+
+FLAT_SERIALIZERS = {
+    flat.serializer_class: flat
+    for flat in (FlatServiceSerializer, FlatTeamMemberSerializer, FlatReviewSerializer, FlatBookingSerializer)
+}
+
+def list_projection(serializer_class, queryset, context):
+    """
+    (rows, serialize) for listing `queryset` with `serializer_class`: the flat fast path when
+    FLAT_SERIALIZERS is on and one exists, else the ModelSerializer. Paginate `rows`, not `queryset`.
+    """
+    if getattr(settings, "FLAT_SERIALIZERS", True) and serializer_class in FLAT_SERIALIZERS:
+        flat = FLAT_SERIALIZERS[serializer_class](context)
+        return flat.project(queryset), flat.serialize
+    return queryset, lambda rows: serializer_class(rows, many=True, context=context).data
@@ -0,0 +1,155 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .catalog import bump_catalog_version
+from .consumers import notify_availability, notify_user
+from .images import schedule_derivatives
+from .metrics import BOOKINGS_CREATED, CART_ADDS
+from .models import Booking, Cart, CustomUser, Review, Service, TeamMember
+from .occupancy import mark_booked, mark_free
+from .perf import install_query_dispatch
+from .search import deindex_document, deindex_reviews, index_document
+from .serializers import BookingSerializer, CartSerializer
+
+
+# Let the metrics and perf middleware see every query, whichever thread runs it (see OWM.perf)
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    install_query_dispatch(connection)
+
+
+# Invalidate the cached service catalog once a service change is committed
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def service_changed(sender, instance, **kwargs):
+    transaction.on_commit(bump_catalog_version)
+
+
+# Render image derivatives in the background once an upload is committed
+IMAGE_FIELDS = {Service: "image", TeamMember: "profile_pic", CustomUser: "profile_pic"}
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_save, sender=TeamMember)
+@receiver(post_save, sender=CustomUser)
+def image_saved(sender, instance, update_fields=None, **kwargs):
+    field_name = IMAGE_FIELDS[sender]
+    if update_fields is not None and field_name not in update_fields:
+        return
+    field_file = getattr(instance, field_name)
+    if field_file:
+        # Cached catalog entries list the derivatives, so refresh them once they exist
+        on_done = bump_catalog_version if sender is Service else None
+        transaction.on_commit(lambda: schedule_derivatives(field_file, on_done))
+
+
+# Keep the occupancy index in step with bookings, in the same transaction as the write,
+# and push booking, cart and availability deltas to connected sockets once it commits
+@receiver(post_save, sender=Booking)
+def booking_saved(sender, instance, created, **kwargs):
+    slot = (instance.service_id, instance.event_date)
+    previous = getattr(instance, "_loaded_slot", None)
+    freed = None
+    if created or previous != slot:
+        mark_booked(*slot)
+        if previous and all(previous) and previous != slot:
+            mark_free(*previous)
+            freed = previous
+    instance._loaded_slot = slot
+
+    def push():
+        if created:
+            BOOKINGS_CREATED.labels("single").inc()
+        # Serialized after the commit, and only for a user with a socket open
+        notify_user(instance.user_id, lambda: {
+            "type": "booking", "action": "saved", "booking": BookingSerializer(instance).data,
+        })
+        notify_availability(*slot, available=False)
+        if freed:
+            notify_availability(*freed, available=True)
+
+    transaction.on_commit(push)
+
+
+@receiver(post_delete, sender=Booking)
+def booking_deleted(sender, instance, **kwargs):
+    slot = (instance.service_id, instance.event_date)
+    mark_free(*slot)
+
+    # Clients drop deleted bookings by id; a cascade from the service would leave nothing to serialize
+    payload = {"type": "booking", "action": "deleted", "booking": {"id": instance.pk}}
+    user_id = instance.user_id
+
+    def push():
+        notify_user(user_id, payload)
+        notify_availability(*slot, available=True)
+
+    transaction.on_commit(push)
+
+
+# Keep the services' rating stats in step with reviews, in the same transaction as the write,
+# and refresh the cached catalog, which shows them, once it commits
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    rating = (instance.service_id, instance.rating)
+    previous = None if created else getattr(instance, "_loaded_rating", (None, None))
+    instance._loaded_rating = rating
+    if previous == rating or not (created or all(previous)):
+        return  # Unchanged, or loaded without them so there is no telling what changed
+    if previous:
+        Service.add_rating(*previous, count=-1)
+    Service.add_rating(*rating)
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, origin=None, **kwargs):
+    if getattr(origin, "model", type(origin)) is Service:
+        return  # Cascaded: the service and its stats are going too
+    Service.add_rating(instance.service_id, instance.rating, count=-1)
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Cart)
+@receiver(post_delete, sender=Cart)
+def cart_changed(sender, instance, **kwargs):
+    if "created" in kwargs:
+        def payload():
+            # Serialized after the commit, and only for a user with a socket open
+            return {"type": "cart", "action": "saved", "cart_item": CartSerializer(instance).data}
+    else:
+        # Clients drop deleted items by id; serializing them would cost a service query per row on bulk deletes
+        payload = {"type": "cart", "action": "deleted", "cart_item": {"id": instance.pk}}
+    user_id = instance.user_id
+
+    def push():
+        if kwargs.get("created"):
+            CART_ADDS.inc()
+        notify_user(user_id, payload)
+
+    transaction.on_commit(push)
+
+
+# Keep the search index in step with the searchable models, in the same transaction as the write
+@receiver(post_save, sender=Service)
+@receiver(post_save, sender=Review)
+@receiver(post_save, sender=TeamMember)
+def search_source_saved(sender, instance, **kwargs):
+    index_document(instance)
+
+
+@receiver(post_delete, sender=Service)
+@receiver(post_delete, sender=Review)
+@receiver(post_delete, sender=TeamMember)
+def search_source_deleted(sender, instance, origin=None, **kwargs):
+    if sender is Review and getattr(origin, "model", type(origin)) in (Service, CustomUser):
+        return  # Cascaded: reviews_cascading() already dropped them in bulk
+    deindex_document(instance)
+
+
+@receiver(pre_delete, sender=Service)
+@receiver(pre_delete, sender=CustomUser)
+def reviews_cascading(sender, instance, **kwargs):
+    deindex_reviews(**{"service_id" if sender is Service else "user_id": instance.pk})
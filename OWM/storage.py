@@ -0,0 +1,70 @@
+import hashlib
+import os
+import re
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores uploads by the SHA-256 of their content inside the `upload_to` directory,
+    e.g. `Profile_Pics/3f/3fa1...c9.jpg`. Identical uploads resolve to one blob, so
+    re-uploads cost no disk and every URL is immutable. Blobs no row references
+    are removed by `manage.py gc_media`.
+    """
+    TEMP_DIR = ".cas-tmp"
+    HASHED_NAME_RE = re.compile(r"(^|/)[0-9a-f]{2}/[0-9a-f]{64}(\.[\w]+)?$")
+
+    @classmethod
+    def is_hashed_name(cls, name):
+        return bool(cls.HASHED_NAME_RE.search(name))
+
+    def hashed_name(self, name, digest):
+        directory = os.path.dirname(name)
+        ext = os.path.splitext(name)[1].lower()[:10]
+        return "/".join(part for part in (directory, digest[:2], digest + ext) if part)
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is derived from the content in _save and is never suffixed
+        return name
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk if isinstance(chunk, bytes) else chunk.encode())
+        content.seek(0)
+
+        name = self.hashed_name(name, digest.hexdigest())
+        if self.exists(name):
+            self.touch(name)
+            return name
+
+        # Write under a unique temporary name, then hardlink into place so that two
+        # concurrent uploads of the same content can never expose a partial blob
+        temp_name = super()._save(f"{self.TEMP_DIR}/{uuid.uuid4().hex}", content)
+        try:
+            os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+            os.link(self.path(temp_name), self.path(name))
+        except FileExistsError:
+            self.touch(name)
+        finally:
+            os.remove(self.path(temp_name))
+        return name
+
+
+    def touch(self, name):
+        """
+        Mark a reused blob as just uploaded: the row about to reference it may not be committed
+        yet, and gc_media spares blobs modified within its grace period.
+        """
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            pass  # Collected in the meantime; the caller's save writes it again on the next upload
+
+
+content_addressed_storage = ContentAddressedStorage()
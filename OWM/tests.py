@@ -1,3 +1,1709 @@
-from django.test import TestCase
+import datetime
+import importlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import jwt
+
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib import admin
+from django.core import mail
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image as PILImage
+from prometheus_client import REGISTRY
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .authentication import LazyTokenUser, OWMRefreshToken, StatelessJWTAuthentication, user_instance
+from .benchmark import (
+    SCENARIOS, percentile, run_benchmark, run_connection_benchmark, run_serializer_benchmark, seed_benchmark_data,
+)
+from .checks import check_catalog_cache
+from .consumers import JWTAuthMiddleware
+from .db_router import PIN_COOKIE, ReplicaRouter, healthy_replicas, mark_replica
+from .middleware import MediaFilesMiddleware, PerfInstrumentationMiddleware, ReplicaRoutingMiddleware
+from .models import *
+from . import images
+from .images import IMAGE_DERIVATIVES, derivative_name, generate_derivatives, has_derivatives
+from .management.commands.gc_media import Command as GcMediaCommand
+from .outbox import (
+    OUTBOX_BACKOFF_SECONDS, build_message, flush_outbox, schedule_flush, schedule_retry, send_pending,
+)
+from .occupancy import rebuild_occupancy
+from . import passwords
+from .passwords import LoginBackoff, client_ip, login_backoff
+from .perf import QueryRecorder, reset_perf_config, set_perf_config
+from .revocation import BloomFilter, revocations
+from .routing import websocket_urlpatterns
+from .search import rebuild_search_index
+from .renderers import ORJSONRenderer
+from .serializers import (
+    FLAT_SERIALIZERS, BookingSerializer, CustomUserSerializer, ReviewSerializer, ServiceSerializer, TeamMemberSerializer,
+    list_projection,
+)
+from .storage import ContentAddressedStorage, content_addressed_storage
+from .views import BookingView, ReviewListView, ServiceDetailView, ServiceListView, TeamListView
+
+
+@override_settings(CATALOG_CACHE_ENABLED=True)
+class ServiceCatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.photo = Service.objects.create(name="Portraits", category="photo", description="Studio shoot", price="150.00")
+        self.video = Service.objects.create(name="Weddings", category="video", description="Full day", price="900.00")
+
+    def test_warm_catalog_runs_no_queries(self):
+        url = reverse("service-list")
+        self.assertEqual(len(self.client.get(url).json()), 2)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+
+        detail_url = reverse("updateservice", args=[self.photo.pk])
+        self.client.get(detail_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(detail_url)
+        self.assertEqual(response.json()["name"], "Portraits")
+
+    def test_category_slice(self):
+        response = self.client.get(reverse("service-list"), {"category": "video"})
+        self.assertEqual([s["name"] for s in response.json()], ["Weddings"])
+
+        response = self.client.get(reverse("service-list"), {"category": "drone"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_conditional_get_returns_304(self):
+        url = reverse("service-list")
+        response = self.client.get(url)
+        self.assertIn("ETag", response)
+        self.assertIn("Last-Modified", response)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_service_change_invalidates_catalog(self):
+        url = reverse("service-list")
+        etag = self.client.get(url)["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.photo.name = "Headshots"
+            self.photo.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Headshots", [s["name"] for s in response.json()])
+
+    @override_settings(CATALOG_CACHE_ENABLED=False)
+    def test_uncached_catalog_still_answers_conditional_gets(self):
+        url = reverse("service-list")
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # No version to bump: the next request sees the change without any on_commit hook
+        Service.objects.filter(pk=self.photo.pk).update(name="Headshots")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Headshots", [s["name"] for s in response.json()])
+
+    def test_check_requires_a_shared_cache(self):
+        self.assertEqual([error.id for error in check_catalog_cache(None)], ["OWM.E001"])
+        redis = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://cache:6379/1"}}
+        with override_settings(CACHES=redis):
+            self.assertEqual(check_catalog_cache(None), [])
+
+
+class BookingQueryCountTests(TestCase):
+    """Booking endpoints must cost the same number of queries for 1 or 1,000 bookings."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="amina", password="pass12345", address="Nairobi")
+        self.service = Service.objects.create(name="Portraits", category="photo", description="Studio shoot", price="150.00")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_bookings(self, count):
+        start = datetime.date(2030, 1, 1) + datetime.timedelta(days=Booking.objects.count())
+        Booking.objects.bulk_create(
+            Booking(
+                user=self.user, service=self.service, event_date=start + datetime.timedelta(days=i),
+                event_time=datetime.time(10, 0), event_location="Studio",
+            )
+            for i in range(count)
+        )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx)
+
+    def assert_constant_queries(self, url):
+        self.add_bookings(1)
+        baseline = self.count_queries(url)
+        self.add_bookings(999)
+        self.assertEqual(self.count_queries(url), baseline)
+
+    def test_booking_list(self):
+        self.assert_constant_queries(reverse("booking-list"))
+
+    def test_user_dashboard(self):
+        self.assert_constant_queries(reverse("userdashboard"))
+
+    def test_booking_detail(self):
+        self.add_bookings(1)
+        booking = Booking.objects.get()
+        with self.assertNumQueries(1):
+            self.client.get(reverse("booking", args=[booking.pk]))
+
+
+class UserDashboardTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="amina", password="pass12345", address="Nairobi")
+        self.service = Service.objects.create(name="Portraits", category="photo", description="Studio shoot", price="150.00")
+        for day, booking_status in enumerate(["pending", "completed", "canceled", "pending"], start=1):
+            Booking.objects.create(
+                user=self.user, service=self.service, event_date=datetime.date(2030, 1, day),
+                event_time=datetime.time(10, 0), event_location="Studio", status=booking_status,
+            )
+        Cart.objects.create(
+            user=self.user, service=self.service, event_date=datetime.date(2030, 2, 1),
+            event_time=datetime.time(10, 0), event_location="Studio",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bookings_partitioned_by_status(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("userdashboard"))
+        bookings = response.data["bookings"]
+        self.assertEqual(len(bookings["pending"]), 2)
+        self.assertEqual(len(bookings["completed"]), 1)
+        self.assertEqual(len(bookings["cancelled"]), 1)
+        self.assertEqual(len(response.data["cart"]), 1)
+        self.assertEqual(response.data["user"]["username"], "amina")
+
+    def test_sections_limit_response(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("userdashboard"), {"sections": "cart"})
+        self.assertEqual(list(response.data), ["cart"])
+
+        response = self.client.get(reverse("userdashboard"), {"sections": "cart,invoices"})
+        self.assertEqual(response.status_code, 400)
+
+
+class BookingDeleteTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="amina", password="pass12345", address="Nairobi")
+        self.service = Service.objects.create(name="Portraits", category="photo", description="Studio shoot", price="150.00")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def delete(self, booking_status):
+        booking = Booking.objects.create(
+            user=self.user, service=self.service, event_date=datetime.date(2030, 1, Booking.objects.count() + 1),
+            event_time=datetime.time(10, 0), event_location="Studio", status=booking_status,
+        )
+        return self.client.delete(reverse("booking", args=[booking.pk])).status_code
+
+    def test_owner_deletes_the_bookings_they_may_edit(self):
+        self.assertEqual(self.delete("pending"), 204)
+        self.assertEqual(self.delete("canceled"), 204)
+        self.assertEqual(self.delete("completed"), 403)
+
+
+class BookingSlotConcurrencyTests(TransactionTestCase):
+    """Parallel attempts to book one slot must yield exactly one booking."""
+
+    attempts = 8
+
+    def setUp(self):
+        self.service = Service.objects.create(name="Portraits", category="photo", description="Studio shoot", price="150.00")
+        self.users = []
+        for i in range(self.attempts):
+            user = CustomUser.objects.create_user(username=f"client{i}", password="pass12345", address="Nairobi")
+            Cart.objects.create(
+                user=user, service=self.service, event_date=datetime.date(2030, 6, 1),
+                event_time=datetime.time(10, 0), event_location="Studio",
+            )
+            self.users.append(user)
+
+    def test_parallel_bookings_for_one_slot(self):
+        barrier = threading.Barrier(self.attempts)
+        results = []
+
+        def attempt(user):
+            client = APIClient()
+            client.force_authenticate(user)
+            barrier.wait()
+            try:
+                results.append(client.post(reverse("booking", args=[self.service.pk])).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=attempt, args=(user,)) for user in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(results), [201] + [400] * (self.attempts - 1))
+        self.assertEqual(Booking.objects.filter(service=self.service, event_date=datetime.date(2030, 6, 1)).count(), 1)
+        self.assertEqual(Cart.objects.count(), self.attempts - 1)
+
+
+class PaginationAndFieldsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username="amina", password="pass12345", address="Nairobi")
+        self.service = Service.objects.create(name="Portraits", category="photo", description="Studio shoot", price="150.00")
+        Review.objects.bulk_create(
+            Review(user=self.user, service=self.service, rating=5, comment=f"Review {i}") for i in range(5)
+        )
+        self.client = APIClient()
+
+    def test_unpaginated_list_by_default(self):
+        response = self.client.get(reverse("review-list"))
+        self.assertIsInstance(response.json(), list)
+        self.assertEqual(len(response.json()), 5)
+
+    def test_cursor_pages_cover_every_row_once(self):
+        seen = []
+        response = self.client.get(reverse("review-list"), {"page_size": 2})
+        while True:
+            seen.extend(review["id"] for review in response.json()["results"])
+            if not response.json()["next"]:
+                break
+            response = self.client.get(response.json()["next"])
+        self.assertEqual(sorted(seen), sorted(Review.objects.values_list("id", flat=True)))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_sparse_fields(self):
+        response = self.client.get(reverse("service-list"), {"fields": "id,name"})
+        self.assertEqual(response.json(), [{"id": self.service.pk, "name": "Portraits"}])
+
+        response = self.client.get(reverse("team"), {"fields": "name", "page_size": 1})
+        self.assertEqual(response.json()["results"], [])
+
+
+class ServiceRatingStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username="amina", password="pass12345", address="Nairobi")
+        self.service = Service.objects.create(name="Portraits", category="photo", description="Studio shoot", price="150.00")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post_review(self, rating):
+        return self.client.post(reverse("review-list"), {"service": self.service.pk, "rating": rating, "comment": "Great"})
+
+    def test_posting_reviews_updates_stats(self):
+        for rating in (5, 4, 5):
+            self.assertEqual(self.post_review(rating).status_code, 201)
+        self.assertEqual(self.post_review(9).status_code, 400)
+
+        rating = self.client.get(reverse("updateservice", args=[self.service.pk])).json()["rating"]
+        self.assertEqual(rating["count"], 3)
+        self.assertEqual(rating["average"], 4.67)
+        self.assertEqual(rating["histogram"], {"1": 0, "2": 0, "3": 0, "4": 1, "5": 2})
+
+    def test_rebuild_command_matches_incremental_stats(self):
+        for rating in (1, 3, 3, 5):
+            self.post_review(rating)
+        before = Service.objects.values(*Service.RATING_FIELDS).get()
+        Service.objects.update(rating_count=0, rating_sum=0, rating_3=0)
+
+        call_command("rebuild_rating_stats", stdout=io.StringIO())
+        self.assertEqual(Service.objects.values(*Service.RATING_FIELDS).get(), before)
+
+    def stats(self, service=None):
+        return Service.objects.values(*Service.RATING_FIELDS).get(pk=(service or self.service).pk)
+
+    def test_edits_and_deletes_move_stats(self):
+        other = Service.objects.create(name="Podcast", category="audio", description="Mixing", price="99.00")
+        for rating in (5, 2):
+            self.post_review(rating)
+        review = Review.objects.get(rating=2)
+        review.rating = 4
+        review.save()
+        stats = self.stats()
+        self.assertEqual([stats[field] for field in ("rating_count", "rating_sum", "rating_2", "rating_4", "rating_5")], [2, 9, 0, 1, 1])
+
+        review.service = other
+        review.save()
+        self.assertEqual((self.stats()["rating_count"], self.stats()["rating_4"]), (1, 0))
+        self.assertEqual((self.stats(other)["rating_count"], self.stats(other)["rating_4"]), (1, 1))
+
+        Review.objects.filter(rating=5).delete()
+        self.assertEqual(self.stats(), {field: 0 for field in Service.RATING_FIELDS})
+
+        # Deleting the reviewer cascades to their reviews
+        self.user.delete()
+        self.assertEqual(self.stats(other), {field: 0 for field in Service.RATING_FIELDS})
+
+    def test_migration_backfills_existing_reviews(self):
+        for rating in (1, 3, 3):
+            self.post_review(rating)
+        before = self.stats()
+        Service.objects.update(**{field: 0 for field in Service.RATING_FIELDS})
+
+        migration = importlib.import_module("OWM.migrations.0004_service_rating_stats")
+        migration.backfill_rating_stats(django_apps, None)
+        self.assertEqual(self.stats(), before)
+
+    def test_service_list_with_ratings_is_one_query(self):
+        for rating in (2, 4):
+            self.post_review(rating)
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("service-list"))
+        self.assertEqual(response.json()[0]["rating"]["count"], 2)
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError("SMTP server unavailable")
+
+
+class ClaimCheckingEmailBackend(BaseEmailBackend):
+    """Records, for each message, whether its outbox row was already claimed when it went out."""
+    claimed = []
+
+    def send_messages(self, email_messages):
+        contact = ContactUs.objects.get()
+        self.claimed.append(contact.email_next_attempt_at > timezone.now())
+        return len(email_messages)
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend", OUTBOX_SEND_IN_PROCESS=False)
+class ContactOutboxTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="amina", password="pass12345", address="Nairobi",
+            first_name="Amina", last_name="Otieno", email="amina@example.com",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post_contact(self):
+        return self.client.post(reverse("contactus"), {"subject": "Wedding", "message": "Are you free in June?"})
+
+    def test_post_queues_without_sending(self):
+        response = self.post_contact()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(mail.outbox), 0)
+        contact = ContactUs.objects.get()
+        self.assertEqual(contact.name, "Amina Otieno")
+        self.assertEqual(contact.email_status, ContactUs.EMAIL_PENDING)
+
+    def test_flush_sends_batch_and_records_delivery(self):
+        self.post_contact()
+        self.post_contact()
+        self.assertEqual(flush_outbox(), 2)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].reply_to, ["amina@example.com"])
+        self.assertFalse(ContactUs.objects.exclude(email_status=ContactUs.EMAIL_SENT).exists())
+
+    def test_failed_send_is_retried_with_backoff(self):
+        self.post_contact()
+        with override_settings(EMAIL_BACKEND="OWM.tests.FailingEmailBackend"):
+            self.assertEqual(flush_outbox(), 0)
+        contact = ContactUs.objects.get()
+        self.assertEqual(contact.email_status, ContactUs.EMAIL_PENDING)
+        self.assertEqual(contact.email_attempts, 1)
+        self.assertIn("unavailable", contact.email_last_error)
+        self.assertGreater(contact.email_next_attempt_at, timezone.now())
+
+        # Not due yet, then delivered once the backoff has elapsed
+        self.assertEqual(flush_outbox(), 0)
+        ContactUs.objects.update(email_next_attempt_at=timezone.now())
+        self.assertEqual(flush_outbox(), 1)
+        self.assertEqual(ContactUs.objects.get().email_status, ContactUs.EMAIL_SENT)
+
+    def test_failed_send_schedules_a_retry(self):
+        self.post_contact()
+        with override_settings(EMAIL_BACKEND="OWM.tests.FailingEmailBackend"):
+            flush_outbox()
+        with mock.patch("OWM.outbox.threading.Timer") as timer:
+            schedule_retry()
+        delay, callback = timer.call_args.args
+        self.assertAlmostEqual(delay, OUTBOX_BACKOFF_SECONDS, delta=5)
+        self.assertIs(callback, schedule_flush)
+        timer.return_value.start.assert_called_once()
+
+        ContactUs.objects.update(email_status=ContactUs.EMAIL_SENT)
+        with mock.patch("OWM.outbox.threading.Timer") as timer:
+            schedule_retry()
+        timer.assert_not_called()
+
+    def test_flush_continues_past_a_failed_batch(self):
+        for _ in range(3):
+            self.post_contact()
+        with mock.patch("OWM.outbox.OUTBOX_BATCH_SIZE", 1), \
+                mock.patch("OWM.outbox.build_message", side_effect=[ValueError("bad address"), *[mock.DEFAULT] * 2],
+                           wraps=build_message):
+            self.assertEqual(flush_outbox(), 2)
+        self.assertEqual(ContactUs.objects.filter(email_status=ContactUs.EMAIL_SENT).count(), 2)
+
+    def test_rows_are_claimed_before_sending(self):
+        self.post_contact()
+        ClaimCheckingEmailBackend.claimed = []
+        with override_settings(EMAIL_BACKEND="OWM.tests.ClaimCheckingEmailBackend"):
+            self.assertEqual(send_pending(), 1)
+        # A second sender would have skipped the row while the message was going out
+        self.assertEqual(ClaimCheckingEmailBackend.claimed, [True])
+        self.assertEqual(ContactUs.objects.get().email_status, ContactUs.EMAIL_SENT)
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # What this process knows about derivatives belongs to the previous test's MEDIA_ROOT
+        self.enterContext(mock.patch("OWM.images._generated", OrderedDict()))
+        self.enterContext(mock.patch("OWM.images._missing", {}))
+
+    def upload_service(self):
+        buffer = io.BytesIO()
+        PILImage.new("RGB", (1200, 800), "teal").save(buffer, "JPEG")
+        return Service.objects.create(
+            name="Portraits", category="photo", description="Studio shoot", price="150.00",
+            image=SimpleUploadedFile("portrait.jpg", buffer.getvalue(), content_type="image/jpeg"),
+        )
+
+    def test_missing_derivatives_are_not_looked_up_per_request(self):
+        service = self.upload_service()
+        with mock.patch.object(default_storage, "exists", wraps=default_storage.exists) as exists:
+            for _ in range(3):
+                self.assertEqual(ServiceSerializer(service).data["image_variants"], {})
+        self.assertEqual(exists.call_count, 1)
+
+        generate_derivatives(service.image.name, service.image.storage)
+        self.assertEqual(set(ServiceSerializer(service).data["image_variants"]), set(IMAGE_DERIVATIVES))
+
+    def test_remembers_a_bounded_number_of_generated_originals(self):
+        markers = {f"services/{name}.jpg": derivative_name(f"services/{name}.jpg", "full", "jpeg") for name in "abc"}
+        with mock.patch("OWM.images.MAX_REMEMBERED_IMAGES", 2), \
+                mock.patch.object(default_storage, "exists", side_effect=lambda name: name in markers.values()) as exists:
+            for name in ("services/a.jpg", "services/b.jpg", "services/a.jpg", "services/c.jpg"):
+                self.assertTrue(has_derivatives(name))
+            self.assertEqual(exists.call_count, 3)
+            # b was checked least recently, so it is the one forgotten
+            self.assertEqual(list(images._generated), ["services/a.jpg", "services/c.jpg"])
+
+    def test_backfill_command_generates_every_size_and_format(self):
+        service = self.upload_service()
+        self.assertEqual(ServiceSerializer(service).data["image_variants"], {})
+
+        call_command("generate_image_derivatives", stdout=io.StringIO())
+
+        variants = ServiceSerializer(service).data["image_variants"]
+        self.assertEqual(set(variants), set(IMAGE_DERIVATIVES))
+        self.assertIn("jpeg", variants["thumb"])
+        self.assertIn("webp", variants["thumb"])
+        with default_storage.open(derivative_name(service.image.name, "thumb", "jpeg")) as thumb:
+            self.assertEqual(PILImage.open(thumb).size, (160, 160))
+        with default_storage.open(derivative_name(service.image.name, "full", "webp")) as full:
+            self.assertEqual(PILImage.open(full).size, (1200, 800))
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = CustomUser.objects.create_user(username="amina", password="pass12345", address="Nairobi")
+
+    def upload(self, content, filename="avatar.jpg"):
+        serializer = CustomUserSerializer(
+            self.user, data={"profile_pic": SimpleUploadedFile(filename, content, content_type="image/jpeg")}, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        return serializer.save().profile_pic.name
+
+    def image_bytes(self, color):
+        buffer = io.BytesIO()
+        PILImage.new("RGB", (40, 40), color).save(buffer, "JPEG")
+        return buffer.getvalue()
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self.upload(self.image_bytes("red"))
+        second = self.upload(self.image_bytes("red"), filename="avatar-copy.jpg")
+        self.assertEqual(first, second)
+        self.assertTrue(ContentAddressedStorage.is_hashed_name(first))
+        stored = list(os.scandir(os.path.dirname(self.user.profile_pic.path)))
+        self.assertEqual(len(stored), 1)
+
+    def test_gc_removes_only_unreferenced_blobs(self):
+        old = self.upload(self.image_bytes("red"))
+        current = self.upload(self.image_bytes("blue"))
+
+        call_command("gc_media", "--grace=0", stdout=io.StringIO())
+        self.assertFalse(default_storage.exists(old))
+        self.assertTrue(default_storage.exists(current))
+
+    def test_reusing_a_blob_restarts_its_grace_period(self):
+        name = self.upload(self.image_bytes("red"))
+        path = default_storage.path(name)
+        os.utime(path, (0, 0))
+        self.upload(self.image_bytes("red"))
+        self.assertGreater(os.path.getmtime(path), timezone.now().timestamp() - 60)
+
+    def test_gc_spares_a_blob_referenced_during_the_scan(self):
+        orphan = self.upload(self.image_bytes("red"))
+        self.upload(self.image_bytes("blue"))
+        scan = GcMediaCommand.stored_names
+
+        def scan_while_uploading(command, storage, upload_to):
+            for name in scan(command, storage, upload_to):
+                if name == orphan:  # Another request saves a row pointing at it
+                    CustomUser.objects.filter(pk=self.user.pk).update(profile_pic=orphan)
+                yield name
+
+        with mock.patch.object(GcMediaCommand, "stored_names", scan_while_uploading):
+            call_command("gc_media", "--grace=0", stdout=io.StringIO())
+        self.assertTrue(default_storage.exists(orphan))
+
+
+@override_settings(SERVE_MEDIA=True)
+class MediaFilesMiddlewareTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.content = bytes(range(256)) * 4
+        self.name = content_addressed_storage.save("services/poster.jpg", ContentFile(self.content))
+
+    def get(self, name, **headers):
+        middleware = MediaFilesMiddleware(lambda request: HttpResponse("django"))
+        return middleware(RequestFactory().get(f"/media/{name}", headers=headers))
+
+    def test_full_file_with_immutable_caching(self):
+        response = self.get(self.name)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+
+    def test_byte_ranges(self):
+        response = self.get(self.name, Range="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 10-19/{len(self.content)}")
+        self.assertEqual(b"".join(response.streaming_content), self.content[10:20])
+
+        response = self.get(self.name, Range="bytes=-5")
+        self.assertEqual(b"".join(response.streaming_content), self.content[-5:])
+
+        self.assertEqual(self.get(self.name, Range="bytes=5000-").status_code, 416)
+
+    def test_conditional_get(self):
+        etag = self.get(self.name)["ETag"]
+        self.assertEqual(self.get(self.name, If_None_Match=etag).status_code, 304)
+
+    def test_missing_and_traversal(self):
+        self.assertEqual(self.get("services/missing.jpg").status_code, 404)
+        self.assertEqual(self.get("../settings.py").status_code, 404)
+
+
+class AsyncPublicViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username="amina", password="pass12345", address="Nairobi")
+        self.service = Service.objects.create(name="Portraits", category="photo", description="Studio shoot", price="150.00")
+        Review.objects.create(user=self.user, service=self.service, rating=4, comment="Lovely ✨")
+
+    def test_views_are_async(self):
+        for view in (ServiceListView, ServiceDetailView, TeamListView, ReviewListView):
+            self.assertTrue(view.view_is_async, view.__name__)
+
+    async def test_async_client_renders_drf_json(self):
+        response = await self.async_client.get(reverse("review-list"))
+        self.assertEqual(response.status_code, 200)
+        reviews = [review async for review in Review.objects.select_related("user")]
+        self.assertEqual(response.content, JSONRenderer().render(ReviewSerializer(reviews, many=True).data))
+
+        response = await self.async_client.get(reverse("updateservice", args=[self.service.pk + 1]))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(DEBUG=True, SERVE_MEDIA=True, PERF_INSTRUMENTATION=True, DATABASE_REPLICAS=["replica_1"])
+    def test_middleware_runs_natively_under_asgi(self):
+        # With DEBUG on, Django logs each middleware it has to wrap in sync_to_async (or finds unused)
+        with self.assertNoLogs("django.request", "DEBUG"):
+            ASGIHandler()
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class UpdatesSocketTests(TransactionTestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="amina", password="pass12345", address="Nairobi")
+        self.service = Service.objects.create(name="Portraits", category="photo", description="Studio shoot", price="150.00")
+        self.application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+    def connect(self, token=None):
+        path = f"/ws/updates/?token={token}" if token else "/ws/updates/"
+        return WebsocketCommunicator(self.application, path)
+
+    async def test_rejects_missing_or_invalid_token(self):
+        for token in (None, "not-a-jwt"):
+            communicator = self.connect(token)
+            connected, code = await communicator.connect()
+            self.assertFalse(connected)
+            self.assertEqual(code, 4401)
+
+    async def test_pushes_booking_and_availability_deltas(self):
+        communicator = self.connect(str(AccessToken.for_user(self.user)))
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        await sync_to_async(Booking.objects.create)(
+            user=self.user, service=self.service, event_date=datetime.date(2030, 6, 1),
+            event_time=datetime.time(10, 0), event_location="Studio",
+        )
+        booking = await communicator.receive_json_from()
+        self.assertEqual(booking["type"], "booking")
+        self.assertEqual(booking["booking"]["status"], "pending")
+        availability = await communicator.receive_json_from()
+        self.assertEqual(availability, {
+            "type": "availability", "service": self.service.pk, "event_date": "2030-06-01", "available": False,
+        })
+        await communicator.disconnect()
+
+    def test_booking_writes_skip_serializing_without_listeners(self):
+        with mock.patch("OWM.signals.BookingSerializer") as serializer:
+            booking = Booking.objects.create(
+                user=self.user, service=self.service, event_date=datetime.date(2030, 6, 1),
+                event_time=datetime.time(10, 0), event_location="Studio",
+            )
+            booking.delete()
+        serializer.assert_not_called()
+
+    async def test_pushes_cart_deltas(self):
+        communicator = self.connect(str(AccessToken.for_user(self.user)))
+        await communicator.connect()
+
+        item = await sync_to_async(Cart.objects.create)(
+            user=self.user, service=self.service, event_date=datetime.date(2030, 6, 1),
+            event_time=datetime.time(10, 0), event_location="Studio",
+        )
+        saved = await communicator.receive_json_from()
+        self.assertEqual((saved["action"], saved["cart_item"]["id"]), ("saved", item.pk))
+        item_id = item.pk
+        await sync_to_async(item.delete)()
+        self.assertEqual(await communicator.receive_json_from(), {"type": "cart", "action": "deleted", "cart_item": {"id": item_id}})
+        await communicator.disconnect()
+
+    def test_cart_writes_skip_serializing_without_listeners(self):
+        with mock.patch("OWM.signals.CartSerializer") as serializer:
+            Cart.objects.create(
+                user=self.user, service=self.service, event_date=datetime.date(2030, 6, 1),
+                event_time=datetime.time(10, 0), event_location="Studio",
+            )
+        serializer.assert_not_called()
+
+    async def test_pushes_deleted_booking_by_id(self):
+        booking = await Booking.objects.acreate(
+            user=self.user, service=self.service, event_date=datetime.date(2030, 6, 1),
+            event_time=datetime.time(10, 0), event_location="Studio",
+        )
+        booking_id = booking.pk
+        communicator = self.connect(str(AccessToken.for_user(self.user)))
+        await communicator.connect()
+
+        await self.service.adelete()  # Cascades to the booking
+        self.assertEqual(await communicator.receive_json_from(), {"type": "booking", "action": "deleted", "booking": {"id": booking_id}})
+        await communicator.disconnect()
+
+
+class ServiceAvailabilityTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="otieno", password="pass12345", address="Kisumu")
+        self.service = Service.objects.create(name="Drone", category="video", description="Aerial", price="300.00")
+        self.url = reverse("service-availability", args=[self.service.pk])
+
+    def book(self, event_date):
+        return Booking.objects.create(
+            user=self.user, service=self.service, event_date=event_date,
+            event_time=datetime.time(10, 0), event_location="Studio",
+        )
+
+    def bitmap(self, month):
+        return ServiceOccupancy.objects.get(service=self.service, month=month).booked_days
+
+    def test_signals_keep_bitmap_in_step(self):
+        booking = self.book(datetime.date(2030, 3, 5))
+        self.book(datetime.date(2030, 3, 31))
+        self.assertEqual(self.bitmap(datetime.date(2030, 3, 1)), (1 << 4) | (1 << 30))
+
+        booking.event_date = datetime.date(2030, 4, 2)
+        booking.save()
+        self.assertEqual(self.bitmap(datetime.date(2030, 3, 1)), 1 << 30)
+        self.assertEqual(self.bitmap(datetime.date(2030, 4, 1)), 1 << 1)
+
+        booking.status = "completed"
+        booking.save()
+        Booking.objects.get(pk=booking.pk).delete()
+        self.assertEqual(self.bitmap(datetime.date(2030, 4, 1)), 0)
+
+    def test_availability_is_one_query(self):
+        for day in (datetime.date(2030, 1, 10), datetime.date(2030, 2, 1), datetime.date(2031, 1, 1)):
+            self.book(day)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {"from": "2030-01-08", "to": "2030-12-31"})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["booked"], ["2030-01-10", "2030-02-01"])
+        self.assertEqual(len(data["free"]), 358 - 2)
+        self.assertEqual(data["free"][:3], ["2030-01-08", "2030-01-09", "2030-01-11"])
+
+        self.assertEqual(self.client.get(self.url, {"from": "2030-13-01"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"from": "2030-01-01", "to": "2031-06-01"}).status_code, 400)
+        missing = reverse("service-availability", args=[self.service.pk + 1])
+        self.assertEqual(self.client.get(missing).status_code, 404)
+
+    def test_rebuild_matches_incremental_index(self):
+        for day in (5, 6, 20):
+            self.book(datetime.date(2030, 5, day))
+        Booking.objects.filter(event_date__day=6).delete()  # Queryset deletes still fire post_delete
+        incremental = set(ServiceOccupancy.objects.values_list("service", "month", "booked_days"))
+
+        ServiceOccupancy.objects.update(booked_days=0)
+        call_command("rebuild_occupancy", stdout=io.StringIO())
+        self.assertEqual(set(ServiceOccupancy.objects.values_list("service", "month", "booked_days")), incremental)
+
+    def test_rebuild_locks_index_before_reading_bookings(self):
+        for event_date in (datetime.date(2030, 5, 5), datetime.date(2030, 6, 1)):
+            self.book(event_date)
+        Booking.objects.filter(event_date__month=6).update(event_date=datetime.date(2030, 7, 3))  # Skips the signals
+        ServiceOccupancy.objects.filter(month=datetime.date(2030, 5, 1)).update(booked_days=7)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(rebuild_occupancy(), 2)
+        tables = [
+            table for query in ctx.captured_queries if query["sql"].startswith("SELECT")
+            for table in ("OWM_serviceoccupancy", "OWM_booking") if f'FROM "{table}"' in query["sql"]
+        ]
+        self.assertEqual(tables[:2], ["OWM_serviceoccupancy", "OWM_booking"])
+        self.assertEqual(self.bitmap(datetime.date(2030, 5, 1)), 1 << 4)
+        self.assertEqual(self.bitmap(datetime.date(2030, 6, 1)), 0)
+        self.assertEqual(self.bitmap(datetime.date(2030, 7, 1)), 1 << 2)
+
+
+class CartCheckoutTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="wanjiru", password="pass12345", address="Nakuru")
+        self.other = CustomUser.objects.create_user(username="kip", password="pass12345", address="Eldoret")
+        self.service = Service.objects.create(name="Wedding", category="video", description="Full day", price="900.00")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("cart-checkout")
+
+    def add_to_cart(self, *days):
+        Cart.objects.bulk_create(
+            Cart(
+                user=self.user, service=self.service, event_date=datetime.date(2030, 8, 1) + datetime.timedelta(days=day),
+                event_time=datetime.time(9, 0), event_location="Naivasha",
+            )
+            for day in days
+        )
+
+    def checkout_queries(self, items):
+        self.add_to_cart(*range(items))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 0)
+        Booking.objects.all().delete()
+        return len(ctx)
+
+    def test_books_whole_cart_and_reports_conflicts(self):
+        Booking.objects.create(
+            user=self.other, service=self.service, event_date=datetime.date(2030, 8, 2),
+            event_time=datetime.time(9, 0), event_location="Nairobi",
+        )
+        self.add_to_cart(0, 1, 2, 2)
+
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 201)
+        statuses = [(result["event_date"], result["status"]) for result in response.data["results"]]
+        self.assertEqual(statuses, [
+            (datetime.date(2030, 8, 1), "booked"),
+            (datetime.date(2030, 8, 2), "conflict"),
+            (datetime.date(2030, 8, 3), "booked"),
+            (datetime.date(2030, 8, 3), "conflict"),
+        ])
+        self.assertEqual(response.data["results"][0]["booking"]["event_location"], "Naivasha")
+        self.assertEqual(Booking.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 2)  # Conflicting items stay in the cart
+        occupancy = ServiceOccupancy.objects.get(service=self.service, month=datetime.date(2030, 8, 1))
+        self.assertEqual(occupancy.booked_days, 0b111)
+
+        self.assertEqual(self.client.post(self.url).status_code, 409)
+        Cart.objects.all().delete()
+        self.assertEqual(self.client.post(self.url).status_code, 400)
+
+    def test_constant_queries(self):
+        self.assertEqual(self.checkout_queries(40), self.checkout_queries(1))
+
+
+@override_settings(PERF_INSTRUMENTATION=True)
+class PerfInstrumentationTests(TestCase):
+    def setUp(self):
+        reset_perf_config()
+        self.addCleanup(reset_perf_config)
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir, ignore_errors=True)
+        Service.objects.create(name="Portraits", category="photo", description="Studio shoot", price="150.00")
+
+    def test_removed_when_disabled(self):
+        with override_settings(PERF_INSTRUMENTATION=False), self.assertRaises(MiddlewareNotUsed):
+            PerfInstrumentationMiddleware(lambda request: HttpResponse())
+
+    def test_server_timing_and_structured_log(self):
+        with self.assertLogs("OWM.perf", "INFO") as logs:
+            response = self.client.get(reverse("booking-list"))
+        self.assertIn("app;dur=", response["Server-Timing"])
+        record = logs.records[0].perf
+        self.assertEqual(record["view"], "booking-list")
+        self.assertEqual(record["status"], 401)
+        self.assertEqual(record["response_bytes"], len(response.content))
+        self.assertEqual(json.loads(logs.records[0].getMessage()), record)
+
+    def test_runtime_toggle_and_sampled_profiles(self):
+        set_perf_config(enabled=False)
+        self.assertNotIn("Server-Timing", self.client.get(reverse("booking-list")))
+
+        set_perf_config(enabled=True, profile_sample_rate=1.0)
+        with override_settings(PERF_PROFILE_DIR=self.profile_dir), self.assertLogs("OWM.perf", "INFO") as logs:
+            self.client.get(reverse("booking-list"))
+        self.assertTrue(os.path.exists(logs.records[0].perf["profile"]))
+        self.assertEqual(len(os.listdir(self.profile_dir)), 1)
+
+    def test_toggle_command_needs_a_shared_cache(self):
+        with self.assertRaisesMessage(CommandError, "do not share a cache"):
+            call_command("perf_instrumentation", "--off", stdout=io.StringIO())
+        stdout = io.StringIO()
+        call_command("perf_instrumentation", stdout=stdout)  # Reading the state changes nothing
+        self.assertIn("Instrumentation on", stdout.getvalue())
+
+    def test_query_recorder_flags_repeated_statements(self):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for service in Service.objects.all():
+                list(Booking.objects.filter(service=service))
+                list(Booking.objects.filter(service_id=service.pk + 1000))
+        self.assertEqual(recorder.count, 3)
+        self.assertEqual(list(recorder.duplicates.values()), [2])
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="amina", password="pass12345", address="Nairobi")
+        self.service = Service.objects.create(name="Portraits", category="photo", description="Studio shoot", price="150.00")
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_metrics_labelled_by_url_name(self):
+        before = self.sample("owm_http_requests_total", view="booking-list", method="GET", status="401")
+        self.client.get(reverse("booking-list"))
+        self.client.get("/no-such-page/")
+
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        body = response.content.decode()
+        self.assertIn('owm_http_request_duration_seconds_bucket{le="0.005",method="GET",view="booking-list"}', body)
+        self.assertIn('view="unresolved"', body)
+        self.assertEqual(self.sample("owm_http_requests_total", view="booking-list", method="GET", status="401"), before + 1)
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_token_required_when_configured(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 401)
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+
+    async def test_counts_queries_of_async_views(self):
+        await Review.objects.acreate(user=self.user, service=self.service, rating=5, comment="Great")
+        before = self.sample("owm_db_queries_total", view="review-list")
+        response = await self.async_client.get(reverse("review-list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.sample("owm_db_queries_total", view="review-list"), before + 1)
+
+    def test_business_counters(self):
+        bookings = self.sample("owm_bookings_created_total", source="single")
+        cart_adds = self.sample("owm_cart_adds_total")
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.create(
+                user=self.user, service=self.service, event_date=datetime.date(2030, 9, 1),
+                event_time=datetime.time(10, 0), event_location="Studio",
+            )
+            booking.save()  # Updates are not counted
+            Cart.objects.create(
+                user=self.user, service=self.service, event_date=datetime.date(2030, 9, 2),
+                event_time=datetime.time(10, 0), event_location="Studio",
+            )
+        self.assertEqual(self.sample("owm_bookings_created_total", source="single"), bookings + 1)
+        self.assertEqual(self.sample("owm_cart_adds_total"), cart_adds + 1)
+
+
+class StatelessJWTTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="amina", password="pass12345", address="Nairobi", email="amina@example.com"
+        )
+        self.service = Service.objects.create(name="Portraits", category="photo", description="Studio shoot", price="150.00")
+        self.token = OWMRefreshToken.for_user(self.user).access_token
+        self.factory = RequestFactory()
+        revocations.rebuild()  # Load the revocation list up front so it adds no query below
+
+    def get_bookings(self, **initkwargs):
+        request = self.factory.get(reverse("booking-list"), HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        with CaptureQueriesContext(connection) as ctx:
+            response = BookingView.as_view(**initkwargs)(request)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx)
+
+    def test_access_token_carries_user_claims(self):
+        response = self.client.post(reverse("login"), {"username": "amina", "password": "pass12345"})
+        token = AccessToken(response.json()["access_token"])
+        self.assertEqual((token["user_id"], token["username"], token["is_staff"]), (self.user.pk, "amina", False))
+
+    def test_stateless_auth_skips_user_lookup(self):
+        self.assertEqual(self.get_bookings(), self.get_bookings(authentication_classes=[JWTAuthentication]) - 1)
+
+    def test_token_user_loads_profile_lazily(self):
+        user = LazyTokenUser(self.token)
+        with self.assertNumQueries(0):
+            self.assertEqual((user.id, user.username, user.is_staff), (self.user.pk, "amina", False))
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, "amina@example.com")
+            self.assertEqual(user.address, "Nairobi")
+        self.assertEqual(user_instance(user), self.user)
+
+    def test_views_work_with_token_user(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        self.assertEqual(client.get(reverse("profile")).json()["email"], "amina@example.com")
+
+        booking = Booking.objects.create(
+            user=self.user, service=self.service, event_date=datetime.date(2030, 10, 1),
+            event_time=datetime.time(10, 0), event_location="Studio",
+        )
+        self.assertEqual(client.get(reverse("booking", args=[booking.pk])).status_code, 200)
+        response = client.get(reverse("userdashboard"))
+        self.assertEqual(response.json()["user"]["username"], "amina")
+        self.assertEqual(len(response.json()["bookings"]["pending"]), 1)
+
+
+@override_settings(DATABASE_REPLICAS=["replica_a", "replica_b"])
+class ReplicaRouterTests(SimpleTestCase):
+    databases = {"default"}  # No test transaction: it would pin every read to the primary
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        for alias in ("replica_a", "replica_b"):
+            mark_replica(alias, True)
+
+    def read_db(self):
+        return self.router.db_for_read(Booking)
+
+    def routed(self, method, cookies=None):
+        """Run a request through ReplicaRoutingMiddleware and return where its reads went."""
+        seen = []
+
+        def view(request):
+            seen.append(self.read_db())
+            return HttpResponse()
+
+        request = RequestFactory().generic(method, "/api/bookings/")
+        request.COOKIES.update(cookies or {})
+        response = ReplicaRoutingMiddleware(view)(request)
+        return seen[0], response
+
+    def test_safe_requests_read_from_replicas(self):
+        self.assertEqual(self.read_db(), "default")  # Outside a request
+        self.assertIn(self.routed("GET")[0], ("replica_a", "replica_b"))
+        self.assertEqual(self.router.db_for_write(Booking), "default")
+
+    def test_writes_pin_reads_to_primary(self):
+        db, response = self.routed("POST")
+        self.assertEqual(db, "default")
+        pin = response.cookies[PIN_COOKIE]
+        self.assertEqual(pin["max-age"], settings.REPLICA_PIN_SECONDS)
+        self.assertEqual(self.routed("GET", {PIN_COOKIE: pin.value})[0], "default")
+
+    def test_unhealthy_replicas_fall_back(self):
+        mark_replica("replica_a", False)
+        for _ in range(10):
+            self.assertEqual(self.routed("GET")[0], "replica_b")
+        mark_replica("replica_b", False)
+        self.assertEqual(self.routed("GET")[0], "default")
+
+    def test_failed_replica_reads_run_again_on_primary(self):
+        attempts = []
+
+        def handler(request):
+            # Stands in for Django's handler, which offers view exceptions to process_exception()
+            attempts.append(self.read_db())
+            if attempts[-1] != "default":
+                return middleware.process_exception(request, OperationalError("server closed the connection"))
+            return HttpResponse(attempts[-1])
+
+        middleware = ReplicaRoutingMiddleware(handler)
+        failed = {alias: mock.Mock(errors_occurred=True) for alias in ("replica_a", "replica_b")}
+        with mock.patch("OWM.db_router.connections", {"default": connection, **failed}):
+            response = middleware(RequestFactory().get("/api/bookings/"))
+        self.assertEqual(response.content, b"default")
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(healthy_replicas(), ["replica_b" if attempts[0] == "replica_a" else "replica_a"])
+
+    def test_transactions_read_from_primary(self):
+        def view(request):
+            with transaction.atomic():
+                return HttpResponse(self.read_db())
+
+        response = ReplicaRoutingMiddleware(view)(RequestFactory().get("/"))
+        self.assertEqual(response.content, b"default")
+
+
+@skipUnless(settings.DATABASE_REPLICAS, "needs DB_REPLICA_HOSTS, e.g. a second SQLite file")
+class ReplicaDatabaseTests(TransactionTestCase):
+    databases = {"default", *settings.DATABASE_REPLICAS}
+
+    def setUp(self):
+        self.replica = settings.DATABASE_REPLICAS[0]
+        self.user = CustomUser.objects.create_user(username="amina", password="pass12345", address="Nairobi")
+        self.service = Service.objects.create(name="Portraits", category="photo", description="Studio shoot", price="150.00")
+        self.client.cookies.clear()
+        token = OWMRefreshToken.for_user(self.user).access_token
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+    def queries_on(self, alias, method, url, **kwargs):
+        with CaptureQueriesContext(connections[alias]) as ctx:
+            response = getattr(self.client, method)(url, **kwargs, **self.auth)
+        self.assertLess(response.status_code, 400)
+        return len(ctx)
+
+    def test_reads_your_writes(self):
+        self.assertGreater(self.queries_on(self.replica, "get", reverse("booking-list")), 0)
+        self.assertEqual(self.queries_on("default", "get", reverse("booking-list")), 0)
+
+        self.queries_on("default", "post", reverse("booking-list"), data={
+            "service_id": self.service.pk, "event_date": "2030-11-01", "event_time": "10:00", "event_location": "Studio",
+        })
+        self.assertEqual(self.queries_on(self.replica, "get", reverse("booking-list")), 0)
+
+    def test_failed_replica_reads_from_primary(self):
+        replica = connections[self.replica]
+        replica.close()
+        mark_replica(self.replica, True)  # Checked just now, so the middleware does not ping it
+        self.addCleanup(mark_replica, self.replica, True)
+        unreachable = replica.Database.OperationalError("could not connect to the replica")
+        with mock.patch.object(replica, "get_new_connection", side_effect=unreachable):
+            self.assertGreater(self.queries_on("default", "get", reverse("booking-list")), 0)
+        self.assertEqual(healthy_replicas(), [])
+
+    async def test_failed_replica_reads_from_primary_under_asgi(self):
+        mark_replica(self.replica, True)
+        self.addCleanup(mark_replica, self.replica, True)
+        # The middleware and views run natively, the queries on Django's one thread for sync code
+        replica = await sync_to_async(lambda: connections[self.replica])()
+        await sync_to_async(replica.close)()
+        unreachable = replica.Database.OperationalError("could not connect to the replica")
+        with mock.patch.object(replica, "get_new_connection", side_effect=unreachable):
+            response = await self.async_client.get(reverse("team"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(healthy_replicas(), [])
+
+
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="amina", password="pass12345", address="Nairobi")
+        login_backoff.clear()
+        self.addCleanup(login_backoff.clear)
+
+    def login(self, password, username="amina"):
+        return self.client.post(reverse("login"), {"username": username, "password": password})
+
+    def test_register_stores_hashed_password(self):
+        response = self.client.post(reverse("register"), {
+            "username": "baraka", "password": "s3cret-pass", "email": "baraka@example.com",
+            "first_name": "Baraka", "last_name": "Otieno", "address": "Mombasa",
+        })
+        self.assertEqual(response.status_code, 201)
+        user = CustomUser.objects.get(username="baraka")
+        self.assertNotEqual(user.password, "s3cret-pass")
+        self.assertTrue(user.check_password("s3cret-pass"))
+        self.assertEqual(self.login("s3cret-pass", "baraka").status_code, 200)
+
+    def test_register_requires_password(self):
+        response = self.client.post(reverse("register"), {
+            "username": "baraka", "first_name": "Baraka", "last_name": "Otieno", "address": "Mombasa",
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CustomUser.objects.filter(username="baraka").exists())
+
+    def test_login(self):
+        self.assertEqual(self.login("pass12345").status_code, 200)
+        self.assertEqual(self.login("wrong").status_code, 401)
+        self.assertEqual(self.login("pass12345", "nobody").status_code, 401)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.login("pass12345").status_code, 401)
+
+    def test_backoff_rejects_before_hashing(self):
+        with mock.patch.object(login_backoff, "free_attempts", 2):
+            for _ in range(3):
+                self.assertEqual(self.login("wrong").status_code, 401)
+            with mock.patch("OWM.views.verify_password") as verify:
+                response = self.login("pass12345")
+            verify.assert_not_called()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "1")
+
+    def test_backoff_doubles_and_resets(self):
+        backoff = LoginBackoff(free_attempts=1, ip_free_attempts=100, max_seconds=3)
+        backoff.failure("amina", "10.0.0.1")
+        self.assertEqual(backoff.retry_after("amina", "10.0.0.2"), 0)
+        waits = []
+        for _ in range(4):
+            backoff.failure("Amina", "10.0.0.1")
+            waits.append(round(backoff.retry_after("amina", "10.0.0.2")))
+        self.assertEqual(waits, [1, 2, 3, 3])
+        self.assertEqual(backoff.retry_after("someone", "10.0.0.1"), 0)  # The IP is still under its allowance
+        backoff.success("amina", "10.0.0.1")
+        self.assertEqual(backoff.retry_after("amina", "10.0.0.1"), 0)
+
+    def test_client_ip_is_taken_from_the_trusted_proxies(self):
+        request = RequestFactory().post(reverse("login"), HTTP_X_FORWARDED_FOR="6.6.6.6, 203.0.113.7, 10.0.0.2")
+        self.assertIsNone(client_ip(request))  # No trusted proxy: the address is not used at all
+        with override_settings(LOGIN_TRUSTED_PROXY_HOPS=1):
+            self.assertEqual(client_ip(request), "10.0.0.2")
+        with override_settings(LOGIN_TRUSTED_PROXY_HOPS=2):
+            self.assertEqual(client_ip(request), "203.0.113.7")  # Not the forged leftmost entry
+        with override_settings(LOGIN_TRUSTED_PROXY_HOPS=4):
+            self.assertIsNone(client_ip(request))
+
+    def test_backoff_without_client_ip_tracks_usernames_only(self):
+        backoff = LoginBackoff(free_attempts=1, ip_free_attempts=1, max_seconds=3)
+        for _ in range(3):
+            backoff.failure("amina", None)
+        self.assertGreater(backoff.retry_after("amina", None), 0)
+        self.assertEqual(backoff.retry_after("baraka", None), 0)
+
+    def test_full_queue_answers_429(self):
+        held = 0
+        while passwords._slots.acquire(blocking=False):
+            held += 1
+        try:
+            login = self.login("pass12345")
+            register = self.client.post(reverse("register"), {
+                "username": "baraka", "password": "s3cret-pass", "first_name": "Baraka", "last_name": "Otieno",
+                "address": "Mombasa",
+            })
+        finally:
+            for _ in range(held):
+                passwords._slots.release()
+        self.assertEqual((login.status_code, register.status_code), (429, 429))
+        self.assertEqual(login["Retry-After"], "1")
+        self.assertFalse(CustomUser.objects.filter(username="baraka").exists())
+        self.assertEqual(self.login("pass12345").status_code, 200)  # A busy pool is not counted as a failure
+
+
+class FastJSONTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        cache.clear()
+
+        buffer = io.BytesIO()
+        PILImage.new("RGB", (400, 300), "teal").save(buffer, "JPEG")
+        self.user = CustomUser.objects.create_user(username="amina", password="pass12345", address="Nairobi")
+        self.service = Service.objects.create(
+            name="Portraits \u2028 \"studio\"", category="photo", description="Studio shoot\nTwo hours", price="150.50",
+            image=SimpleUploadedFile("portrait.jpg", buffer.getvalue(), content_type="image/jpeg"),
+        )
+        generate_derivatives(self.service.image.name)
+        other = Service.objects.create(name="Podcast", category="audio", description="Mixing — ✓", price="99.99")
+        for rating in (5, 4, 4):
+            Review.objects.create(user=self.user, service=self.service, rating=rating, comment="Great 🎉")
+        TeamMember.objects.create(
+            name="Wanjiru", role="editor", bio="Cuts",
+            profile_pic=SimpleUploadedFile("wanjiru.jpg", buffer.getvalue(), content_type="image/jpeg"),
+        )
+        for day, service in ((1, self.service), (2, other)):
+            Booking.objects.create(
+                user=self.user, service=service, event_date=datetime.date(2030, 10, day),
+                event_time=datetime.time(10, 30), event_location="Studio",
+            )
+        self.token = OWMRefreshToken.for_user(self.user).access_token
+
+    def test_renderer_matches_json_renderer(self):
+        data = {
+            "text": "line\u2028sep\u2029 \"q\" \\ / \x00\x1f é 😀",
+            "when": timezone.now(), "naive": datetime.datetime(2030, 1, 2, 3, 4, 5, 600),
+            "day": datetime.date(2030, 1, 2), "at": datetime.time(10, 30), "price": __import__("decimal").Decimal("1.50"),
+            "numbers": [0, -1, 2 ** 63 - 1, 2 ** 70, 4.33, 0.1, True, None], 1: "int key", "empty": {},
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(ORJSONRenderer().render(None), JSONRenderer().render(None))
+        self.assertEqual(
+            ORJSONRenderer().render(data, "application/json; indent=2"), JSONRenderer().render(data, "application/json; indent=2")
+        )
+
+    def test_flat_serializers_match_model_serializers(self):
+        request = RequestFactory().get("/")
+        querysets = {
+            ServiceSerializer: Service.objects.order_by("id"),
+            TeamMemberSerializer: TeamMember.objects.order_by("id"),
+            ReviewSerializer: Review.objects.select_related("user").order_by("-created_at", "-id"),
+            BookingSerializer: Booking.objects.for_serializer().order_by("-event_date", "-id"),
+        }
+        self.assertEqual(set(querysets), set(FLAT_SERIALIZERS))
+        for serializer_class, queryset in querysets.items():
+            for context in ({}, {"request": request}, {"fields": "id,rating,user,service,image,profile_pic"}):
+                with self.subTest(serializer=serializer_class.__name__, context=context):
+                    expected = serializer_class(queryset, many=True, context=context).data
+                    rows, serialize = list_projection(serializer_class, queryset, context)
+                    with self.assertNumQueries(1):
+                        actual = serialize(rows)
+                    self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+    def test_list_endpoints_unchanged(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        urls = [
+            reverse("service-list"), reverse("service-list") + "?category=photo&fields=id,rating,image_variants",
+            reverse("service-list") + "?page_size=1", reverse("team"), reverse("review-list") + "?page_size=2",
+            reverse("booking-list"), reverse("booking-list") + "?fields=id,service&page_size=1", reverse("userdashboard"),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                bodies = []
+                for fast in (False, True):
+                    cache.clear()
+                    with override_settings(FLAT_SERIALIZERS=fast, FAST_JSON_RENDERER=fast):
+                        response = client.get(url)
+                    self.assertEqual(response.status_code, 200)
+                    bodies.append(response.content)
+                self.assertEqual(bodies[1], bodies[0])
+
+
+def jti(refresh_token):
+    return RefreshToken(refresh_token, verify=False)["jti"]
+
+
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="amina", password="pass12345", address="Nairobi")
+        revocations.reset()  # Blacklist rows from earlier tests were rolled back
+
+    def login(self):
+        client = APIClient()
+        response = client.post(reverse("login"), {"username": "amina", "password": "pass12345"})
+        self.access_token = response.json()["access_token"]
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+        return client, response.cookies["refresh_token"].value
+
+    def refresh(self, refresh_token):
+        client = APIClient()
+        client.cookies["refresh_token"] = refresh_token
+        with self.captureOnCommitCallbacks(execute=True):
+            return client.post(reverse("token_refresh"))
+
+    def test_refresh_rotates_token(self):
+        client, refresh_token = self.login()
+        response = self.refresh(refresh_token)
+        self.assertEqual(response.status_code, 200)
+        rotated = response.cookies["refresh_token"].value
+        self.assertNotEqual(rotated, refresh_token)
+        self.assertEqual(AccessToken(response.json()["access_token"])["rjti"], jti(rotated))
+        self.assertTrue(BlacklistedToken.objects.filter(token__jti=jti(refresh_token)).exists())
+
+        self.assertEqual(self.refresh(refresh_token).status_code, 401)  # Replaying the old token fails
+        self.assertEqual(client.get(reverse("profile")).status_code, 401)  # So does its access token
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.json()['access_token']}")
+        self.assertEqual(client.get(reverse("profile")).status_code, 200)
+        self.assertEqual(self.refresh(rotated).status_code, 200)
+
+    def test_replay_missed_by_the_memory_check_is_refused(self):
+        _, refresh_token = self.login()
+        OWMRefreshToken(refresh_token).rotate()  # Rotated by another process: not revoked in memory yet
+        self.assertFalse(revocations.is_revoked(jti(refresh_token)))
+
+        response = self.refresh(refresh_token)
+        self.assertEqual(response.status_code, 401)
+        self.assertNotIn("refresh_token", response.cookies)
+        self.assertEqual(OutstandingToken.objects.filter(user=self.user).count(), 2)  # No token minted for the replay
+
+    def test_logout_revokes_session(self):
+        client, refresh_token = self.login()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(client.post(reverse("logout")).status_code, 200)
+        self.assertEqual(client.get(reverse("profile")).status_code, 401)
+        self.assertEqual(self.refresh(refresh_token).status_code, 401)
+
+    def test_logout_with_an_expired_access_token(self):
+        client, refresh_token = self.login()
+        with mock.patch("jwt.api_jwt.datetime") as clock:
+            # Verified as if an hour had passed, long after the access token expired
+            clock.now.return_value = timezone.now() + datetime.timedelta(hours=1)
+            clock.side_effect = datetime.datetime
+            self.assertEqual(client.get(reverse("profile")).status_code, 401)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(client.post(reverse("logout")).status_code, 200)
+        self.assertEqual(self.refresh(refresh_token).status_code, 401)
+
+    def test_logout_ignores_forged_access_tokens(self):
+        _, refresh_token = self.login()
+        forged = jwt.encode(AccessToken(self.access_token, verify=False).payload, "x" * 32, "HS256")
+        client = APIClient()  # Without the refresh cookie
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {forged}")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(client.post(reverse("logout")).status_code, 200)
+        self.assertEqual(self.refresh(refresh_token).status_code, 200)
+
+    def test_check_is_served_from_memory(self):
+        _, refresh_token = self.login()
+        request = RequestFactory().get(reverse("profile"), HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+        self.assertFalse(revocations.is_revoked(jti(refresh_token)))
+        with self.assertNumQueries(0):
+            self.assertFalse(revocations.is_revoked(jti(refresh_token)))
+            self.assertEqual(StatelessJWTAuthentication().authenticate(request)[0].id, self.user.pk)
+
+    def test_expired_rows_are_not_rechecked_as_gaps(self):
+        expired = OutstandingToken.objects.create(
+            user=self.user, jti="expired-jti", token="expired", expires_at=timezone.now() - datetime.timedelta(days=1),
+        )
+        BlacklistedToken.objects.create(token=expired)
+        _, refresh_token = self.login()
+        OWMRefreshToken(refresh_token).blacklist()
+
+        revocations.rebuild()
+        self.assertEqual(revocations._gaps, {})
+        with self.assertNumQueries(1):
+            revocations.sync()
+        self.assertNotIn("expired-jti", revocations._bloom)
+        self.assertTrue(revocations.is_revoked(jti(refresh_token)))
+
+    def test_sync_sees_other_processes(self):
+        _, refresh_token = self.login()
+        self.assertFalse(revocations.is_revoked(jti(refresh_token)))
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=jti(refresh_token)))  # As another process would
+        revocations.sync()
+        self.assertTrue(revocations.is_revoked(jti(refresh_token)))
+
+    def test_rebuild_drops_expired_tokens(self):
+        _, refresh_token = self.login()
+        RefreshToken(refresh_token).blacklist()
+        OutstandingToken.objects.filter(jti=jti(refresh_token)).update(expires_at=timezone.now() - datetime.timedelta(days=1))
+        revocations.rebuild()
+        self.assertNotIn(jti(refresh_token), revocations._bloom)
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(1000, error_rate=0.01)
+        keys = [f"jti-{n}" for n in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(f"other-{n}" in bloom for n in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username="wanjiru", password="pass12345", address="Nairobi")
+        self.drone = Service.objects.create(name="Drone Filming", category="video", price="300.00",
+                                            description="Aerial footage of weddings and events.")
+        self.podcast = Service.objects.create(name="Podcast Recording", category="audio", price="80.00",
+                                              description="Studio sessions with a sound engineer.")
+        self.review = Review.objects.create(user=self.user, service=self.podcast, rating=5,
+                                            comment="The studio engineer made our podcast sound amazing.")
+        TeamMember.objects.create(name="Achieng Otieno", role="photographer", bio="Shoots weddings across Kenya.")
+
+    def search(self, **params):
+        response = self.client.get(reverse("search"), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def hits(self, **params):
+        return [(hit["type"], hit["id"]) for hit in self.search(**params)["results"]]
+
+    def test_ranks_matches_across_models(self):
+        self.assertEqual(self.hits(q="drone"), [("service", self.drone.pk)])
+        # The name outweighs the description, and a review only mentions it
+        self.assertEqual(self.hits(q="podcast "), [("service", self.podcast.pk), ("review", self.review.pk)])
+        self.assertEqual(set(self.hits(q="weddings ")), {("service", self.drone.pk), ("team", TeamMember.objects.get().pk)})
+        # Every word must match; the last one also as a prefix, case and accents folded
+        self.assertEqual(self.hits(q="Studio ENGINÉ"), [("review", self.review.pk), ("service", self.podcast.pk)])
+        self.assertEqual(self.hits(q="studio drone"), [])
+
+        result = self.search(q="aerial")["results"][0]
+        self.assertEqual(result["title"], "Drone Filming")
+        self.assertEqual(result["category"], "video")
+
+    def test_filters_and_pagination(self):
+        self.assertEqual(self.hits(q="podcast", type="review"), [("review", self.review.pk)])
+        self.assertEqual(self.hits(q="weddings", category="video"), [("service", self.drone.pk)])
+
+        page = self.search(q="podcast", page_size=1)
+        self.assertEqual(page["count"], 2)
+        self.assertEqual(len(page["results"]), 1)
+        self.assertIsNotNone(page["next"])
+        self.assertEqual(self.client.get(page["next"]).json()["results"][0]["type"], "review")
+
+        self.assertEqual(self.client.get(reverse("search")).status_code, 400)
+        self.assertEqual(self.client.get(reverse("search"), {"q": "x", "category": "drums"}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("search"), {"q": "x", "type": "booking"}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("search"), {"q": "podcast", "page": 9}).status_code, 404)
+
+    def test_suggestions(self):
+        response = self.client.get(reverse("search-suggest"), {"q": "the stu"})
+        self.assertEqual(response.json(), {"suggestions": ["studio"]})
+
+    def test_signals_keep_index_in_step(self):
+        self.review.comment = "Quiet booth, clear vocals."
+        self.review.save()
+        self.assertEqual(self.hits(q="engineer "), [("service", self.podcast.pk)])
+        self.assertEqual(self.hits(q="vocals"), [("review", self.review.pk)])
+
+        self.podcast.category = "video"
+        self.podcast.save()
+        self.assertEqual(self.hits(q="vocals", category="video"), [("review", self.review.pk)])
+
+        self.podcast.delete()  # Its review goes with it
+        self.assertEqual(self.hits(q="vocals"), [])
+        self.assertFalse(SearchDocument.objects.filter(kind="review").exists())
+
+        counts = dict(SearchTerm.objects.values_list("term", "document_count"))
+        self.assertEqual(rebuild_search_index(), 2)
+        rebuilt = dict(SearchTerm.objects.values_list("term", "document_count"))
+        self.assertEqual({term: count for term, count in counts.items() if count}, rebuilt)
+
+    def index_state(self):
+        return (
+            set(SearchDocument.objects.values_list("kind", "object_id", "title", "snippet", "category")),
+            set(SearchPosting.objects.values_list("term__term", "document__kind", "document__object_id", "category", "impact")),
+            dict(SearchTerm.objects.values_list("term", "document_count")),
+        )
+
+    def test_migration_indexes_existing_rows(self):
+        before = self.index_state()
+        SearchPosting.objects.all().delete()
+        SearchDocument.objects.all().delete()
+        SearchTerm.objects.all().delete()
+
+        migration = importlib.import_module("OWM.migrations.0008_search_index")
+        migration.build_search_index(django_apps, None)
+        self.assertEqual(self.index_state(), before)
+        self.assertEqual(self.hits(q="drone"), [("service", self.drone.pk)])
+
+    def test_query_count_is_bounded(self):
+        for i in range(30):
+            Review.objects.create(user=self.user, service=self.drone, rating=4, comment=f"Great aerial shots, take {i}.")
+        self.search(q="great")  # Caches the document total
+        # Words, prefix expansions, the rarest word's postings with the others probed, the page
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("search"), {"q": "great aerial tak"})
+        self.assertEqual(response.json()["count"], 30)
+
+class AdminChangelistTests(TestCase):
+    """Big-table changelists page by keyset with a fixed number of queries and no COUNT(*)."""
+
+    def setUp(self):
+        admin_user = CustomUser.objects.create_superuser(username="admin", password="pass12345", email="admin@example.com")
+        self.amina = CustomUser.objects.create_user(username="amina", password="pass12345", address="Nairobi")
+        self.baraka = CustomUser.objects.create_user(username="baraka", password="pass12345", address="Mombasa")
+        service = Service.objects.create(name="Portraits", category="photo", description="Studio shoot", price="150.00")
+        Booking.objects.bulk_create(
+            Booking(
+                user=self.amina if day % 2 else self.baraka, service=service, event_date=datetime.date(2030, 1, day),
+                event_time=datetime.time(10, 0), event_location="Studio",
+            )
+            for day in range(1, 6)
+        )
+        self.client.force_login(admin_user)
+        self.url = reverse("admin:OWM_booking_changelist")
+        # The planner statistics of a table holding 1M bookings
+        for patcher in (
+            mock.patch("OWM.changelist.estimated_row_count", return_value=1_000_000),
+            mock.patch.object(admin.site.get_model_admin(Booking), "list_per_page", 2),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def get_page(self, query=""):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url + query)
+        self.assertEqual(response.status_code, 200)
+        return response, ctx.captured_queries
+
+    def days(self, response):
+        return [booking.event_date.day for booking in response.context["cl"].result_list]
+
+    def test_pages_have_constant_query_count(self):
+        # Session, user, date hierarchy range and years, and the page itself
+        response, queries = self.get_page()
+        self.assertEqual(len(queries), 5)
+        self.assertFalse([query for query in queries if "COUNT(" in query["sql"].upper()])
+        self.assertContains(response, "~1000000 Bookings")
+        self.assertEqual(self.days(response), [5, 4])
+
+        response, queries = self.get_page(response.context["cl"].next_page_url)
+        self.assertEqual(len(queries), 5)
+        self.assertEqual(self.days(response), [3, 2])
+
+        response, _ = self.get_page(response.context["cl"].next_page_url)
+        self.assertEqual(self.days(response), [1])
+        self.assertIsNone(response.context["cl"].next_page_url)
+
+        response, _ = self.get_page(response.context["cl"].previous_page_url)
+        self.assertEqual(self.days(response), [3, 2])
+
+    def test_autocomplete_filter(self):
+        response, queries = self.get_page(f"?user__id__exact={self.amina.pk}")
+        # Filtered lists are counted exactly; the filter loads only the chosen user
+        self.assertEqual(len(queries), 7)
+        self.assertEqual(self.days(response), [5, 3])
+        self.assertContains(response, "3 Bookings")
+        self.assertContains(response, f'<option value="{self.amina.pk}" selected>amina</option>', html=True)
+        self.assertNotContains(response, "baraka")
+
+    def test_malformed_cursor(self):
+        response = self.client.get(self.url, {"cursor": "bm90LWEtY3Vyc29y"})
+        self.assertRedirects(response, self.url + "?e=1", fetch_redirect_response=False)
+
+    def test_review_and_cart_changelists(self):
+        service = Service.objects.get()
+        Review.objects.create(user=self.amina, service=service, rating=5, comment="Lovely.")
+        Review.objects.create(user=self.baraka, service=service, rating=2, comment="Late.")
+        response = self.client.get(reverse("admin:OWM_review_changelist"), {"rating__exact": "5"})
+        self.assertEqual([review.comment for review in response.context["cl"].result_list], ["Lovely."])
+
+        response = self.client.get(reverse("admin:OWM_cart_changelist"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "admin-autocomplete")
+
+
+# The connection benchmark serves requests from worker threads, where the test may only use "default"
+@override_settings(DATABASE_REPLICAS=[])
+class BenchmarkHarnessTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root, CATALOG_CACHE_ENABLED=True))
+        cache.clear()
+        seed_benchmark_data(scale=0.0001, log=lambda line: None)
+
+    def test_seeds_and_reports_every_scenario(self):
+        self.assertEqual(Booking.objects.count(), 100)
+        self.assertEqual(Service.objects.aggregate(total=Sum("rating_count"))["total"], Review.objects.count())
+
+        # Logins are slow by design, and new connections would end the test transaction
+        skipped = ("login", "login_flood", "catalog_under_login_flood", "team_new_connection")
+        names = [name for name, scenario in SCENARIOS.items() if scenario.default and name not in skipped]
+        report = run_benchmark(names, requests=2, warmup=1, log=lambda line: None)
+        self.assertEqual(report["environment"]["rows"]["bookings"], 100)  # Counted before the scenarios run
+        for name, stats in report["scenarios"].items():
+            self.assertEqual(stats["errors"], 0, f"{name}: {stats['statuses']}")
+            self.assertEqual(stats["requests"], 2)
+            self.assertLessEqual(stats["latency_ms"]["p50"], stats["latency_ms"]["max"])
+        self.assertEqual(report["scenarios"]["catalog"]["queries"]["max"], 0)
+
+    def test_asgi_vs_wsgi_benchmark(self):
+        report = run_connection_benchmark(["team"], connections=5, requests=10, wsgi_threads=2, warmup=1, log=lambda line: None)
+        self.assertEqual(set(report["scenarios"]), {"team/wsgi", "team/asgi"})
+        for name, stats in report["scenarios"].items():
+            self.assertEqual((stats["requests"], stats["errors"]), (10, 0), name)
+            self.assertGreaterEqual(stats["peak_threads"], 1)
+            self.assertIn("connections_opened", stats)
+
+    def test_serializer_benchmark(self):
+        report = run_serializer_benchmark(rows=30, repeat=1, log=lambda line: None)
+        self.assertEqual(set(report["serializers"]), {"services", "team", "reviews", "bookings"})
+        for name, stats in report["serializers"].items():
+            self.assertTrue(stats["identical"], name)
+            self.assertEqual(stats["rows"], 30)
+            self.assertGreater(stats["model_serializer"]["peak_kib"], 0)
+
+    def test_percentile(self):
+        self.assertEqual(percentile(list(range(1, 101)), 95), 95)
+        self.assertEqual(percentile([4.0], 99), 4.0)
+        self.assertIsNone(percentile([], 50))
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    """The DATABASES each entry point builds from the environment, read in a fresh interpreter."""
+
+    def default_database(self, entry_point, **env):
+        script = (
+            f"import json, {entry_point}; from django.conf import settings; "
+            "print(json.dumps(settings.DATABASES['default'], default=str))"
+        )
+        environ = {key: value for key, value in os.environ.items() if not key.startswith(("DB_", "DJANGO_"))}
+        environ.update(
+            EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend", EMAIL_HOST="localhost", EMAIL_PORT="25",
+            EMAIL_USE_TLS="False", EMAIL_HOST_USER="", EMAIL_HOST_PASSWORD="", DEFAULT_FROM_EMAIL="a@b.c",
+            DB_ENGINE="sqlite3", DJANGO_SETTINGS_MODULE="OffWorldMedia.settings",
+        )
+        environ.update(env)
+        output = subprocess.run(
+            [sys.executable, "-c", script], cwd=settings.BASE_DIR, env=environ, capture_output=True, text=True, check=True,
+        ).stdout
+        return json.loads(output)
+
+    def test_connections_persist_under_wsgi_only(self):
+        self.assertEqual(self.default_database("OffWorldMedia.wsgi")["CONN_MAX_AGE"], 600)
+        self.assertEqual(self.default_database("OffWorldMedia.asgi")["CONN_MAX_AGE"], 0)
+        self.assertEqual(self.default_database("OffWorldMedia.asgi", DB_CONN_MAX_AGE="60")["CONN_MAX_AGE"], 60)
+
+    def test_pool_owns_connection_lifetime(self):
+        database = self.default_database(
+            # The settings alone: setting up Django would load the PostgreSQL driver
+            "OffWorldMedia.settings", DB_ENGINE="postgresql", DB_POOL="True", DB_NAME="owm", DB_USER="owm",
+            DB_PASSWORD="", DB_HOST="db", DB_PORT="5432",
+        )
+        self.assertEqual(database["CONN_MAX_AGE"], 0)
+        self.assertEqual(database["OPTIONS"]["pool"], {"min_size": 2, "max_size": 10, "timeout": 10})
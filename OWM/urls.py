@@ -21,12 +21,16 @@ urlpatterns = [
     path('services/', ServiceListView.as_view(), name='service-list'),
     #path('services/<int:pk>/', ServiceDetailView.as_view(), name='service-detail'),
     path('service-details/<int:pk>/', ServiceDetailView.as_view(), name='updateservice'),
+    path('services/<int:pk>/availability/', ServiceAvailabilityView.as_view(), name='service-availability'),
 
     #handles listing all bookings
     path('bookings/', BookingView.as_view(), name='booking-list'),
     
     #handles create, update and delete booking
     path('booking/<int:pk>/', BookingView.as_view(), name='booking'),
+
+    #books every item in the cart at once
+    path('cart/checkout/', CartCheckoutView.as_view(), name='cart-checkout'),
     
     # TeamMembers Endpoints
     path('team/', TeamListView.as_view(), name='team'),
@@ -34,6 +38,10 @@ urlpatterns = [
     # Review Endpoints
     path('reviews/', ReviewListView.as_view(), name='review-list'),
 
+    # Search Endpoints
+    path('search/', SearchView.as_view(), name='search'),
+    path('search/suggest/', SearchSuggestView.as_view(), name='search-suggest'),
+
     #Contact Endpoints
     path('contactus/', ContactUsView.as_view(), name='contactus'),
 
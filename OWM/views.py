@@ -1,22 +1,59 @@
+import datetime
+import math
+
+from asgiref.sync import sync_to_async
 from rest_framework.views import APIView
+from rest_framework.request import Request
 from rest_framework import generics
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.db.models import Count
-from django.core.mail import send_mail
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.contrib.auth import authenticate
 from django.contrib.auth.hashers import make_password
 from rest_framework_simplejwt.views import TokenRefreshView
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from django.utils import timezone
 from django.utils.dateparse import parse_date
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, ValidationError
 from .models import *
 from .serializers import *
+from .authentication import OWMRefreshToken, access_token_refresh_jti, revoke_refresh_jti, user_instance
+from .catalog import cached_catalog_response
+from .checkout import BOOKED, checkout_cart
+from .metrics import render_metrics
+from .occupancy import booked_dates, month_start
+from .outbox import schedule_flush
+from .passwords import PasswordHasherBusy, client_ip, hash_password, login_backoff, verify_password
+from .pagination import BookingPagination, ReviewPagination, SearchPagination, ServicePagination, TeamPagination
+from .renderers import ORJSONRenderer
+from .search import search, search_results, suggest
+
+REFRESH_COOKIE_PATH = "/api/token/refresh/"  # Only send the refresh token to the refresh endpoint
+
+
+def set_refresh_cookie(response, refresh):
+    response.set_cookie(
+        key="refresh_token",
+        value=str(refresh),
+        httponly=True,
+        secure=False,  # 🔒 Use True in production
+        samesite="Lax",  # 🔒 Better CSRF protection
+        path=REFRESH_COOKIE_PATH,
+    )
+
+
+def busy_response(retry_after=1, message="Server is busy. Try again shortly."):
+    response = Response({"error": message}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    response["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
 
 # User Registration View
 class RegisterView(APIView):
@@ -26,8 +63,15 @@ class RegisterView(APIView):
         serializer = CustomUserSerializer(data=request.data)
         
         if serializer.is_valid():
-            user = serializer.save()
-            refresh = RefreshToken.for_user(user)
+            password = serializer.validated_data.get("password")
+            if not password:
+                return Response({"password": ["This field is required."]}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                password_hash = hash_password(password)
+            except PasswordHasherBusy:
+                return busy_response()
+            user = serializer.save(password_hash=password_hash)
+            refresh = OWMRefreshToken.for_user(user)
             access_token = str(refresh.access_token)
 
             response = Response({"message": "Registration successful"}, status=status.HTTP_201_CREATED)
@@ -57,10 +101,22 @@ class LoginView(APIView):
     def post(self, request):
         username = request.data.get("username")
         password = request.data.get("password")
-        user = authenticate(username=username, password=password)
+        ip = client_ip(request)
+
+        # Locked out usernames and IPs are refused before any hashing work is done
+        retry_after = login_backoff.retry_after(username, ip)
+        if retry_after:
+            return busy_response(retry_after, "Too many failed login attempts. Try again later.")
 
-        if user:
-            refresh = RefreshToken.for_user(user)
+        user = CustomUser.objects.filter(username=username).first() if username and password else None
+        try:
+            valid = bool(username and password) and verify_password(user, password)
+        except PasswordHasherBusy:
+            return busy_response()
+
+        if valid and user.is_active:
+            login_backoff.success(username, ip)
+            refresh = OWMRefreshToken.for_user(user)
             access_token = str(refresh.access_token)
 
             # Get profile picture URL
@@ -76,25 +132,35 @@ class LoginView(APIView):
             })
 
             # Store only refresh token in HTTP-only cookie
-            response.set_cookie(
-                key="refresh_token",
-                value=str(refresh),
-                httponly=True,
-                secure=False,  # 🔒 Use True in production
-                samesite="Lax",  # 🔒 Better CSRF protection
-                path="/api/token/refresh/"  # 🔄 Only send with refresh endpoint
-            )
+            set_refresh_cookie(response, refresh)
 
             return response
-        
+
+        login_backoff.failure(username, ip)
         return Response({"error": "Invalid credentials"}, status=401)
         
 #Logout View
 class LogoutView(APIView):
+    # An expired access token must not prevent logging out, so the token is read by hand below
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
     def post(self, request):
+        # Blacklisting the refresh token also revokes the access tokens minted from it. The refresh
+        # cookie is only sent to token/refresh/, so it is usually identified by the access token's rjti claim.
+        refresh_jti = access_token_refresh_jti(request)
+        if refresh_jti is not None:
+            revoke_refresh_jti(refresh_jti)
+        refresh_token = request.data.get("refresh") or request.COOKIES.get("refresh_token")
+        if refresh_token:
+            try:
+                OWMRefreshToken(refresh_token).blacklist()
+            except TokenError:
+                pass  # Already expired or blacklisted
+
         response = JsonResponse({"message": "Logged out successfully"})
         response.delete_cookie("access_token")
-        response.delete_cookie("refresh_token")
+        response.delete_cookie("refresh_token", path=REFRESH_COOKIE_PATH)
         return response
 
 #Custom Token Refresh View
@@ -106,25 +172,32 @@ class CustomTokenRefreshView(TokenRefreshView):
             return Response({"error": "No refresh token found"}, status=status.HTTP_401_UNAUTHORIZED)
 
         try:
-            refresh = RefreshToken(refresh_token)
-            access_token = str(refresh.access_token)
-            response = Response({"access_token": access_token})
-            return response
-        except Exception as e:
+            refresh = OWMRefreshToken(refresh_token)  # Rejects blacklisted tokens, checked in memory
+        except TokenError:
             return Response({"error": "Invalid refresh token"}, status=status.HTTP_401_UNAUTHORIZED)
 
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            try:
+                refresh.rotate()  # The old refresh token, and access tokens minted from it, stop working
+            except TokenError:
+                return Response({"error": "Invalid refresh token"}, status=status.HTTP_401_UNAUTHORIZED)
+        response = Response({"access_token": str(refresh.access_token)})
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            set_refresh_cookie(response, refresh)
+        return response
+
 #Profile View/Edit View
 class UserProfileView(APIView):
     permission_classes = [IsAuthenticated]  # Only authenticated users can access
 
     def get(self, request):
         """Retrieve the authenticated user's profile"""
-        serializer = CustomUserSerializer(request.user, context={"request": request})
+        serializer = CustomUserSerializer(user_instance(request.user), context={"request": request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def put(self, request):
         """Update the authenticated user's profile"""
-        serializer = CustomUserSerializer(request.user, data=request.data, partial=True, context={"request": request})
+        serializer = CustomUserSerializer(user_instance(request.user), data=request.data, partial=True, context={"request": request})
 
         if serializer.is_valid():
             serializer.save()
@@ -132,24 +205,111 @@ class UserProfileView(APIView):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-# Service List & Detail View
-class ServiceListView(APIView):
-    permission_classes = [AllowAny]
+# Base for the async, read-only public endpoints. They run natively under ASGI (the async
+# ORM still runs each query on Django's one database thread), need no authentication and
+# render the same JSON as DRF's JSONRenderer.
+class AsyncReadOnlyView(View):
+    renderer = ORJSONRenderer()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def setup(self, request, *args, **kwargs):
+        super().setup(request, *args, **kwargs)
+        self.drf_request = Request(request)  # query_params and absolute URIs for pagination
+
+    def render(self, data, status=status.HTTP_200_OK):
+        return HttpResponse(self.renderer.render(data), status=status, content_type="application/json")
+
+# Prometheus scrape endpoint; guarded by a bearer token when METRICS_TOKEN is set
+class MetricsView(View):
 
     def get(self, request):
-        services = Service.objects.all()
-        serializer = ServiceSerializer(services, many=True)
-        print(serializer)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        token = getattr(settings, "METRICS_TOKEN", "")
+        if token and request.headers.get("Authorization") != f"Bearer {token}":
+            return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+        body, content_type = render_metrics()
+        return HttpResponse(body, content_type=content_type)
+
+# Service List & Detail View
+class ServiceListView(AsyncReadOnlyView):
+    # Query parameters that select a distinct cached slice of the catalog
+    CACHE_PARAMS = ("category", "fields", "cursor", "page_size")
+
+    async def get(self, request):
+        """List the catalog, optionally sliced by `?category=`, served from the catalog cache."""
+        category = request.GET.get("category")
+        if category and category not in dict(Service.CATEGORY_CHOICES):
+            return self.render({"error": "Unknown service category."}, status=status.HTTP_400_BAD_REQUEST)
+
+        fields = request.GET.get("fields")
+
+        async def build():
+            services = Service.objects.order_by("id")
+            if category:
+                services = services.filter(category=category)
+            rows, serialize = list_projection(ServiceSerializer, services, {"fields": fields})
+            return await ServicePagination().apaginate(self.drf_request, rows, serialize, view=self)
+
+        params = {key: request.GET[key] for key in self.CACHE_PARAMS if key in request.GET}
+        return await cached_catalog_response(request, "services", build, params)
         
-class ServiceDetailView(APIView):
-    permission_classes = [AllowAny]  # Adjust permissions as needed
+class ServiceDetailView(AsyncReadOnlyView):
 
-    def get(self, request, pk):
+    async def get(self, request, pk):
         """Fetch service details by ID."""
-        service = get_object_or_404(Service, pk=pk)
-        serializer = ServiceSerializer(service)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        fields = request.GET.get("fields")
+
+        async def build():
+            service = await Service.objects.filter(pk=pk).afirst()
+            if service is None:
+                raise Service.DoesNotExist
+            return ServiceSerializer(service, context={"fields": fields}).data
+
+        params = {"fields": fields} if fields else None
+        try:
+            return await cached_catalog_response(request, f"service:{pk}", build, params)
+        except Service.DoesNotExist:
+            return self.render({"detail": "No Service matches the given query."}, status=status.HTTP_404_NOT_FOUND)
+
+# Service Availability Calendar
+class ServiceAvailabilityView(AsyncReadOnlyView):
+    MAX_RANGE_DAYS = 366
+
+    async def get(self, request, pk):
+        """Booked and free dates for a service between ?from= and ?to= (default: the next 12 months)."""
+        try:
+            start = parse_date(request.GET["from"]) if "from" in request.GET else timezone.localdate()
+            end = parse_date(request.GET["to"]) if "to" in request.GET else start + datetime.timedelta(days=365)
+        except ValueError:
+            start = end = None
+        if start is None or end is None:
+            return self.render({"error": "Dates must be in YYYY-MM-DD format."}, status=status.HTTP_400_BAD_REQUEST)
+        if end < start or (end - start).days >= self.MAX_RANGE_DAYS:
+            return self.render(
+                {"error": f"'to' must be on or after 'from' and at most {self.MAX_RANGE_DAYS} days later."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # One indexed range scan over (service, month): at most 13 rows for a year
+        months = ServiceOccupancy.objects.filter(
+            service_id=pk, month__gte=month_start(start), month__lte=end
+        ).values_list("month", "booked_days")
+        bitmaps = {month: bitmap async for month, bitmap in months}
+        if not bitmaps and not await Service.objects.filter(pk=pk).aexists():
+            return self.render({"detail": "No Service matches the given query."}, status=status.HTTP_404_NOT_FOUND)
+
+        booked = booked_dates(bitmaps, start, end)
+        taken = set(booked)
+        days = (start + datetime.timedelta(days=n) for n in range((end - start).days + 1))
+        return self.render({
+            "service": pk,
+            "from": start,
+            "to": end,
+            "booked": booked,
+            "free": [day for day in days if day not in taken],
+        })
 
 # Booking API
 class BookingListCreateView(generics.ListCreateAPIView):
@@ -157,8 +317,7 @@ class BookingListCreateView(generics.ListCreateAPIView):
     serializer_class = BookingSerializer
 
     def get_queryset(self):
-        booking = Booking.objects.filter(user=self.request.user)
-        return booking
+        return Booking.objects.for_user(self.request.user).for_serializer()
 
     def perform_create(self, serializer):
         service_id = self.request.data.get("service")
@@ -167,11 +326,13 @@ class BookingListCreateView(generics.ListCreateAPIView):
         if not service_id or not event_date:
             raise ValidationError({"error": "Service and date are required."})
 
-        if Booking.objects.filter(service_id=service_id, event_date=event_date).exists():
+        # The unique (service, event_date) constraint rejects double bookings atomically
+        try:
+            with transaction.atomic():
+                serializer.save(user_id=self.request.user.id)
+        except IntegrityError:
             raise ValidationError({"error": "Service already booked on this date."})
 
-        serializer.save(user=self.request.user)
-
 class BookingView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -179,21 +340,19 @@ class BookingView(APIView):
         """Fetches either a specific booking (if `pk` is provided) or all user bookings."""
         if pk:
             # Fetch a specific booking for updating
-            booking = get_object_or_404(Booking, pk=pk, user=request.user)
+            booking = get_object_or_404(Booking.objects.for_serializer(), pk=pk, user_id=request.user.id)
             serializer = BookingSerializer(booking)
             return Response(serializer.data, status=status.HTTP_200_OK)
         else:
-            # List all bookings for the logged-in user
-            bookings = Booking.objects.filter(user=request.user).order_by("-event_date")
-            serializer = BookingSerializer(bookings, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            # List all bookings for the logged-in user, a page at a time when `?cursor=`/`?page_size=` is sent
+            bookings = Booking.objects.for_user(request.user).for_serializer().order_by("-event_date", "-id")
+            rows, serialize = list_projection(BookingSerializer, bookings, {"fields": request.query_params.get("fields")})
+            data = BookingPagination().paginate(request, rows, serialize, view=self)
+            return Response(data, status=status.HTTP_200_OK)
 
     def post(self, request, *args, **kwargs):
         user=request.user
         pk = kwargs.get("pk")
-        print(f"pk: {pk}")  # Debug: Check if pk is being passed correctly
-        print(f"kwargs: {kwargs}")  # Debug: Check all kwargs
-        print(f"request data: {request.data}")  # Debug: Check request payload
         if pk is None:
             """
             Adds a service to the cart and stores event details.
@@ -212,7 +371,7 @@ class BookingView(APIView):
                 return Response({"error": "Service not found."}, status=status.HTTP_404_NOT_FOUND)
             
             cart_item = Cart.objects.create(
-                user = user,
+                user_id = user.id,
                 service = service,
                 event_date = event_date,
                 event_location = event_location,
@@ -227,9 +386,7 @@ class BookingView(APIView):
         else:
             #CASE 2: Create a booking from the cart when "Book" is clicked
             service_id = pk  # pk is provided in the URL, meaning we're booking this service
-            print(f"Service ID from URL: {service_id}")
-            print(f"User: {user}")
-            cart_item = Cart.objects.filter(user=user, service_id=service_id).first()
+            cart_item = Cart.objects.filter(user_id=user.id, service_id=service_id).first()
             if not cart_item:
                 return Response({"error": "Service not found in cart"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -241,17 +398,20 @@ class BookingView(APIView):
             if not event_date or not event_time or not event_location:
                 return Response({"error": "Missing event details"}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Create a booking
-            booking = Booking.objects.create(
-                user=user,
-                service=cart_item.service,
-                event_date=event_date,
-                event_time=event_time,
-                event_location=event_location
-            )
-
-            # Remove the item from the cart after successful booking
-            cart_item.delete()
+            # Create a booking and remove the item from the cart; the unique
+            # (service, event_date) constraint rejects the insert if the slot is taken
+            try:
+                with transaction.atomic():
+                    booking = Booking.objects.create(
+                        user_id=user.id,
+                        service_id=cart_item.service_id,
+                        event_date=event_date,
+                        event_time=event_time,
+                        event_location=event_location
+                    )
+                    cart_item.delete()
+            except IntegrityError:
+                return Response({"error": "Service already booked on this date."}, status=status.HTTP_400_BAD_REQUEST)
 
             return Response(
                 {"message": "Service successfully booked!", "booking": BookingSerializer(booking).data},
@@ -261,10 +421,9 @@ class BookingView(APIView):
 
     def put(self, request, pk):
         """Updates an existing booking's event details."""
-        print("Received Data:", request.data)
-        booking = get_object_or_404(Booking, pk=pk, user=request.user)
+        booking = get_object_or_404(Booking, pk=pk, user_id=request.user.id)
 
-        if booking.status not in ["Pending", "Cancelled"]:
+        if booking.status not in ["pending", "canceled"]:
             return Response(
                 {"error": "Only Pending or Cancelled bookings can be edited."},
                 status=status.HTTP_400_BAD_REQUEST
@@ -282,20 +441,17 @@ class BookingView(APIView):
         if not event_date:
             return Response({"error": "Valid event date is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Ensure the same service is not double booked on the same date
-        existing_booking = Booking.objects.filter(
-            service_id=service_id, event_date=event_date
-        ).exclude(pk=pk).exists()
-
-        if existing_booking:
-            return Response(
-                {"error": "Service already booked on this date."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
         serializer = BookingSerializer(booking, data=data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            # Ensure the same service is not double booked on the same date
+            try:
+                with transaction.atomic():
+                    serializer.save()
+            except IntegrityError:
+                return Response(
+                    {"error": "Service already booked on this date."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -305,63 +461,96 @@ class BookingView(APIView):
         user = request.user
         booking = get_object_or_404(Booking, pk=pk)
 
-        if request.user != booking.user and not request.user.is_staff:
+        if booking.user_id != request.user.id and not request.user.is_staff:
             return Response(
                 {"error": "You do not have permission to delete this booking."},
                 status=status.HTTP_403_FORBIDDEN
             )
-        if booking.status not in ["Pending"] and not user.is_staff:
+        if booking.status not in ["pending", "canceled"] and not user.is_staff:
             return Response(
-                {"error": "You do not have permission to delete a booking whose statsus is not Pending"}, status=status.HTTP_403_FORBIDDEN
+                {"error": "Only Pending or Cancelled bookings can be deleted."}, status=status.HTTP_403_FORBIDDEN
                 )
         
         booking.delete()
         return Response({"message": "Booking deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
 
+# Cart Checkout: books every cart item in one transaction
+class CartCheckoutView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """Book the whole cart; returns a result per cart item. Items whose slot is taken stay in the cart."""
+        try:
+            results = checkout_cart(request.user)
+        except IntegrityError:
+            return Response(
+                {"error": "One of these services was just booked by someone else. Please try again."},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        if not results:
+            return Response({"error": "Your cart is empty."}, status=status.HTTP_400_BAD_REQUEST)
+
+        booked = sum(result["status"] == BOOKED for result in results)
+        return Response(
+            {"message": f"{booked} of {len(results)} service(s) booked.", "results": results},
+            status=status.HTTP_201_CREATED if booked else status.HTTP_409_CONFLICT,
+        )
+
 #User Dashboard View
 class UserDashboardView(APIView):
     permission_classes = [IsAuthenticated]
+    SECTIONS = ("user", "bookings", "cart")
+    # Dashboard tab each booking status is listed under
+    BOOKING_TABS = {"pending": "pending", "completed": "completed", "canceled": "cancelled"}
 
     def get(self, request):
-        # Fetch user details, bookings, and cart.
+        """
+        Fetch user details, bookings and cart. `?sections=user,bookings,cart`
+        limits the response to the parts the client renders.
+        """
+        requested = request.query_params.get("sections")
+        sections = set(requested.split(",")) if requested else set(self.SECTIONS)
+        unknown = sections - set(self.SECTIONS)
+        if unknown:
+            return Response(
+                {"error": f"Unknown dashboard sections: {', '.join(sorted(unknown))}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         user = request.user
         context = {'request': request}
+        data = {}
 
-        # Fetch user cart items
-        cart_items = Cart.objects.filter(user=user).all()
-        cart_data = CartSerializer(cart_items, many=True, context=context).data  
-
-        print("serialized cart data:", cart_data)
-        # Serialize user profile
-        user_data = CustomUserSerializer(user).data
-
-        # Categorize bookings
-        bookings = Booking.objects.filter(user=user)
-        pending = bookings.filter(status="Pending")
-        completed = bookings.filter(status="Completed")
-        cancelled = bookings.filter(status="Cancelled")
-
-        return Response({
-            "user": user_data,
-            "bookings": {
-                "pending": BookingSerializer(pending, many=True, context=context).data,
-                "completed": BookingSerializer(completed, many=True, context=context).data,
-                "cancelled": BookingSerializer(cancelled, many=True, context=context).data
-            },
-            "cart": cart_data  
-        })
+        if "user" in sections:
+            data["user"] = CustomUserSerializer(user_instance(user)).data
+
+        if "bookings" in sections:
+            # One query for every booking, partitioned by status in Python
+            bookings = Booking.objects.for_user(user).for_serializer().order_by("-event_date")
+            rows, serialize = list_projection(BookingSerializer, bookings, context)
+            grouped = {tab: [] for tab in self.BOOKING_TABS.values()}
+            for booking in serialize(rows):
+                grouped[self.BOOKING_TABS[booking["status"]]].append(booking)
+            data["bookings"] = grouped
+
+        if "cart" in sections:
+            cart_items = Cart.objects.filter(user_id=user.id).select_related("service")
+            data["cart"] = CartSerializer(cart_items, many=True, context=context).data
+
+        return Response(data)
     
     def delete(self, request, pk):
         user = request.user
 
-        cart_item = Cart.objects.filter(user=user, id=pk).first()
+        cart_item = Cart.objects.filter(user_id=user.id, id=pk).first()
 
         if not cart_item:
             return Response({"error": "Item not found in cart"}, status=status.HTTP_404_NOT_FOUND)
 
         cart_item.delete()
 
-        return Response({"message": "Item removed from cart", "cart": CartSerializer(Cart.objects.filter(user=user), many=True).data}, status=status.HTTP_200_OK)
+        return Response({"message": "Item removed from cart", "cart": CartSerializer(Cart.objects.filter(user_id=user.id).select_related("service"), many=True).data}, status=status.HTTP_200_OK)
 
 class ContactUsView(APIView):
     permission_classes = [IsAuthenticated]
@@ -371,68 +560,83 @@ class ContactUsView(APIView):
     
     def post(self, request):
         # Automatically fill user details
-        request.data["first_name"] = request.user.first_name
-        request.data["last_name"] = request.user.last_name
-        request.data["email"] = request.user.email
+        data = request.data.copy()
+        data.setdefault("name", f"{request.user.first_name} {request.user.last_name}".strip() or request.user.username)
+        data["email"] = request.user.email
 
-        serializer = ContactUsSerializer(data=request.data)
+        serializer = ContactUsSerializer(data=data)
         if serializer.is_valid():
-            contact_message = serializer.save()
-
-            # Send email notification
-            subject = f"New Contact Message from {contact_message.name}"
-            message = f"""
-            Name: {contact_message.first_name} {contact_message.last_name}
-            Email: {contact_message.email}
-            Subject: {contact_message.subject}
-            
-            Message:
-            {contact_message.message}
-            """
-            studio_email = settings.DEFAULT_FROM_EMAIL  # Ensure this is set in settings.py
-            
-            try:
-                send_mail(
-                    subject,
-                    message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [studio_email],  # Change this to the studio owner's email
-                    fail_silently=False
-                )
-            except Exception as e:
-                return Response({"error": "Message saved, but email could not be sent.", "details": str(e)},
-                                status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
+            # The studio notification is queued in the outbox and sent off the request path
+            serializer.save()
+            transaction.on_commit(schedule_flush)
             return Response({"message": "Your message has been sent!"}, status=status.HTTP_201_CREATED)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 # Review API
-class ReviewListView(APIView):
-    permission_classes = [AllowAny]
+class ReviewListView(AsyncReadOnlyView):
 
-    def get(self, request):
-        reviews = Review.objects.all()
-        serializer = ReviewSerializer(reviews, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+    async def get(self, request):
+        reviews = Review.objects.select_related("user").order_by("-created_at", "-id")
+        rows, serialize = list_projection(ReviewSerializer, reviews, {"fields": request.GET.get("fields")})
+        data = await ReviewPagination().apaginate(self.drf_request, rows, serialize, view=self)
+        return self.render(data)
+
+    async def post(self, request):
+        # Writes stay on the synchronous DRF view (JWT auth, transactions)
+        return await sync_to_async(ReviewCreateView.as_view())(request)
+
+class ReviewCreateView(APIView):
+    permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        data = request.data.copy()
-        data["user"] = request.user.id
-        serializer = ReviewSerializer(data=data)
+        serializer = ReviewSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            # Save the review and update the service's rating stats (see OWM.signals) together
+            with transaction.atomic():
+                serializer.save(user_id=request.user.id)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class TeamListView(APIView):
-    permission_classes = [AllowAny]
+class TeamListView(AsyncReadOnlyView):
     
-    def get(self, request):
-        member = TeamMember.objects.all()
-        serializer = TeamMemberSerializer(member, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+    async def get(self, request):
+        members = TeamMember.objects.order_by("id")
+        rows, serialize = list_projection(TeamMemberSerializer, members, {"fields": request.GET.get("fields")})
+        data = await TeamPagination().apaginate(self.drf_request, rows, serialize, view=self)
+        return self.render(data)
     
+# Full-text search over services, reviews and team members (see OWM.search)
+class SearchView(AsyncReadOnlyView):
+
+    async def get(self, request):
+        """Ranked matches for ?q=, optionally only of ?type= (comma-separated) or in ?category=; paged by ?page=."""
+        query = request.GET.get("q", "")
+        if not query.strip():
+            return self.render({"error": "A search query is required."}, status=status.HTTP_400_BAD_REQUEST)
+        category = request.GET.get("category")
+        if category and category not in dict(Service.CATEGORY_CHOICES):
+            return self.render({"error": "Unknown service category."}, status=status.HTTP_400_BAD_REQUEST)
+        kinds = [kind for kind in request.GET.get("type", "").split(",") if kind]
+        if set(kinds) - set(dict(SearchDocument.KIND_CHOICES)):
+            return self.render({"error": "Unknown result type."}, status=status.HTTP_400_BAD_REQUEST)
+
+        def build():
+            paginator = SearchPagination()
+            page = paginator.paginate_queryset(search(query, kinds, category), self.drf_request, view=self)
+            return paginator.get_paginated_response(search_results(page)).data
+
+        try:
+            return self.render(await sync_to_async(build)())
+        except NotFound as exc:
+            return self.render({"detail": exc.detail}, status=status.HTTP_404_NOT_FOUND)
+
+class SearchSuggestView(AsyncReadOnlyView):
+
+    async def get(self, request):
+        """Autocomplete: indexed words starting with the last word of ?q=."""
+        return self.render({"suggestions": await sync_to_async(suggest)(request.GET.get("q", ""))})
+
 class TestView(APIView):
     permission_classes = [AllowAny]
     def post(self, request, pk=None, *args, **kwargs):
@@ -2,6 +2,7 @@
 ASGI config for OffWorldMedia project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP goes to Django; WebSockets under ``ws/`` go to the Channels consumers in OWM.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -12,5 +13,24 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'OffWorldMedia.settings')
+# Under ASGI each request's sync code may run on a different thread, and a persistent
+# connection is left open per thread that ever touched the database (Django ticket #33497).
+# Close connections at the end of each request unless DB_CONN_MAX_AGE says otherwise.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
-application = get_asgi_application()
+# Initialise Django before importing anything that touches models
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E402
+from channels.sessions import CookieMiddleware  # noqa: E402
+
+from OWM.consumers import JWTAuthMiddleware  # noqa: E402
+from OWM.routing import websocket_urlpatterns  # noqa: E402
+
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': AllowedHostsOriginValidator(
+        CookieMiddleware(JWTAuthMiddleware(URLRouter(websocket_urlpatterns)))
+    ),
+})
@@ -1,6 +1,6 @@
 from pathlib import Path
 import os
-from decouple import config
+from decouple import Csv, config
 from datetime import timedelta
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -37,10 +37,15 @@ INSTALLED_APPS = [
     'OWM',
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders'
 ]
 
 MIDDLEWARE = [
+    'OWM.middleware.MediaFilesMiddleware',  # Serves MEDIA_URL ahead of the rest of the stack when SERVE_MEDIA is on
+    'OWM.middleware.ReplicaRoutingMiddleware',  # Routes safe requests' reads to DB_REPLICA_HOSTS, if any
+    'OWM.middleware.MetricsMiddleware',  # Prometheus request metrics, scraped from /metrics
+    'OWM.middleware.PerfInstrumentationMiddleware',  # Removes itself unless PERF_INSTRUMENTATION is on
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -51,15 +56,32 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# The stateless class builds request.user from the access token's claims (OWM.authentication.LazyTokenUser)
+# and loads the CustomUser only when a view reads a field the token lacks. Deactivating a user then
+# takes effect when their access token expires. OWM.authentication.StatefulJWTAuthentication loads the
+# user on every request. Both reject access tokens whose refresh token was rotated or logged out.
+JWT_AUTHENTICATION_CLASS = config(
+    'JWT_AUTHENTICATION_CLASS', default='OWM.authentication.StatelessJWTAuthentication'
+)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        JWT_AUTHENTICATION_CLASS,
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'OWM.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
+# Fast paths for JSON responses, both producing the same bytes as before: orjson rendering
+# (when orjson is installed) and values()-based serializers for the list endpoints.
+FAST_JSON_RENDERER = config('FAST_JSON_RENDERER', default=True, cast=bool)
+FLAT_SERIALIZERS = config('FLAT_SERIALIZERS', default=True, cast=bool)
+
 SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = "Lax"  # or "None" if using HTTPS
@@ -76,8 +98,16 @@ SIMPLE_JWT = {
     "AUTH_COOKIE_HTTP_ONLY": True,
     "AUTH_COOKIE_PATH": "/",
     "AUTH_COOKIE_SAMESITE": "Lax",
+    "TOKEN_USER_CLASS": "OWM.authentication.LazyTokenUser",
 }
 
+# Revoked token ids are checked in memory (OWM.revocation). Each process syncs new revocations every
+# TOKEN_REVOCATION_SYNC_SECONDS and rebuilds every TOKEN_REVOCATION_REBUILD_SECONDS; run
+# `manage.py flushexpiredtokens` daily to purge expired tokens from the database.
+TOKEN_REVOCATION_SYNC_SECONDS = config('TOKEN_REVOCATION_SYNC_SECONDS', default=5, cast=int)
+TOKEN_REVOCATION_REBUILD_SECONDS = config('TOKEN_REVOCATION_REBUILD_SECONDS', default=3600, cast=int)
+TOKEN_REVOCATION_BLOOM_CAPACITY = config('TOKEN_REVOCATION_BLOOM_CAPACITY', default=100000, cast=int)
+
 CORS_ALLOW_ALL_ORIGINS = True
 
 CORS_ALLOW_CREDENTIALS = True
@@ -109,23 +139,103 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'OffWorldMedia.wsgi.application'
+ASGI_APPLICATION = 'OffWorldMedia.asgi.application'
+
+# Channel layer for the real-time updates socket (OWM.consumers). The in-memory layer
+# only reaches sockets in the same process; use a shared layer when running several workers.
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': config('CHANNEL_LAYER_BACKEND', default='channels.layers.InMemoryChannelLayer'),
+    }
+}
+
+# Cache shared by every app process (Redis, e.g. CACHE_URL=redis://127.0.0.1:6379/1). The catalog
+# cache (OWM.catalog) and the runtime instrumentation switch (OWM.perf) need it; without CACHE_URL
+# each process has its own LocMemCache and the catalog cache is off.
+CACHE_URL = config('CACHE_URL', default='')
+if CACHE_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_URL}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# Serve the public catalog from the cache, invalidated on every service change (check OWM.E001
+# refuses it with a per-process cache, where other processes would keep serving stale entries)
+CATALOG_CACHE_ENABLED = config('CATALOG_CACHE_ENABLED', default=bool(CACHE_URL), cast=bool)
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': config('DB_NAME'),
-        'USER': config('DB_USER'),
-        'PASSWORD': config('DB_PASSWORD'),
-        'HOST': config('DB_HOST'),
-        'PORT': config('DB_PORT'),
-        'OPTIONS': {
-            'init_command': "SET sql_mode='STRICT_TRANS_TABLES'"
+# DB_ENGINE picks the backend: mysql (production), postgresql, or sqlite3 for local runs and benchmarks.
+DB_ENGINE = config('DB_ENGINE', default='mysql')
+
+# Connections are kept open between requests (one per worker thread) for DB_CONN_MAX_AGE seconds
+# and health-checked before reuse, so MySQL's init_command runs once per connection, not per request.
+# OffWorldMedia.asgi defaults DB_CONN_MAX_AGE to 0: ASGI servers would leave one open per thread.
+# With DB_POOL (PostgreSQL only, needs psycopg 3 with the pool extra) each worker process instead
+# shares a pool of DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE connections.
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=600, cast=int)
+DB_CONN_HEALTH_CHECKS = config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool)
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+
+if DB_ENGINE == 'sqlite3':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('DB_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+            'OPTIONS': {
+                'timeout': 30,
+                'transaction_mode': 'IMMEDIATE',  # Take the write lock up front instead of failing on upgrade
+            },
+            # A file, not the default shared-cache in-memory database, whose writers fail with
+            # "database table is locked" instead of waiting out the timeout
+            'TEST': {'NAME': config('DB_TEST_NAME', default=str(BASE_DIR / 'test_db.sqlite3'))},
         }
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': f'django.db.backends.{DB_ENGINE}',
+            'NAME': config('DB_NAME'),
+            'USER': config('DB_USER'),
+            'PASSWORD': config('DB_PASSWORD'),
+            'HOST': config('DB_HOST'),
+            'PORT': config('DB_PORT'),
+            'OPTIONS': {},
+        }
+    }
+
+DATABASES['default']['CONN_MAX_AGE'] = DB_CONN_MAX_AGE
+DATABASES['default']['CONN_HEALTH_CHECKS'] = DB_CONN_HEALTH_CHECKS
+
+if DB_ENGINE == 'mysql':
+    DATABASES['default']['OPTIONS']['init_command'] = "SET sql_mode='STRICT_TRANS_TABLES'"
+elif DB_ENGINE == 'postgresql' and DB_POOL:
+    DATABASES['default']['CONN_MAX_AGE'] = 0  # The pool owns connection lifetime
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+        'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+        'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+    }
+
+# Read replicas for GET/HEAD/OPTIONS traffic (see OWM.db_router): comma-separated host[:port]
+# entries, or file paths with sqlite3. Clients read from the primary for REPLICA_PIN_SECONDS
+# after a write, and a replica that fails its health check is skipped for
+# REPLICA_HEALTH_CHECK_INTERVAL seconds.
+DB_REPLICA_HOSTS = config('DB_REPLICA_HOSTS', default='', cast=Csv())
+DATABASE_REPLICAS = []
+for index, replica in enumerate(DB_REPLICA_HOSTS, start=1):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {**DATABASES['default'], 'OPTIONS': dict(DATABASES['default']['OPTIONS']), 'TEST': {'MIRROR': 'default'}}
+    if DB_ENGINE == 'sqlite3':
+        DATABASES[alias]['NAME'] = replica
+    else:
+        host, _, port = replica.partition(':')
+        DATABASES[alias].update(HOST=host, PORT=port or DATABASES['default']['PORT'])
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['OWM.db_router.ReplicaRouter']
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+REPLICA_HEALTH_CHECK_INTERVAL = config('REPLICA_HEALTH_CHECK_INTERVAL', default=10, cast=int)
 
 EMAIL_BACKEND = config('EMAIL_BACKEND')
 EMAIL_HOST = config('EMAIL_HOST')
@@ -135,6 +245,10 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL')
 
+# Contact emails are queued in the DB outbox (OWM.outbox). Send them from a background
+# thread in the web process, or set False and run `manage.py run_outbox` as a worker.
+OUTBOX_SEND_IN_PROCESS = config('OUTBOX_SEND_IN_PROCESS', default=True, cast=bool)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -154,6 +268,28 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Login and registration hash passwords in a process pool of PASSWORD_HASH_WORKERS (0 = inline);
+# beyond PASSWORD_HASH_QUEUE_LIMIT pending hashes they answer 429 straight away.
+PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', default=2, cast=int)
+PASSWORD_HASH_QUEUE_LIMIT = config('PASSWORD_HASH_QUEUE_LIMIT', default=8, cast=int)
+PASSWORD_HASH_TIMEOUT = config('PASSWORD_HASH_TIMEOUT', default=10, cast=int)
+
+# Failed logins back off exponentially per username and per client IP (per process). Client IPs
+# are only tracked behind LOGIN_TRUSTED_PROXY_HOPS trusted proxies, each appending to
+# LOGIN_CLIENT_IP_HEADER; with none (0) every client would share one address, so only usernames are.
+LOGIN_BACKOFF_FREE_ATTEMPTS = config('LOGIN_BACKOFF_FREE_ATTEMPTS', default=5, cast=int)
+LOGIN_BACKOFF_IP_FREE_ATTEMPTS = config('LOGIN_BACKOFF_IP_FREE_ATTEMPTS', default=50, cast=int)
+LOGIN_BACKOFF_MAX_SECONDS = config('LOGIN_BACKOFF_MAX_SECONDS', default=300, cast=int)
+LOGIN_TRUSTED_PROXY_HOPS = config('LOGIN_TRUSTED_PROXY_HOPS', default=0, cast=int)
+LOGIN_CLIENT_IP_HEADER = config('LOGIN_CLIENT_IP_HEADER', default='HTTP_X_FORWARDED_FOR')
+
+# Search (see OWM.search): candidates ranked per query, and indexed words tried for a trailing prefix
+SEARCH_MAX_CANDIDATES = config('SEARCH_MAX_CANDIDATES', default=100, cast=int)
+SEARCH_PREFIX_EXPANSIONS = config('SEARCH_PREFIX_EXPANSIONS', default=4, cast=int)
+
+# Admin (see OWM.changelist): unfiltered changelists of tables at least this big show the row estimate, not COUNT(*)
+ADMIN_ESTIMATED_COUNT_MIN_ROWS = config('ADMIN_ESTIMATED_COUNT_MIN_ROWS', default=100000, cast=int)
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -174,6 +310,21 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Serve media from Django (OWM.middleware.MediaFilesMiddleware); turn off when a web server serves MEDIA_ROOT
+SERVE_MEDIA = config('SERVE_MEDIA', default=DEBUG, cast=bool)
+MEDIA_CACHE_MAX_AGE = config('MEDIA_CACHE_MAX_AGE', default=3600, cast=int)
+
+# Prometheus metrics (see OWM.metrics). Run multi-worker servers with PROMETHEUS_MULTIPROC_DIR
+# exported so /metrics aggregates every worker; set METRICS_TOKEN to require a bearer token.
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Per-request timing, query counts and sampled cProfile traces (see OWM.middleware.PerfInstrumentationMiddleware).
+# Off means the middleware is not installed at all; once on, it can be paused with `manage.py perf_instrumentation`.
+PERF_INSTRUMENTATION = config('PERF_INSTRUMENTATION', default=False, cast=bool)
+PERF_PROFILE_SAMPLE_RATE = config('PERF_PROFILE_SAMPLE_RATE', default=0.0, cast=float)
+PERF_PROFILE_DIR = config('PERF_PROFILE_DIR', default=str(BASE_DIR / 'perf-profiles'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -2,10 +2,12 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from OWM.views import MetricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', include('OWM.urls'))
+    path('api/', include('OWM.urls')),
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -41,6 +41,44 @@ const UserDashboard = () => {
     console.log("Cart State Updated:");
   }, [cart]);
 
+  // Live booking and cart updates over one WebSocket instead of re-fetching the dashboard
+  useEffect(() => {
+    const token = sessionStorage.getItem("accessToken");
+    if (!token) return;
+
+    const wsUrl = API.defaults.baseURL.replace(/^http/, "ws").replace(/api\/$/, "ws/updates/");
+    const socket = new WebSocket(`${wsUrl}?token=${encodeURIComponent(token)}`);
+    socket.onmessage = (event) => {
+      const update = JSON.parse(event.data);
+      if (update.type === "booking") applyBookingUpdate(update);
+      if (update.type === "cart") applyCartUpdate(update);
+    };
+    return () => socket.close();
+  }, []);
+
+  const BOOKING_TABS = { pending: "pending", completed: "completed", canceled: "cancelled" };
+
+  const applyBookingUpdate = ({ action, booking }) => {
+    setBookings((current) => {
+      const next = {};
+      Object.keys(current).forEach((tab) => {
+        next[tab] = current[tab].filter((item) => item.id !== booking.id);
+      });
+      const tab = BOOKING_TABS[booking.status];
+      if (action === "saved" && tab) {
+        next[tab] = [booking, ...(next[tab] || [])];
+      }
+      return next;
+    });
+  };
+
+  const applyCartUpdate = ({ action, cart_item }) => {
+    setCart((current) => {
+      const rest = current.filter((item) => item.id !== cart_item.id);
+      return action === "saved" ? [...rest, cart_item] : rest;
+    });
+  };
+
   const fetchUserDashboard = async () => {
     try {
       const response = await API.get("userdashboard/", {